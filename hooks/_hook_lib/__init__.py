@@ -0,0 +1,39 @@
+"""Shared helpers for the kit's Python hooks.
+
+Hooks are standalone scripts (several have hyphenated filenames and cannot
+be imported as modules), but they run with ``hooks/`` on ``sys.path`` — so
+anything they need to share lives in this package.
+
+Public surface (the contract):
+
+- :class:`BeanDocument` — single-parse model of a bean.md / task file with
+  in-place field and table-row edits and byte-identical serialization of
+  untouched lines.
+- :class:`TableRow`, :func:`split_cells` — table-row helpers used by the
+  document model and its callers.
+- :data:`SENTINEL` — the em-dash placeholder for "not yet stamped".
+
+The ``_`` prefix in the directory name signals "internal helpers — not a
+hook entry point" (mirroring ``skills/_media_lib``); claude-sync links only
+files from ``hooks/``, and the hooks resolve this package next to their
+real path.
+
+The re-exports are resolved lazily: hook-client.py imports
+``_hook_lib.hookd`` on every tool call and must not pay for the document
+model (or ``pathlib``) just because the package was imported.
+"""
+
+__all__ = [
+    "SENTINEL",
+    "BeanDocument",
+    "TableRow",
+    "split_cells",
+]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        from . import bean_document
+
+        return getattr(bean_document, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,354 @@
+"""Single-parse document model for bean.md and task files.
+
+telemetry-stamp used to rescan the whole file text for every field it read
+or wrote (a fresh regex compile per call, one full line walk per table
+helper). ``BeanDocument`` parses a file once into:
+
+- the bold-field rows (``| **Field** | value |``) anywhere in the file —
+  the metadata table, the Telemetry summary, the Orchestration block;
+- the ``## `` sections, so lookups can be scoped to one section;
+- the Tasks table rows;
+- the per-task Telemetry table rows (and where new rows get inserted).
+
+Edits are applied in place to the affected lines only. Every line keeps
+its original bytes (including its line ending) unless it was edited, and
+``text()`` joins the lines back once, so untouched regions serialize
+byte-identically. ``dirty`` records whether anything changed.
+
+Inserting rows shifts line numbers, so structural edits (new fields, new
+Telemetry rows) re-index the document; in-place value edits do not.
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from .fileio import atomic_write_text
+
+__all__ = [
+    "SENTINEL",
+    "BeanDocument",
+    "TableRow",
+    "split_cells",
+]
+
+SENTINEL = "—"
+
+# | **Field** | value |   — value is everything up to the next pipe.
+FIELD_ROW_RE = re.compile(
+    r"^(?P<head>\|\s*\*\*(?P<field>.+?)\*\*\s*\|\s*)(?P<value>.*?)\s*\|"
+)
+SEPARATOR_RE = re.compile(r"^\|[\s\-|]+\|$")
+
+
+def split_cells(stripped: str) -> list[str]:
+    """Split a table row into its non-empty, stripped cells.
+
+    Empty cells are dropped, matching how the stamping code has always
+    indexed columns.
+    """
+    return [c for c in (c.strip() for c in stripped.split("|")) if c]
+
+
+def _eol(line: str) -> str:
+    return line[len(line.rstrip("\r\n")):]
+
+
+class TableRow:
+    """One data row of a markdown table: its line index and parsed cells."""
+
+    __slots__ = ("index", "cells")
+
+    def __init__(self, index: int, cells: list[str]) -> None:
+        self.index = index
+        self.cells = cells
+
+    @property
+    def num(self) -> str:
+        return self.cells[0] if self.cells else ""
+
+
+class BeanDocument:
+    """A bean.md or task .md file parsed once, edited in place."""
+
+    def __init__(self, text: str) -> None:
+        self.lines: list[str] = text.splitlines(keepends=True)
+        self.dirty = False
+        self._newline = "\r\n" if self.lines and self.lines[0].endswith(
+            "\r\n"
+        ) else "\n"
+        self._index()
+
+    @classmethod
+    def read(cls, path: Path) -> BeanDocument:
+        return cls(path.read_text(encoding="utf-8"))
+
+    def text(self) -> str:
+        return "".join(self.lines)
+
+    def write(self, path: Path) -> bool:
+        """Write the document back if it changed. Returns True if written."""
+        if not self.dirty:
+            return False
+        atomic_write_text(path, self.text())
+        return True
+
+    # -- indexing ----------------------------------------------------------
+
+    def _index(self) -> None:
+        """(Re)build every index in a single pass over the lines."""
+        self._fields: list[tuple[str, int]] = []
+        self._sections: list[tuple[str, int, int]] = []
+        self._tasks: list[TableRow] = []
+        self._telemetry: list[TableRow] = []
+        # Telemetry per-task table: data span [start, end), -1 if absent.
+        self._telemetry_span = (-1, -1)
+        self._telemetry_header = -1
+        self._telemetry_sep = -1
+        self._first_table_end = -1
+
+        # First markdown table: new metadata fields are appended after its
+        # last row.
+        first_sep_seen = False
+        first_table_done = False
+
+        tasks_state = 0        # 0 = before, 1 = inside, 2 = done
+        tasks_sep = False
+        telem_state = 0
+        telem_sep = -1
+        telem_stop = False
+
+        for i, line in enumerate(self.lines):
+            stripped = line.strip()
+            is_row = stripped.startswith("|")
+            is_sep = is_row and bool(SEPARATOR_RE.match(stripped))
+
+            if line.startswith("|"):
+                m = FIELD_ROW_RE.match(line)
+                if m:
+                    self._fields.append((m.group("field"), i))
+
+            if stripped.startswith("## "):
+                if self._sections:
+                    name, start, _ = self._sections[-1]
+                    self._sections[-1] = (name, start, i)
+                self._sections.append((stripped[3:].strip(), i, len(self.lines)))
+
+            if not first_table_done:
+                if is_sep:
+                    first_sep_seen = True
+                elif first_sep_seen and is_row:
+                    self._first_table_end = i
+                elif first_sep_seen:
+                    first_table_done = True
+
+            # ## Tasks table
+            if stripped.startswith("## Tasks") and tasks_state == 0:
+                tasks_state = 1
+            elif tasks_state == 1:
+                if stripped.startswith("##"):
+                    tasks_state = 2
+                elif not is_row:
+                    if tasks_sep and stripped and not stripped.startswith(">"):
+                        tasks_state = 2
+                elif is_sep:
+                    tasks_sep = True
+                elif tasks_sep:
+                    self._tasks.append(TableRow(i, split_cells(stripped)))
+
+            # ## Telemetry per-task table (stops at the summary table)
+            if stripped.startswith("## Telemetry") and telem_state == 0:
+                telem_state = 1
+            elif telem_state == 1 and not telem_stop:
+                if stripped.startswith("##"):
+                    telem_state = 2
+                elif is_row and "Duration" in stripped and "Task" in stripped:
+                    self._telemetry_header = i
+                elif telem_sep < 0 and is_sep:
+                    telem_sep = i
+                elif telem_sep >= 0 and is_row:
+                    if "**" in stripped or "Metric" in stripped:
+                        telem_stop = True
+                    else:
+                        self._telemetry.append(
+                            TableRow(i, split_cells(stripped))
+                        )
+                elif telem_sep >= 0 and stripped:
+                    telem_stop = True
+
+        if telem_sep >= 0:
+            self._telemetry_sep = telem_sep
+            if self._telemetry:
+                self._telemetry_span = (
+                    self._telemetry[0].index, self._telemetry[-1].index + 1,
+                )
+            else:
+                self._telemetry_span = (telem_sep + 1, telem_sep + 1)
+
+    # -- sections ----------------------------------------------------------
+
+    def section_bounds(self, heading: str) -> tuple[int, int]:
+        """(start, end) line span of the first ``## <heading>...`` section.
+
+        Returns (-1, -1) when the section is missing.
+        """
+        for name, start, end in self._sections:
+            if name.startswith(heading):
+                return start, end
+        return -1, -1
+
+    def has_section(self, heading: str) -> bool:
+        return self.section_bounds(heading)[0] >= 0
+
+    # -- bold fields ---------------------------------------------------------
+
+    def _field_line(self, field: str, section: str | None = None) -> int:
+        lo, hi = 0, len(self.lines)
+        if section is not None:
+            lo, hi = self.section_bounds(section)
+            if lo < 0:
+                return -1
+        for name, i in self._fields:
+            if name == field and lo <= i < hi:
+                return i
+        return -1
+
+    def field(self, field: str, section: str | None = None) -> str | None:
+        """Value of the first ``| **field** |`` row (optionally within a
+        section), stripped; None if absent."""
+        i = self._field_line(field, section)
+        if i < 0:
+            return None
+        m = FIELD_ROW_RE.match(self.lines[i])
+        return m.group("value").strip() if m else None
+
+    def set_field(
+        self, field: str, value: str, section: str | None = None,
+    ) -> bool:
+        """Replace a field's value in place. Returns True if it changed."""
+        i = self._field_line(field, section)
+        if i < 0:
+            return False
+        line = self.lines[i]
+        m = FIELD_ROW_RE.match(line)
+        if not m:
+            return False
+        new_line = line[:m.start("value")] + value + line[m.end("value"):]
+        if new_line == line:
+            return False
+        self.lines[i] = new_line
+        self.dirty = True
+        return True
+
+    def ensure_field(
+        self, field: str, default: str = SENTINEL, section: str | None = None,
+    ) -> bool:
+        """Add ``| **field** | default |`` if missing: after the last field
+        row of ``section`` when given, else to the first table.
+
+        Returns True if the row was added.
+        """
+        if self._field_line(field, section) >= 0:
+            return False
+        if section is None:
+            at = self._first_table_end
+        else:
+            lo, hi = self.section_bounds(section)
+            at = max((i for _, i in self._fields if lo <= i < hi), default=-1)
+        if at < 0:
+            return False
+        self._insert_lines(at + 1, [f"| **{field}** | {default} |"])
+        return True
+
+    # -- tables --------------------------------------------------------------
+
+    def task_rows(self) -> list[TableRow]:
+        """Data rows of the ``## Tasks`` table."""
+        return self._tasks
+
+    def telemetry_rows(self) -> list[TableRow]:
+        """Data rows of the per-task ``## Telemetry`` table."""
+        return self._telemetry
+
+    def has_telemetry_table(self) -> bool:
+        return self._telemetry_span[0] >= 0
+
+    def telemetry_columns(self) -> list[str]:
+        """Header cells of the per-task Telemetry table ([] if absent)."""
+        if self._telemetry_header < 0:
+            return []
+        return split_cells(self.lines[self._telemetry_header].strip())
+
+    def add_telemetry_columns(self, names: list[str]) -> bool:
+        """Append columns to the per-task Telemetry table (header, separator
+        and every data row, which get the sentinel). Returns True if the
+        table changed."""
+        if self._telemetry_header < 0 or self._telemetry_sep < 0:
+            return False
+        header = self.telemetry_columns()
+        names = [n for n in names if n not in header]
+        if not names:
+            return False
+        edits = [(self._telemetry_header, names),
+                 (self._telemetry_sep, ["-" * len(n) for n in names])]
+        edits.extend((row.index, [SENTINEL] * len(names))
+                     for row in self._telemetry)
+        for i, cells in edits:
+            line = self.lines[i]
+            eol = _eol(line)
+            body = line[:len(line) - len(eol)].rstrip()
+            if i == self._telemetry_sep:
+                body += "".join(f"{c}--|" for c in cells)
+            else:
+                body += "".join(f" {c} |" for c in cells)
+            self.lines[i] = body + eol
+        self.dirty = True
+        self._index()
+        return True
+
+    def telemetry_row(self, task_num: str) -> TableRow | None:
+        for row in self._telemetry:
+            if row.num == task_num:
+                return row
+        return None
+
+    def set_row_cells(self, row: TableRow, cells: list[str]) -> bool:
+        """Rewrite a table row from cells. Returns True if it changed."""
+        line = self.lines[row.index]
+        new_line = "| " + " | ".join(cells) + " |" + _eol(line)
+        row.cells = list(cells)
+        if new_line == line:
+            return False
+        self.lines[row.index] = new_line
+        self.dirty = True
+        return True
+
+    def replace_telemetry_rows(
+        self, new_rows: list[str], replace_existing: bool = False,
+    ) -> None:
+        """Append rows to the per-task Telemetry table, or replace all of
+        its current data rows when ``replace_existing`` is set."""
+        start, end = self._telemetry_span
+        if start < 0 or not new_rows:
+            return
+        if replace_existing:
+            del self.lines[start:end]
+            self._insert_lines(start, new_rows)
+        else:
+            self._insert_lines(end, new_rows)
+
+    # -- structural edits -------------------------------------------------
+
+    def _insert_lines(self, at: int, rows: list[str]) -> None:
+        at_end = at == len(self.lines)
+        prev_open = at > 0 and not _eol(self.lines[at - 1])
+        if prev_open:
+            self.lines[at - 1] += self._newline
+        new = [r + self._newline for r in rows]
+        if at_end and prev_open:
+            # Keep the file's "no trailing newline" shape.
+            new[-1] = rows[-1]
+        self.lines[at:at] = new
+        self.dirty = True
+        self._index()
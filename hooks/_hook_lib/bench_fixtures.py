@@ -0,0 +1,423 @@
+"""Synthetic projects for the hook benchmark (hooks/hook-bench.py).
+
+A fixture is a self-contained directory::
+
+    <root>/project/   git repo on a feature branch, with ai/beans/ (bean
+                      dirs with bean.md and task files, a fat _index.md),
+                      ai/outputs/tech-qa/ VDD reports, ai/handoffs/, src/
+    <root>/home/      stand-in $HOME holding the session transcript under
+                      .claude/projects/<project-hash>/<session>.jsonl
+
+Generation is deterministic for a profile and seed, so two machines
+benchmark the same bytes. ``<root>/fixture.json`` records what was generated
+(and the transcript's expected token totals); :func:`ensure_fixture` reuses
+a fixture whose record matches and regenerates it otherwise.
+
+Transcript lines look like Claude Code's: assistant messages carrying
+``usage``, and user messages whose ``tool_result`` content makes up most of
+the bytes. Some tool results quote transcript JSON, ``"type":"assistant"``
+included, the way a Read of another transcript does.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import shutil
+import subprocess
+from pathlib import Path
+
+__all__ = [
+    "FIXTURE_VERSION",
+    "Profile",
+    "PROFILES",
+    "BENCH_BEAN",
+    "BENCH_SESSION",
+    "Fixture",
+    "generate",
+    "ensure_fixture",
+]
+
+FIXTURE_VERSION = 2
+BENCH_SESSION = "bench-0000-session"
+# The bean the benchmark scenarios edit; every other bean is background.
+BENCH_BEAN = "BEAN-0001-bench-target"
+
+_STATUSES = ("Done",) * 7 + ("In Progress", "Approved", "Unapproved")
+_OWNERS = ("developer", "tech-qa", "architect", "ba", "team-lead")
+_WORDS = (
+    "hook telemetry bean task index gate report handoff session token "
+    "latency cache parser branch worktree persona review verify migrate "
+    "schema render rollup budget cursor backlog queue policy trace"
+).split()
+
+
+class Profile:
+    """Size knobs for one synthetic project."""
+
+    __slots__ = ("name", "beans", "vdd_reports", "handoffs", "transcript_mb")
+
+    def __init__(self, name: str, beans: int, vdd_reports: int,
+                 handoffs: int, transcript_mb: int) -> None:
+        self.name = name
+        self.beans = beans
+        self.vdd_reports = vdd_reports
+        self.handoffs = handoffs
+        self.transcript_mb = transcript_mb
+
+    def to_json(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+PROFILES = {
+    p.name: p for p in (
+        Profile("small", beans=1000, vdd_reports=1000, handoffs=500,
+                transcript_mb=1),
+        Profile("medium", beans=3000, vdd_reports=2500, handoffs=1500,
+                transcript_mb=64),
+        Profile("large", beans=10000, vdd_reports=8000, handoffs=5000,
+                transcript_mb=1024),
+    )
+}
+
+
+class Fixture:
+    """Paths into a generated fixture."""
+
+    __slots__ = ("root", "project", "home", "transcript", "info")
+
+    def __init__(self, root: Path, info: dict) -> None:
+        self.root = root
+        self.project = root / "project"
+        self.home = root / "home"
+        self.info = info
+        self.transcript = Path(info["transcript"])
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _bean_md(num: int, slug: str, status: str, rng: random.Random,
+             tasks: list[tuple[str, str, str]]) -> str:
+    done = status == "Done"
+    started = "2026-03-01 09:00" if status != "Unapproved" else "—"
+    task_rows = "\n".join(
+        f"| {int(n)} | {title} | {owner} | — | {'Done' if done else 'Pending'} |"
+        for n, title, owner in tasks
+    )
+    if done:
+        telem_rows = "\n".join(
+            f"| {int(n)} | {title} | {owner} | 12m | 184,220 | 9,310 | $3.45 |"
+            for n, title, owner in tasks
+        )
+        totals = (str(len(tasks)), "36m", "552,660", "27,930", "$10.35")
+    elif status == "In Progress":
+        # Rows already synced from the Tasks table, as a started bean has.
+        telem_rows = "\n".join(
+            f"| {int(n)} | {title} | {owner} | — | — | — | — |"
+            for n, title, owner in tasks
+        )
+        totals = ("—",) * 5
+    else:
+        telem_rows = "| — | — | — | — | — | — | — |"
+        totals = ("—",) * 5
+    return f"""# BEAN-{num:04d}: {slug.replace('-', ' ').title()}
+
+| Field | Value |
+|-------|-------|
+| **Bean ID** | BEAN-{num:04d} |
+| **Title** | {slug.replace('-', ' ').title()} |
+| **Status** | {status} |
+| **Priority** | {rng.choice(('High', 'Medium', 'Low'))} |
+| **Created** | 2026-02-16 |
+| **Started** | {started} |
+| **Completed** | {'2026-03-01 09:36' if done else '—'} |
+| **Duration** | {'36m' if done else '—'} |
+| **Owner** | team-lead |
+| **Category** | App |
+
+## Problem Statement
+
+{_text(rng, 120)}
+
+## Acceptance Criteria
+
+- [ ] {_text(rng, 12)}
+- [ ] {_text(rng, 12)}
+
+## Tasks
+
+| # | Task | Owner | Depends On | Status |
+|---|------|-------|------------|--------|
+{task_rows}
+
+## Telemetry
+
+| # | Task | Owner | Duration | Tokens In | Tokens Out | Cost |
+|---|------|-------|----------|-----------|------------|------|
+{telem_rows}
+
+| Metric | Value |
+|--------|-------|
+| **Total Tasks** | {totals[0]} |
+| **Total Duration** | {totals[1]} |
+| **Total Tokens In** | {totals[2]} |
+| **Total Tokens Out** | {totals[3]} |
+| **Total Cost** | {totals[4]} |
+
+## Orchestration Telemetry
+
+| Field | Value |
+|-------|-------|
+| **Personas activated** | — |
+| **Dispatch mode** | — |
+| **Bounces** | — |
+| **Scope changes** | — |
+| **Contract violations** | — |
+| **Inputs escape-hatch invocations** | — |
+
+## Notes
+
+{_text(rng, 60)}
+"""
+
+
+def _task_md(num: str, title: str, owner: str, status: str,
+             rng: random.Random) -> str:
+    return f"""# Task {num}: {title}
+
+| Field | Value |
+|-------|-------|
+| **Task** | {num} |
+| **Owner** | {owner} |
+| **Status** | {status} |
+| **Started** | {'2026-03-01 09:00' if status != 'Pending' else '—'} |
+| **Completed** | {'2026-03-01 09:12' if status == 'Done' else '—'} |
+
+## Inputs
+
+- src/app.py — {_text(rng, 4)}
+- ai/context/project.md — {_text(rng, 3)}
+
+## Goal
+
+{_text(rng, 40)}
+"""
+
+
+def _write_beans(project: Path, profile: Profile, rng: random.Random) -> None:
+    beans = project / "ai" / "beans"
+    index_rows = []
+    for num in range(1, profile.beans + 1):
+        if num == 1:
+            slug, status = BENCH_BEAN.split("-", 2)[2], "In Progress"
+        else:
+            slug = "-".join(rng.choice(_WORDS) for _ in range(3))
+            status = rng.choice(_STATUSES)
+        bean_dir = beans / f"BEAN-{num:04d}-{slug}"
+        (bean_dir / "tasks").mkdir(parents=True)
+        tasks = [
+            (f"{i:02d}", _text(rng, 3).title(), rng.choice(_OWNERS))
+            for i in range(1, rng.randint(2, 4) + 1)
+        ]
+        if num == 1:
+            tasks = [("01", "Implement Feature", "developer"),
+                     ("02", "Verify Feature", "tech-qa")]
+        (bean_dir / "bean.md").write_text(
+            _bean_md(num, slug, status, rng, tasks), encoding="utf-8")
+        for n, title, owner in tasks:
+            task_status = "Done" if status == "Done" else "Pending"
+            name = f"{n}-{owner}-{title.lower().replace(' ', '-')}.md"
+            (bean_dir / "tasks" / name).write_text(
+                _task_md(n, title, owner, task_status, rng), encoding="utf-8")
+        index_rows.append(
+            f"| BEAN-{num:04d} | {slug.replace('-', ' ').title()} | App | "
+            f"{rng.choice(('High', 'Medium', 'Low'))} | {status} | "
+            f"{rng.choice(_OWNERS)} | {_text(rng, 25)} |"
+        )
+    (beans / "_index.md").write_text(
+        "# Bean Backlog\n\n"
+        "| Bean | Title | Category | Priority | Status | Owner | Summary |\n"
+        "|------|-------|----------|----------|--------|-------|---------|\n"
+        + "\n".join(index_rows) + "\n",
+        encoding="utf-8",
+    )
+
+
+def _write_reports(project: Path, profile: Profile,
+                   rng: random.Random) -> None:
+    qa = project / "ai" / "outputs" / "tech-qa"
+    qa.mkdir(parents=True)
+    # The bench bean (0001) deliberately has no report: vdd-gate blocks it.
+    for num in range(2, profile.vdd_reports + 2):
+        verdict = "PASS" if rng.random() < 0.9 else "FAIL"
+        (qa / f"vdd-{num:04d}.md").write_text(
+            f"# VDD Report — BEAN-{num:04d}\n\n"
+            f"**Aggregate verdict:** {verdict}\n\n{_text(rng, 80)}\n",
+            encoding="utf-8",
+        )
+    handoffs = project / "ai" / "handoffs"
+    handoffs.mkdir(parents=True)
+    (handoffs / "_index.md").write_text("# Handoffs\n", encoding="utf-8")
+    for i in range(profile.handoffs):
+        num = rng.randint(2, profile.beans)
+        (handoffs / f"{num:04d}-{i:05d}-developer-to-tech-qa.md").write_text(
+            f"# Handoff BEAN-{num:04d}\n\n{_text(rng, 60)}\n",
+            encoding="utf-8",
+        )
+
+
+def _write_source(project: Path, rng: random.Random) -> None:
+    src = project / "src"
+    src.mkdir()
+    for name in ("app", "models", "views", "util"):
+        (src / f"{name}.py").write_text(
+            f'"""{_text(rng, 6)}."""\n\n\ndef {name}() -> int:\n    return 0\n',
+            encoding="utf-8",
+        )
+
+
+def _git(project: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost",
+         "-c", "commit.gpgsign=false", *args],
+        cwd=project, check=True, capture_output=True,
+    )
+
+
+def _init_repo(project: Path) -> None:
+    _git(project, "init", "-q", "-b", "main")
+    _git(project, "add", "-A")
+    _git(project, "commit", "-q", "-m", "Synthetic project")
+    _git(project, "checkout", "-q", "-b", "bench/feature")
+    with (project / "src" / "app.py").open("a", encoding="utf-8") as f:
+        f.write("\n\ndef feature() -> int:\n    return 1\n")
+    _git(project, "commit", "-q", "-am", "Feature work")
+    # Leave a modified Python file so stop-quality-reminder has work to do.
+    with (project / "src" / "util.py").open("a", encoding="utf-8") as f:
+        f.write("\n# uncommitted\n")
+
+
+def _filler(rng: random.Random, size: int) -> str:
+    blob = " ".join(rng.choice(_WORDS) for _ in range(size // 6 + 1))
+    return blob[:size]
+
+
+def _write_transcript(path: Path, megabytes: int,
+                      rng: random.Random) -> list[int]:
+    """Write a transcript of about ``megabytes`` MB; return the summed
+    usage as [input, output, cache_creation, cache_read]."""
+    target = megabytes * 1024 * 1024
+    pool = _filler(rng, 256 * 1024)
+    totals = [0, 0, 0, 0]
+    written = 0
+    turn = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        while written < target:
+            turn += 1
+            base = {"sessionId": BENCH_SESSION, "cwd": "/bench/project",
+                    "timestamp": f"2026-03-01T09:{turn // 60 % 60:02d}:"
+                                 f"{turn % 60:02d}.000Z",
+                    "uuid": f"{turn:012x}", "parentUuid": f"{turn - 1:012x}"}
+            usage = {
+                "input_tokens": rng.randint(1, 40),
+                "cache_creation_input_tokens": rng.randint(0, 6000),
+                "cache_read_input_tokens": rng.randint(10_000, 90_000),
+                "output_tokens": rng.randint(20, 2000),
+                "service_tier": "standard",
+            }
+            totals[0] += usage["input_tokens"]
+            totals[1] += usage["output_tokens"]
+            totals[2] += usage["cache_creation_input_tokens"]
+            totals[3] += usage["cache_read_input_tokens"]
+            start = rng.randrange(0, len(pool) - 2048)
+            assistant = {
+                **base, "type": "assistant",
+                "message": {
+                    "id": f"msg_{turn:08d}", "type": "message",
+                    "role": "assistant", "model": "claude-opus-4-1-20250805",
+                    "content": [
+                        {"type": "text",
+                         "text": pool[start:start + rng.randint(100, 2000)]},
+                        {"type": "tool_use", "id": f"toolu_{turn:08d}",
+                         "name": "Read", "input": {"file_path": "src/app.py"}},
+                    ],
+                    "usage": usage,
+                },
+            }
+            size = int(rng.expovariate(1 / 12_000)) + 200
+            start = rng.randrange(0, len(pool) - min(size, len(pool) - 1))
+            content = pool[start:start + size]
+            if turn % 17 == 0:
+                # A Read of a transcript: assistant-looking JSON inside a
+                # string, which only the outer "type" distinguishes.
+                content = json.dumps({"type": "assistant", "message": {
+                    "usage": {"input_tokens": 999_999}}}) + "\n" + content
+            user = {
+                **base, "type": "user",
+                "message": {"role": "user", "content": [
+                    {"type": "tool_result", "tool_use_id": f"toolu_{turn:08d}",
+                     "content": content},
+                ]},
+                "toolUseResult": {"type": "text", "file": {
+                    "filePath": "src/app.py", "numLines": size // 40}},
+            }
+            for record in (assistant, user):
+                line = json.dumps(record, separators=(",", ":")) + "\n"
+                f.write(line)
+                written += len(line)
+    return totals
+
+
+def _project_dir_name(path: Path) -> str:
+    # Claude Code's project hash, as telemetry-stamp computes it.
+    name = str(path).replace("/", "-")
+    return name if name.startswith("-") else "-" + name
+
+
+def generate(root: Path, profile: Profile, seed: int = 0) -> Fixture:
+    """Build a fresh fixture for ``profile`` under ``root`` (replaced)."""
+    shutil.rmtree(root, ignore_errors=True)
+    project = root / "project"
+    project.mkdir(parents=True)
+    rng = random.Random(seed)
+    _write_beans(project, profile, rng)
+    _write_reports(project, profile, rng)
+    _write_source(project, rng)
+    _init_repo(project)
+    transcript = (root / "home" / ".claude" / "projects"
+                  / _project_dir_name(project.resolve())
+                  / f"{BENCH_SESSION}.jsonl")
+    totals = _write_transcript(transcript, profile.transcript_mb, rng)
+    info = {
+        "version": FIXTURE_VERSION,
+        "seed": seed,
+        "profile": profile.to_json(),
+        "transcript": str(transcript),
+        "transcript_bytes": transcript.stat().st_size,
+        "usage_totals": totals,
+    }
+    (root / "fixture.json").write_text(json.dumps(info, indent=2) + "\n",
+                                       encoding="utf-8")
+    return Fixture(root, info)
+
+
+def ensure_fixture(root: Path, profile: Profile, seed: int = 0) -> Fixture:
+    """The fixture at ``root``, generated first unless an identical one
+    (same version, profile and seed) is already there."""
+    try:
+        info = json.loads((root / "fixture.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        info = None
+    if (
+        isinstance(info, dict)
+        and info.get("version") == FIXTURE_VERSION
+        and info.get("seed") == seed
+        and info.get("profile") == profile.to_json()
+        and os.path.isfile(info.get("transcript", ""))
+    ):
+        return Fixture(root, info)
+    return generate(root, profile, seed)
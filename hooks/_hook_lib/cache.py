@@ -0,0 +1,161 @@
+"""Stat-validated memo caches shared by the hooks.
+
+A one-shot hook process gets little from caching, but the resident hook
+server (hook-server.py) keeps the hook modules imported across tool calls,
+so anything memoized here stays warm between invocations. Every entry is
+validated against the ``stat`` signature of the files it was derived from
+(mtime, size, inode), so a long-lived process never serves data older than
+what is on disk: an edited pricing file, a new VDD report or a branch
+switch changes the signature and forces a recompute.
+
+:func:`disk_memo` adds a second tier for values that are expensive to
+derive (anything behind a ``git`` subprocess): the same stat-validated
+entries, persisted in ``/tmp`` so that one-shot hook processes share them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable, TypeVar
+
+from .fileio import atomic_write_text
+
+__all__ = [
+    "memo",
+    "disk_memo",
+    "disk_cache_path",
+    "stat_signature",
+    "list_dir_names",
+    "find_project_root",
+    "clear",
+]
+
+T = TypeVar("T")
+
+# (namespace, key) -> (stat signature, value)
+_MEMO: dict[tuple[str, object], tuple[tuple, object]] = {}
+# Hard bound so a long-lived server cannot grow without limit.
+_MEMO_MAX = 4096
+# Entries kept per disk_memo namespace file (oldest dropped first).
+_DISK_MAX = 256
+
+
+def stat_signature(paths: Iterable[Path]) -> tuple:
+    """(mtime_ns, size, inode) for each path; None for missing paths."""
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def memo(
+    namespace: str, key: object, watch: Iterable[Path],
+    compute: Callable[[], T],
+) -> T:
+    """Return the cached value for (namespace, key), recomputing it when
+    the stat signature of any watched path has changed."""
+    sig = stat_signature(watch)
+    hit = _MEMO.get((namespace, key))
+    if hit is not None and hit[0] == sig:
+        return hit[1]  # type: ignore[return-value]
+    value = compute()
+    _store(namespace, key, sig, value)
+    return value
+
+
+def _store(namespace: str, key: object, sig: tuple, value: object) -> None:
+    if len(_MEMO) >= _MEMO_MAX:
+        _MEMO.clear()
+    _MEMO[(namespace, key)] = (sig, value)
+
+
+def disk_cache_path(namespace: str) -> Path:
+    """The /tmp file backing one :func:`disk_memo` namespace."""
+    return Path(f"/tmp/.foundry-cache-{namespace}.json")
+
+
+def disk_memo(
+    namespace: str, key: str, watch: Iterable[Path],
+    compute: Callable[[], T],
+) -> T:
+    """:func:`memo` backed by a per-namespace JSON file in /tmp.
+
+    The value must be JSON-serializable. A corrupt or unreadable cache file
+    is treated as empty; failing to write it only costs the next process a
+    recompute.
+    """
+    sig = stat_signature(watch)
+    hit = _MEMO.get((namespace, key))
+    if hit is not None and hit[0] == sig:
+        return hit[1]  # type: ignore[return-value]
+
+    path = disk_cache_path(namespace)
+    wire_sig = [list(s) if s is not None else None for s in sig]
+    try:
+        entries = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(entries, dict):
+            entries = {}
+    except (OSError, ValueError):
+        entries = {}
+    entry = entries.get(key)
+    if isinstance(entry, list) and len(entry) == 2 and entry[0] == wire_sig:
+        value = entry[1]
+    else:
+        value = compute()
+        entries.pop(key, None)
+        entries[key] = [wire_sig, value]
+        while len(entries) > _DISK_MAX:
+            entries.pop(next(iter(entries)))
+        try:
+            atomic_write_text(path, json.dumps(entries))
+        except OSError:
+            pass
+    _store(namespace, key, sig, value)
+    return value  # type: ignore[return-value]
+
+
+def clear() -> None:
+    """Drop every cached entry."""
+    _MEMO.clear()
+
+
+def list_dir_names(directory: Path, pattern: str = "*") -> list[str]:
+    """Sorted names of entries in ``directory`` matching ``pattern``.
+
+    Cached on the directory's own stat signature, which changes whenever
+    an entry is added, removed or renamed. Returns [] if it is missing.
+    """
+    def compute() -> list[str]:
+        if not directory.is_dir():
+            return []
+        return sorted(p.name for p in directory.glob(pattern))
+
+    return memo("listdir", (str(directory), pattern), [directory], compute)
+
+
+_ROOTS: dict[Path, Path] = {}
+
+
+def find_project_root(start: Path) -> Path:
+    """Nearest ancestor of ``start`` containing ``ai/beans``.
+
+    Returns the filesystem root when none is found (matching the loop the
+    bean hooks have always used). Only found roots are cached: a project
+    does not stop being one, but a directory may become one.
+    """
+    cached = _ROOTS.get(start)
+    if cached is not None:
+        return cached
+    root = start
+    while root != root.parent:
+        if (root / "ai" / "beans").is_dir():
+            _ROOTS[start] = root
+            return root
+        root = root.parent
+    return root
@@ -0,0 +1,122 @@
+"""Per-session memo of safety-hook decisions.
+
+Agents re-issue the same calls all session long: ``git status``, the test
+command, another edit to the same file. bash_safety and write_safety decide
+those by pure rules — the decision follows from the tool input, the
+project's policy file and, for bash_safety's merge rule, the current
+branch — so a repeat can be answered from memory instead of re-evaluated.
+
+A :class:`DecisionCache` keeps one LRU of decisions per session (at most
+:data:`MAX_ENTRIES` each, and :data:`MAX_SESSIONS` sessions). An entry is
+keyed by :func:`decision_key`: a digest of the tool name and its input as
+the hook normalized it, with the policy version alongside. Each session
+remembers the branch its entries were decided on and drops them all when
+the branch changes. Only decisions fully determined by that key may be
+stored — a rule that looks at the working tree or asks git anything but the
+branch has to be decided afresh.
+
+The cache lives in the hook module that owns it, so it pays off under the
+resident hook server (hook-server.py) and is dropped with the module when
+the hook script is edited and re-imported; a one-shot hook process starts
+empty.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+
+__all__ = [
+    "MAX_ENTRIES",
+    "MAX_SESSIONS",
+    "MISS",
+    "DecisionCache",
+    "decision_key",
+]
+
+MAX_ENTRIES = 512
+MAX_SESSIONS = 16
+
+# What DecisionCache.get returns when nothing is cached (None is a
+# decision: allow).
+MISS = object()
+
+
+def decision_key(tool_name: str, normalized: str,
+                 version: object) -> tuple[bytes, object]:
+    """The cache key of one call: a digest of ``tool_name`` and its
+    ``normalized`` input (a long heredoc is not kept whole), and the
+    policy ``version``."""
+    digest = hashlib.blake2b(
+        f"{tool_name}\0{normalized}".encode("utf-8", "surrogatepass"),
+        digest_size=16).digest()
+    return digest, version
+
+
+class _Session:
+    __slots__ = ("branch", "decisions")
+
+    def __init__(self, branch: str) -> None:
+        self.branch = branch
+        self.decisions: OrderedDict[tuple, str | None] = OrderedDict()
+
+
+class DecisionCache:
+    """Decisions per session, LRU-bounded, dropped on a branch change."""
+
+    __slots__ = ("max_entries", "max_sessions", "hits", "misses",
+                 "_sessions")
+
+    def __init__(self, max_entries: int = MAX_ENTRIES,
+                 max_sessions: int = MAX_SESSIONS) -> None:
+        self.max_entries = max_entries
+        self.max_sessions = max_sessions
+        self.hits = 0
+        self.misses = 0
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+
+    def _decisions(self, session_id: str, branch: str) -> OrderedDict:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session(branch)
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+            if session.branch != branch:
+                session.branch = branch
+                session.decisions.clear()
+        return session.decisions
+
+    def get(self, session_id: str, branch: str, key: tuple) -> object:
+        """The decision cached for ``key``, or :data:`MISS`."""
+        decisions = self._decisions(session_id, branch)
+        decision = decisions.get(key, MISS)
+        if decision is MISS:
+            self.misses += 1
+        else:
+            decisions.move_to_end(key)
+            self.hits += 1
+        return decision
+
+    def put(self, session_id: str, branch: str, key: tuple,
+            decision: str | None) -> None:
+        decisions = self._decisions(session_id, branch)
+        decisions[key] = decision
+        if len(decisions) > self.max_entries:
+            decisions.popitem(last=False)
+
+    def decide(self, session_id: str, branch: str, key: tuple,
+               compute) -> str | None:
+        """The cached decision for ``key``, computed on a miss."""
+        decision = self.get(session_id, branch, key)
+        if decision is MISS:
+            decision = compute()
+            self.put(session_id, branch, key, decision)
+        return decision
+
+    def clear(self) -> None:
+        self._sessions.clear()
+
+    def __len__(self) -> int:
+        return sum(len(s.decisions) for s in self._sessions.values())
@@ -0,0 +1,161 @@
+"""Lock-safe, atomic file writes for the telemetry paths.
+
+Several workers (``/long-run --fast N``, parallel ``/spawn-task`` waves) can
+stamp the same bean at once. Every telemetry write goes through here:
+
+- :func:`atomic_write_text` / :func:`atomic_write_bytes` write a temp file
+  next to the target and ``os.replace`` it into place, so a reader never
+  sees a torn file — only the old or the new content. The temp file is
+  created fresh (``O_EXCL``, a random name), never opened through whatever
+  already sits at its path.
+- :func:`file_lock` serializes read-modify-write cycles on one file with an
+  exclusive ``flock``. The lock lives on a sidecar keyed by the target's
+  real path, in a directory of this user's own (:func:`lock_dir`), so no
+  lock files appear next to tracked files and no other user can hold or
+  replace them.
+
+Locking is advisory and needs ``fcntl`` (POSIX); where it is unavailable
+:func:`file_lock` degrades to a no-op and writes stay atomic.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import stat
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore[assignment]
+
+__all__ = [
+    "LOCK_TIMEOUT",
+    "LockTimeout",
+    "lock_dir",
+    "lock_path",
+    "file_lock",
+    "atomic_write_bytes",
+    "atomic_write_text",
+]
+
+# Well under the 60s hook timeout; a stamp holds a lock for milliseconds.
+LOCK_TIMEOUT = 10.0
+_LOCK_POLL = 0.01
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a file lock could not be taken within the timeout."""
+
+
+def _private_dir(path: str) -> bool:
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+            and not st.st_mode & 0o077)
+
+
+def lock_dir() -> Path:
+    """This user's directory for lock sidecars, created mode 0700:
+    ``$XDG_RUNTIME_DIR/foundry-locks``, else ``~/.cache/foundry-locks``
+    (``$XDG_CACHE_HOME`` if set). Raises OSError if it is not private."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and _private_dir(runtime):
+        directory = os.path.join(runtime, "foundry-locks")
+    else:
+        cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache")
+        if not os.path.isabs(cache):
+            raise OSError("no home directory for lock files")
+        os.makedirs(cache, exist_ok=True)
+        directory = os.path.join(cache, "foundry-locks")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    if not _private_dir(directory):
+        raise OSError(f"{directory} is not a private directory of this user")
+    return Path(directory)
+
+
+def lock_path(path: Path) -> Path:
+    """Sidecar lock file for ``path`` (shared by every alias of it)."""
+    real = os.path.realpath(path)
+    key = hashlib.sha1(real.encode("utf-8")).hexdigest()[:16]
+    return lock_dir() / f"{key}.lock"
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float = LOCK_TIMEOUT):
+    """Hold an exclusive lock on ``path`` for the duration of the block.
+
+    Raises :class:`LockTimeout` if another process holds it for longer than
+    ``timeout`` seconds.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(lock_path(path), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"timed out locking {path}") from None
+                time.sleep(_LOCK_POLL)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Replace ``path`` with ``data`` in one rename.
+
+    Writes through a symlink to its target and keeps an existing file's
+    permission bits (a new file gets the usual umask-filtered 0666).
+    """
+    target = Path(os.path.realpath(path))
+    try:
+        mode: int | None = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = None
+    while True:
+        tmp = target.with_name(
+            f".{target.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8") -> None:
+    """:func:`atomic_write_bytes` for text."""
+    atomic_write_bytes(path, text.encode(encoding))
@@ -0,0 +1,312 @@
+"""Git context shared by the hooks: branch, toplevel, common-dir, merge-base.
+
+Most of what the hooks ask git for is sitting in plain files, so it is read
+directly instead of forking ``git``:
+
+- the repository is found by walking up to ``.git`` — a directory, or the
+  ``gitdir: <path>`` file a worktree or submodule uses;
+- the common dir (shared by all worktrees) comes from ``<git-dir>/commondir``;
+- the branch is the ``ref: refs/heads/<name>`` line in ``<git-dir>/HEAD``.
+
+The walk itself is memoized per directory (see :func:`git_dirs`), so the
+branch costs a few ``stat`` calls once the process has seen the directory.
+
+Lookups that do need git (merge-base, commit dates, ``status``) are memoized
+on the stat signature of HEAD and the refs they depend on, both in-process
+and on disk (:func:`_hook_lib.cache.disk_memo`), so a one-shot hook process
+reuses what the previous one computed until HEAD or a branch tip moves.
+Anything the direct reads cannot make sense of (unusual HEAD contents,
+``GIT_DIR`` set in the environment) falls back to the ``git`` command.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import re
+import subprocess
+from pathlib import Path
+
+from .cache import disk_memo, list_dir_names, memo
+
+__all__ = [
+    "GitDirs",
+    "git_dirs",
+    "find_head_file",
+    "current_branch",
+    "toplevel",
+    "common_dir",
+    "main_repo_root",
+    "linked_worktrees",
+    "merge_base",
+    "first_commit_date",
+    "porcelain_status",
+]
+
+GIT_TIMEOUT = 5
+_SHA_RE = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+_HEADS_PREFIX = "ref: refs/heads/"
+
+
+class GitDirs:
+    """Where one checkout keeps its files.
+
+    ``toplevel`` is the working-tree root (a worktree's own root inside a
+    worktree), ``git_dir`` holds its HEAD, and ``common_dir`` holds the refs
+    and objects shared by every worktree of the repository.
+    """
+
+    __slots__ = ("toplevel", "git_dir", "common_dir", "head")
+
+    def __init__(self, toplevel: Path, git_dir: Path, common_dir: Path) -> None:
+        self.toplevel = toplevel
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.head = git_dir / "HEAD"
+
+    def ref_files(self, branch: str) -> list[Path]:
+        """Files whose stat changes when ``branch`` moves."""
+        return [
+            self.common_dir / "refs" / "heads" / branch,
+            self.common_dir / "packed-refs",
+        ]
+
+
+def _git(args: list[str], cwd: Path | None = None) -> str | None:
+    """stdout of ``git <args>``, or None on failure."""
+    try:
+        result = subprocess.run(
+            ["git", *args], capture_output=True, text=True,
+            timeout=GIT_TIMEOUT, cwd=cwd,
+        )
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def _dirs_from_git(cwd: Path) -> GitDirs | None:
+    out = _git(
+        ["rev-parse", "--show-toplevel", "--absolute-git-dir",
+         "--git-common-dir"],
+        cwd,
+    )
+    if not out:
+        return None
+    lines = out.splitlines()
+    if len(lines) != 3:
+        return None
+    top, git_dir, common = (Path(line) for line in lines)
+    if not common.is_absolute():
+        common = (cwd / common).resolve()
+    return GitDirs(top.resolve(), git_dir, common)
+
+
+def _read_common_dir(git_dir: Path) -> Path:
+    try:
+        text = (git_dir / "commondir").read_text(encoding="utf-8").strip()
+    except OSError:
+        return git_dir
+    common = Path(text)
+    if not common.is_absolute():
+        common = (git_dir / common).resolve()
+    return common
+
+
+@functools.lru_cache(maxsize=256)
+def _dot_git_paths(start: str) -> tuple[str, ...]:
+    """Where a ``.git`` entry for ``start`` could be, nearest first."""
+    paths = []
+    directory = start
+    while True:
+        paths.append(os.path.join(directory, ".git"))
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return tuple(paths)
+        directory = parent
+
+
+def _find_dirs(candidates: tuple[str, ...]) -> tuple[GitDirs | None, int]:
+    """The checkout the first ``.git`` of ``candidates`` describes, and
+    how many candidates were looked at to decide."""
+    for depth, candidate in enumerate(candidates, 1):
+        dot_git = Path(candidate)
+        directory = dot_git.parent
+        if dot_git.is_dir():
+            return GitDirs(directory, dot_git, _read_common_dir(dot_git)), depth
+        if dot_git.is_file():
+            try:
+                text = dot_git.read_text(encoding="utf-8").strip()
+            except OSError:
+                return None, depth
+            if not text.startswith("gitdir:"):
+                return None, depth
+            git_dir = Path(text[len("gitdir:"):].strip())
+            if not git_dir.is_absolute():
+                git_dir = (directory / git_dir).resolve()
+            return GitDirs(directory, git_dir, _read_common_dir(git_dir)), depth
+    return None, len(candidates)
+
+
+# start directory -> how many of its candidate .git paths decided the walk.
+_DEPTHS: dict[str, int] = {}
+
+
+def git_dirs(cwd: Path | None = None) -> GitDirs | None:
+    """Resolve the checkout containing ``cwd`` (default: the process cwd).
+
+    Returns None outside a repository. The walk is memoized per directory
+    on the stat of each ``.git`` it looked at — those above the one found
+    cannot matter — so a new, moved or removed checkout is noticed.
+    """
+    if os.environ.get("GIT_DIR"):
+        return _dirs_from_git((cwd or Path.cwd()).resolve())
+    # os.getcwd() is already free of symlinks; resolve() only what the
+    # caller passes.
+    start = str(cwd.resolve()) if cwd is not None else os.getcwd()
+    candidates = _dot_git_paths(start)
+
+    def compute() -> GitDirs | None:
+        dirs, depth = _find_dirs(candidates)
+        if len(_DEPTHS) >= 256:
+            _DEPTHS.clear()
+        _DEPTHS[start] = depth
+        return dirs
+
+    # A changed depth changes the watch list and so the signature: the
+    # first walk after it is recomputed once with the new list.
+    watch = candidates[:_DEPTHS.get(start, len(candidates))]
+    return memo("git-dirs", start, watch, compute)
+
+
+def find_head_file(cwd: Path | None = None) -> Path | None:
+    """The HEAD file of the checkout containing ``cwd``, or None."""
+    dirs = git_dirs(cwd)
+    return dirs.head if dirs is not None else None
+
+
+def _read_branch(dirs: GitDirs) -> str:
+    try:
+        text = dirs.head.read_text(encoding="utf-8").strip()
+    except OSError:
+        text = ""
+    if text.startswith(_HEADS_PREFIX):
+        return text[len(_HEADS_PREFIX):]
+    if _SHA_RE.match(text):
+        return ""  # detached HEAD, as `git branch --show-current` reports
+    return _git(["branch", "--show-current"], dirs.toplevel) or ""
+
+
+def current_branch(cwd: Path | None = None) -> str:
+    """Current git branch, or '' when detached / not in a repo."""
+    dirs = git_dirs(cwd)
+    if dirs is None:
+        return ""
+    return memo("branch", dirs.head, [dirs.head],
+                lambda: _read_branch(dirs))
+
+
+def toplevel(cwd: Path | None = None) -> Path | None:
+    """Working-tree root (``git rev-parse --show-toplevel``)."""
+    dirs = git_dirs(cwd)
+    return dirs.toplevel if dirs is not None else None
+
+
+def common_dir(cwd: Path | None = None) -> Path | None:
+    """Shared git dir (``git rev-parse --git-common-dir``, absolute)."""
+    dirs = git_dirs(cwd)
+    return dirs.common_dir if dirs is not None else None
+
+
+def main_repo_root(cwd: Path | None = None) -> Path | None:
+    """Root of the main checkout — the common dir's parent.
+
+    Inside a worktree this is the repository the worktree was added from,
+    not the worktree itself.
+    """
+    common = common_dir(cwd)
+    return common.parent if common is not None else None
+
+
+def linked_worktrees(cwd: Path | None = None) -> list[Path]:
+    """Roots of the repository's linked worktrees (not the main checkout).
+
+    Read from ``<common-dir>/worktrees/<name>/gitdir``, which holds the
+    path of each worktree's ``.git`` file; worktrees whose directory is
+    gone are left out.
+    """
+    common = common_dir(cwd)
+    if common is None:
+        return []
+    admin = common / "worktrees"
+    roots = []
+    for name in list_dir_names(admin):
+        try:
+            text = (admin / name / "gitdir").read_text(encoding="utf-8")
+        except OSError:
+            continue
+        root = Path(text.strip()).parent
+        if root.is_dir():
+            roots.append(root)
+    return roots
+
+
+def _head_watch(dirs: GitDirs, *branches: str) -> list[Path]:
+    watch = [dirs.head]
+    for branch in branches:
+        watch.extend(dirs.ref_files(branch))
+    return watch
+
+
+def merge_base(base: str = "main", cwd: Path | None = None) -> str | None:
+    """``git merge-base <base> HEAD``, or None if either side is missing."""
+    dirs = git_dirs(cwd)
+    if dirs is None:
+        return None
+    branch = current_branch(cwd)
+    watch = _head_watch(dirs, base, *([branch] if branch else []))
+    return disk_memo(
+        "git-context", f"merge-base:{dirs.git_dir}:{base}", watch,
+        lambda: _git(["merge-base", base, "HEAD"], dirs.toplevel) or None,
+    )
+
+
+def first_commit_date(since: str, cwd: Path | None = None) -> str | None:
+    """Author date (ISO 8601) of the oldest commit in ``since..HEAD``.
+
+    None when the range is empty or git fails.
+    """
+    dirs = git_dirs(cwd)
+    if dirs is None:
+        return None
+    branch = current_branch(cwd)
+    watch = _head_watch(dirs, *([branch] if branch else []))
+
+    def compute() -> str | None:
+        out = _git(["log", "--format=%aI", "--reverse", f"{since}..HEAD"],
+                   dirs.toplevel)
+        return out.split("\n")[0] if out else None
+
+    return disk_memo(
+        "git-context", f"first-commit:{dirs.git_dir}:{since}", watch, compute,
+    )
+
+
+def porcelain_status(cwd: Path | None = None) -> str | None:
+    """``git status --porcelain`` output; None outside a repo or on failure.
+
+    Not cached — working-tree edits do not touch anything git tracks until
+    they are staged — but it skips the subprocess entirely outside a repo.
+    """
+    dirs = git_dirs(cwd)
+    if dirs is None:
+        return None
+    try:
+        result = subprocess.run(
+            ["git", "status", "--porcelain"], capture_output=True, text=True,
+            timeout=10, cwd=cwd,
+        )
+    except Exception:
+        return None
+    return result.stdout
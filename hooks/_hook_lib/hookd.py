@@ -0,0 +1,143 @@
+"""Wire protocol between hook-client.py and the resident hook-server.py.
+
+Kept to stdlib modules that are cheap to import (no ``pathlib``), because
+the client shim pays this import on every tool call.
+
+One request per connection on a UNIX socket in a directory only this user
+can use — under ``$XDG_RUNTIME_DIR``, else ``/tmp/.foundry-hookd-<uid>``
+(mode 0700, checked before use) — so nobody else can plant a socket the
+client would hand its environment to, or answer in place of the server:
+
+    request:  <header JSON>\\n<payload bytes>
+              header = {"op": "run", "hook": name, "args": [...],
+                        "cwd": ..., "env": {...}, "len": len(payload)}
+              or {"op": "ping"} / {"op": "shutdown"}
+    response: <JSON>\\n
+              run  -> {"exit": int, "stdout": str, "stderr": str}
+                      or {"stale": true} when the server's code is out of
+                      date (the client then runs the hook itself)
+              ping -> {"ok": true, "pid": int, ...}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import stat
+
+__all__ = [
+    "CONNECT_TIMEOUT",
+    "REPLY_TIMEOUT",
+    "NoReply",
+    "socket_dir",
+    "socket_path",
+    "owned_socket",
+    "read_message",
+    "request",
+]
+
+# Connecting to a live server is sub-millisecond; anything slower means it
+# is gone and the client should fall back instead of waiting.
+CONNECT_TIMEOUT = 0.05
+# Hook timeout ceiling from hook-policy.md.
+REPLY_TIMEOUT = 60.0
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+class NoReply(Exception):
+    """The request was sent but no reply came: the server may have acted
+    on it, so it must not simply be run again."""
+
+
+def _private_dir(path: str) -> bool:
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+            and not st.st_mode & 0o077)
+
+
+def socket_dir() -> str | None:
+    """This user's private directory for the socket (created on first
+    use); None when there is none to be had."""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base and _private_dir(base):
+        directory = os.path.join(base, "foundry-hookd")
+    else:
+        directory = f"/tmp/.foundry-hookd-{os.getuid()}"
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    return directory if _private_dir(directory) else None
+
+
+def socket_path() -> str | None:
+    """Socket for this user and this kit checkout (one server per kit);
+    None without a private directory to put it in."""
+    directory = socket_dir()
+    if directory is None:
+        return None
+    key = hashlib.sha1(HOOKS_DIR.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directory, f"hookd-{key}.sock")
+
+
+def owned_socket(path: str) -> os.stat_result | None:
+    """``lstat`` of ``path`` if it is a socket this user owns, else None."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid():
+        return st
+    return None
+
+
+def read_message(conn: socket.socket) -> tuple[dict, bytes]:
+    """Read one header line (and its ``len`` payload bytes) from ``conn``."""
+    buf = b""
+    while b"\n" not in buf:
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed before header")
+        buf += chunk
+    head, _, rest = buf.partition(b"\n")
+    header = json.loads(head)
+    need = int(header.get("len", 0))
+    chunks = [rest]
+    have = len(rest)
+    while have < need:
+        chunk = conn.recv(min(1 << 20, need - have))
+        if not chunk:
+            raise ConnectionError("connection closed before payload")
+        chunks.append(chunk)
+        have += len(chunk)
+    return header, b"".join(chunks)[:need]
+
+
+def request(header: dict, payload: bytes = b"") -> dict | None:
+    """Send one request to the server. None if it is not reachable (nothing
+    was sent); :class:`NoReply` if it was sent and went unanswered."""
+    path = socket_path()
+    if path is None or owned_socket(path) is None:
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.settimeout(CONNECT_TIMEOUT)
+            conn.connect(path)
+            conn.settimeout(REPLY_TIMEOUT)
+            header = dict(header, len=len(payload))
+            conn.sendall(json.dumps(header).encode("utf-8") + b"\n" + payload)
+        except OSError:
+            return None  # a payload cut short is never run
+        try:
+            reply, _ = read_message(conn)
+        except (OSError, ValueError, ConnectionError) as e:
+            raise NoReply(f"hook server at {path}: {e}") from e
+    return reply
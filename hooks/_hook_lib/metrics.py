@@ -0,0 +1,176 @@
+"""Hook latency records: a bounded, lock-free ring of JSON lines.
+
+hooks/dispatch.py wraps every hook call in a :class:`Probe`, which records
+wall time, subprocesses started, bytes read, the decision (exit code),
+the payload size and the session id. hooks/hook-metrics.py reports on the records.
+
+Storage is a two-segment ring under the project:
+``.claude/hook-metrics/current.jsonl`` and ``previous.jsonl``. Each record
+is one ``O_APPEND`` write (well under ``PIPE_BUF``, so concurrent hooks never
+interleave); when ``current`` passes :data:`SEGMENT_BYTES` the writer that
+notices renames it over ``previous``. No lock is taken: a racing rotation
+can drop a handful of records, which metrics can afford. The directory
+carries its own ``.gitignore`` so the records never show up as untracked
+files.
+
+Subprocesses are counted with an audit hook (``subprocess.Popen``,
+``os.system``, ``os.posix_spawn``, ``os.exec``); bytes read come from
+``rchar`` in /proc/self/io, so they are None off Linux. Set
+``CLAUDE_KIT_HOOK_METRICS=0`` to turn recording off.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+
+__all__ = [
+    "SEGMENT_BYTES",
+    "enabled",
+    "metrics_dir",
+    "Probe",
+    "append_record",
+    "read_records",
+    "percentile",
+    "format_table",
+]
+
+SEGMENT_BYTES = 512 * 1024
+_SPAWN_EVENTS = frozenset(
+    ("subprocess.Popen", "os.system", "os.posix_spawn", "os.exec")
+)
+_spawned = 0
+_audit_installed = False
+
+
+def enabled() -> bool:
+    return os.environ.get("CLAUDE_KIT_HOOK_METRICS", "1") != "0"
+
+
+def metrics_dir(project_dir: str | None = None) -> str:
+    """``<project>/.claude/hook-metrics`` (project from CLAUDE_PROJECT_DIR,
+    else the cwd)."""
+    base = project_dir or os.environ.get("CLAUDE_PROJECT_DIR") or os.getcwd()
+    return os.path.join(base, ".claude", "hook-metrics")
+
+
+def _audit(event: str, _args: tuple) -> None:
+    global _spawned
+    if event in _SPAWN_EVENTS:
+        _spawned += 1
+
+
+def _install_audit_hook() -> None:
+    global _audit_installed
+    if not _audit_installed:
+        sys.addaudithook(_audit)  # cannot be removed; it is one compare
+        _audit_installed = True
+
+
+def _bytes_read() -> int | None:
+    try:
+        with open("/proc/self/io", "rb") as f:
+            for line in f:
+                if line.startswith(b"rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class Probe:
+    """Measures one hook call from construction to :meth:`finish`."""
+
+    __slots__ = ("_t0", "_spawned0", "_read0")
+
+    def __init__(self) -> None:
+        _install_audit_hook()
+        self._read0 = _bytes_read()
+        self._spawned0 = _spawned
+        self._t0 = time.perf_counter()
+
+    def finish(self, **fields: object) -> dict:
+        """Build the record for the finished call (``fields`` are added)."""
+        ms = (time.perf_counter() - self._t0) * 1000
+        read1 = _bytes_read()
+        read = (read1 - self._read0
+                if read1 is not None and self._read0 is not None else None)
+        return {
+            "ts": round(time.time(), 3),
+            "ms": round(ms, 3),
+            "subprocs": _spawned - self._spawned0,
+            "read_bytes": read,
+            **fields,
+        }
+
+
+def _ensure_dir(directory: str) -> None:
+    if os.path.isdir(directory):
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".gitignore"), "w",
+              encoding="utf-8") as f:
+        f.write("*\n")
+
+
+def append_record(record: dict, project_dir: str | None = None) -> None:
+    """Append one record to the ring; never raises."""
+    directory = metrics_dir(project_dir)
+    current = os.path.join(directory, "current.jsonl")
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+    try:
+        _ensure_dir(directory)
+        fd = os.open(current, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > SEGMENT_BYTES:
+            os.replace(current, os.path.join(directory, "previous.jsonl"))
+    except OSError:
+        pass
+
+
+def read_records(project_dir: str | None = None) -> list[dict]:
+    """Every readable record in the ring, oldest first."""
+    directory = metrics_dir(project_dir)
+    records: list[dict] = []
+    for name in ("previous.jsonl", "current.jsonl"):
+        try:
+            with open(os.path.join(directory, name), "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(rec, dict) and "ms" in rec:
+                        records.append(rec)
+        except OSError:
+            continue
+    return records
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list (0 for an empty one)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def format_table(headers: list[str], rows: list[list[str]]) -> str:
+    """A column-aligned markdown table."""
+    widths = [
+        max(len(h), *(len(r[i]) for r in rows)) if rows else len(h)
+        for i, h in enumerate(headers)
+    ]
+
+    def line(cells: list[str]) -> str:
+        return "| " + " | ".join(c.ljust(w) for c, w in zip(cells, widths)) + " |"
+
+    out = [line(headers), "|" + "|".join("-" * (w + 2) for w in widths) + "|"]
+    out.extend(line(r) for r in rows)
+    return "\n".join(out)
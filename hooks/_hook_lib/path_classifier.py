@@ -0,0 +1,327 @@
+"""Ordered path rules, compiled for one walk of a path's components.
+
+write_safety decides a file path by rule list: the first rule, in list
+order, that matches wins. Checked one by one, every rule is another pass
+over the path — a substring test, an ``endswith``, a name lookup — and a
+batch of paths repeats all of them per path.
+
+:class:`PathClassifier` compiles the rules into two tries and walks each
+once:
+
+- a component trie for :data:`PATH` rules — ``/etc`` (from the root),
+  ``.ssh*`` or ``.aws/credentials*`` (anywhere in the path): the path's
+  components are walked once, with the floating patterns tried from every
+  component on;
+- a trie of reversed names for :data:`NAME` and :data:`SUFFIX` rules
+  (``credentials``, ``.pem``), walked once over the last component from
+  its end; :data:`PREFIX` rules (``.env``) are one ``startswith`` with a
+  tuple.
+
+:meth:`PathClassifier.classify` decides a batch: the directory part of a
+path — all of it but the last component — is walked once per directory and
+remembered, so a batch of files in a few directories costs a name walk per
+file.
+
+Pattern syntax of :data:`PATH` rules: components separated by ``/``; a
+leading ``/`` anchors the pattern at the root (absolute paths only); a
+trailing ``*`` on the last component matches any component starting with
+it; a trailing ``/`` requires something under the match. A path matches
+when it is, or is under, a path the pattern matches: ``/etc`` covers
+``/etc`` and ``/etc/hosts``, ``.ssh*`` covers ``~/.ssh/config`` and
+``~/.sshrc``.
+
+Paths are taken lexically (``os.path.normpath``). When a path climbs out
+with ``..``, its components as written are classified as well and the
+earlier rule wins, so ``/x/.ssh/../y`` still counts as touching ``.ssh``.
+Anchored patterns see only the normalized path: ``/etc/../home/x`` is not
+under ``/etc``.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Iterable
+
+__all__ = [
+    "PATH",
+    "NAME",
+    "PREFIX",
+    "SUFFIX",
+    "PathRule",
+    "PathClassifier",
+    "components",
+    "forms",
+]
+
+PATH = "path"      # the path is, or is under, a component pattern
+NAME = "name"      # the last component equals the pattern
+PREFIX = "prefix"  # the last component starts with it
+SUFFIX = "suffix"  # the last component ends with it
+
+_KINDS = (PATH, NAME, PREFIX, SUFFIX)
+
+# Cached directory walks per classifier, dropped wholesale when full (as
+# cache.memo does) so a long-lived server stays bounded.
+_DIRS_MAX = 1024
+
+
+def components(path: str) -> tuple[bool, tuple[str, ...]]:
+    """(absolute, components) of ``path`` normalized lexically."""
+    normalized = os.path.normpath(path) if path else ""
+    parts = tuple(part for part in normalized.split("/")
+                  if part and part != ".")
+    return normalized.startswith("/"), parts
+
+
+def forms(path: str) -> list[tuple[bool, tuple[str, ...]]]:
+    """The :func:`components` of ``path`` to classify: normalized, and as
+    written too when it contains ``..`` — as a relative path, so that only
+    floating patterns apply to it."""
+    found = [components(path)]
+    written = path.split("/")
+    if ".." in written:
+        found.append((False, tuple(
+            part for part in written if part and part != ".")))
+    return found
+
+
+class PathRule:
+    """One pattern and what a match on it means.
+
+    ``action`` is opaque here, as for rule_engine.Rule. ``unless`` lists
+    last components a :data:`PREFIX` or :data:`SUFFIX` rule does not apply
+    to (``.env.example`` for ``.env``).
+    """
+
+    __slots__ = ("kind", "pattern", "action", "ignorecase", "unless")
+
+    def __init__(self, kind: str, pattern: str, action: object,
+                 ignorecase: bool = False, unless: Iterable[str] = ()) -> None:
+        if kind not in _KINDS:
+            raise ValueError(f"unknown path rule kind {kind!r}")
+        if not pattern.strip("/*"):
+            raise ValueError(f"empty path rule pattern {pattern!r}")
+        if ignorecase and kind in (PATH, PREFIX):
+            raise ValueError(f"{kind} rules are case-sensitive")
+        self.kind = kind
+        self.pattern = pattern
+        self.action = action
+        self.ignorecase = ignorecase
+        self.unless = frozenset(unless)
+
+    def matches(self, absolute: bool, parts: tuple[str, ...]) -> bool:
+        """Whether the rule matches the path ``parts`` — checked on its own,
+        the way :class:`PathClassifier` must agree with."""
+        if not parts:
+            return False
+        name = parts[-1]
+        if self.kind != PATH:
+            if name in self.unless:
+                return False
+            subject = name.lower() if self.ignorecase else name
+            pattern = self.pattern.lower() if self.ignorecase else self.pattern
+            if self.kind == NAME:
+                return subject == pattern
+            if self.kind == PREFIX:
+                return subject.startswith(pattern)
+            return subject.endswith(pattern)
+        anchored, steps, stem = _path_pattern(self.pattern)
+        if anchored and not absolute:
+            return False
+        for start in (0,) if anchored else range(len(parts)):
+            end = start + len(steps)
+            if parts[start:end] != steps:
+                continue
+            if stem is None or (end < len(parts)
+                                and parts[end].startswith(stem)):
+                return True
+        return False
+
+    def __repr__(self) -> str:
+        return f"PathRule({self.kind!r}, {self.pattern!r}, {self.action!r})"
+
+
+def _path_pattern(pattern: str) -> tuple[bool, tuple[str, ...], str | None]:
+    """(anchored, exact components, stem the next component must start
+    with — None if the exact components are the whole pattern)."""
+    steps = [part for part in pattern.split("/") if part]
+    stem = None
+    if pattern.endswith("/"):
+        stem = ""  # any component under the match
+    elif steps[-1].endswith("*"):
+        stem = steps.pop()[:-1]
+    return pattern.startswith("/"), tuple(steps), stem
+
+
+class _Node:
+    """A component-trie node: the rules a path matches once it reaches
+    here (``ends``), and those needing its next component to start with a
+    stem (``stems``, ``(stem, index)``)."""
+
+    __slots__ = ("children", "ends", "stems")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.ends: int | None = None
+        self.stems: list[tuple[str, int]] = []
+
+    def child(self, part: str) -> _Node:
+        node = self.children.get(part)
+        if node is None:
+            node = self.children[part] = _Node()
+        return node
+
+
+def _lowest(best: int | None, index: int | None) -> int | None:
+    if index is None:
+        return best
+    return index if best is None or index < best else best
+
+
+class _DirState:
+    """The walk of a directory part: the lowest rule already matched, and
+    the trie nodes still open for the component that follows."""
+
+    __slots__ = ("best", "open")
+
+    def __init__(self, best: int | None, open_nodes: tuple[_Node, ...]) -> None:
+        self.best = best
+        self.open = open_nodes
+
+
+class PathClassifier:
+    """An ordered path rule list, compiled for one walk per path."""
+
+    __slots__ = ("rules", "_anchored", "_floating", "_names", "_inames",
+                 "_prefixes", "_prefix_tuple", "_dirs")
+
+    def __init__(self, rules: Iterable[PathRule]) -> None:
+        self.rules = tuple(rules)
+        self._anchored = _Node()
+        self._floating = _Node()
+        # Reversed-name tries: char -> subtrie; "" -> ([indices of the
+        # suffixes], [indices of the whole names]) read so far.
+        self._names: dict = {}
+        self._inames: dict = {}
+        prefixes: list[tuple[str, int]] = []
+        for index, rule in enumerate(self.rules):
+            if rule.kind == PATH:
+                anchored, steps, stem = _path_pattern(rule.pattern)
+                node = self._anchored if anchored else self._floating
+                for part in steps:
+                    node = node.child(part)
+                if stem is None:
+                    node.ends = _lowest(node.ends, index)
+                else:
+                    node.stems.append((stem, index))
+            elif rule.kind == PREFIX:
+                prefixes.append((rule.pattern, index))
+            else:
+                trie = self._inames if rule.ignorecase else self._names
+                pattern = rule.pattern.lower() if rule.ignorecase else rule.pattern
+                for char in reversed(pattern):
+                    trie = trie.setdefault(char, {})
+                trie.setdefault("", ([], []))[rule.kind == NAME].append(index)
+        self._prefixes = tuple(prefixes)
+        self._prefix_tuple = tuple(prefix for prefix, _ in prefixes)
+        self._dirs: dict[tuple[bool, tuple[str, ...]], _DirState] = {}
+
+    # --- walking ---------------------------------------------------------
+
+    def _step(self, best: int | None, nodes: Iterable[_Node],
+              part: str) -> tuple[int | None, list[_Node]]:
+        """Advance the open ``nodes`` over one component."""
+        following = []
+        for node in nodes:
+            for stem, index in node.stems:
+                if part.startswith(stem):
+                    best = _lowest(best, index)
+            child = node.children.get(part)
+            if child is not None:
+                best = _lowest(best, child.ends)
+                following.append(child)
+        return best, following
+
+    def _dir_state(self, absolute: bool, parts: tuple[str, ...]) -> _DirState:
+        key = (absolute, parts)
+        state = self._dirs.get(key)
+        if state is not None:
+            return state
+        if parts:
+            parent = self._dir_state(absolute, parts[:-1])
+            best, following = self._step(
+                parent.best, (*parent.open, self._floating), parts[-1])
+        else:
+            best, following = None, [self._anchored] if absolute else []
+        state = _DirState(best, tuple(following))
+        if len(self._dirs) >= _DIRS_MAX:
+            self._dirs.clear()
+        self._dirs[key] = state
+        return state
+
+    def _name(self, best: int | None, name: str) -> int | None:
+        for trie, folded in ((self._names, False), (self._inames, True)):
+            if not trie:
+                continue
+            node = trie
+            for char in reversed(name.lower() if folded else name):
+                node = node.get(char)
+                if node is None:
+                    break
+                if "" in node:
+                    best = self._unless(best, node[""][0], name)
+            else:
+                if "" in node:
+                    best = self._unless(best, node[""][1], name)
+        if self._prefixes and name.startswith(self._prefix_tuple):
+            best = self._unless(best, [index for prefix, index in self._prefixes
+                                       if name.startswith(prefix)], name)
+        return best
+
+    def _unless(self, best: int | None, indices: list[int],
+                name: str) -> int | None:
+        """The lowest of ``best`` and the rules ``indices`` not excepting
+        ``name``."""
+        for index in indices:
+            if best is not None and best <= index:
+                break
+            if name not in self.rules[index].unless:
+                return index
+        return best
+
+    def _first(self, absolute: bool, parts: tuple[str, ...]) -> int | None:
+        if not parts:
+            return None
+        state = self._dir_state(absolute, parts[:-1])
+        best, _ = self._step(state.best, (*state.open, self._floating),
+                             parts[-1])
+        return self._name(best, parts[-1])
+
+    # --- public ----------------------------------------------------------
+
+    def first(self, path: str) -> int | None:
+        """Index of the first rule, in list order, matching ``path``; None
+        if none does."""
+        best = None
+        for absolute, parts in forms(path):
+            best = _lowest(best, self._first(absolute, parts))
+        return best
+
+    def match(self, path: str) -> PathRule | None:
+        """The first rule matching ``path``, or None."""
+        index = self.first(path)
+        return None if index is None else self.rules[index]
+
+    def classify(self, paths: Iterable[str]) -> list[PathRule | None]:
+        """:meth:`match` for each path; a repeated path is matched once and
+        a directory walked once."""
+        decided: dict[str, PathRule | None] = {}
+        result = []
+        for path in paths:
+            if path not in decided:
+                decided[path] = self.match(path)
+            result.append(decided[path])
+        return result
+
+    def __len__(self) -> int:
+        return len(self.rules)
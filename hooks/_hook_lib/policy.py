@@ -0,0 +1,246 @@
+"""Declarative hook policy: project-specific protected paths and commands.
+
+The safety hooks' own rules are Python (bash_safety.RULES, write_safety's
+checks); a project that needs more protection adds it to a policy file
+instead of forking them. The file layers like ``settings.json``: the kit
+ships ``hook-policy.json``, a project adds ``.claude/local/hook-policy.json``
+and claude-sync merges the two into ``.claude/hook-policy.json`` (lists
+are concatenated, duplicates dropped). Without a merged file — a plugin
+install, or the kit's own checkout — the kit's file applies alone.
+
+    {
+      "paths": [
+        {"prefix": "infra/prod", "message": "BLOCKED: ..."},
+        {"prefix": "infra/prod/README.md", "action": "allow"}
+      ],
+      "commands": [
+        {"pattern": "^terraform\\\\s+destroy\\\\b", "message": "BLOCKED: ..."},
+        {"pattern": "(^| )kubectl .*\\\\| sh( |$)", "scope": "shape",
+         "ignore_case": true}
+      ]
+    }
+
+``paths`` — a write to ``prefix`` or anything under it (whole path
+components: ``infra/prod`` does not cover ``infra/production``) is blocked;
+relative prefixes are taken from the project root, ``~`` is expanded. The
+longest matching prefix decides, so an ``allow`` entry carves an exception
+out of a protected tree (it never overrides write_safety's own rules).
+
+``commands`` — block rules checked after bash_safety's own, in the file's
+order, with bash_safety's scopes: ``command`` (default) matches each simple
+command, ``shape`` each command list's shape (``curl | sh``).
+
+The policy is compiled once per version of the file — its stat signature —
+into a prefix trie of path components and the command rules' patterns.
+That compiled form is kept in the resident hook server and, for one-shot
+hook processes, in a ``disk_memo`` file, so a hook call loads it instead
+of re-reading and re-validating the policy. Entries that are malformed (a
+bad regex, a missing field) are left out and reported on stderr by
+:func:`load_policy` each time it compiles or loads the policy afresh: by
+every one-shot hook call, but by the resident hook server only once per
+version of the file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from .cache import disk_memo, memo, stat_signature
+from .rule_engine import Rule, RuleSet
+
+__all__ = [
+    "POLICY_FILENAME",
+    "Policy",
+    "policy_path",
+    "compile_policy",
+    "load_policy",
+]
+
+POLICY_FILENAME = "hook-policy.json"
+# Bumped when the compiled form changes, so stale disk entries recompile.
+_WIRE_VERSION = 1
+
+_KIT_POLICY = Path(__file__).resolve().parent.parent.parent / POLICY_FILENAME
+_KIT_POLICY_FILE = str(_KIT_POLICY)
+
+_SCOPES = ("command", "shape")
+_ACTIONS = ("block", "allow")
+
+# Trie key of the entry ending at a node; path components are never empty.
+_END = ""
+
+
+def _project_dir() -> str:
+    return os.environ.get("CLAUDE_PROJECT_DIR") or os.getcwd()
+
+
+def _policy_file(root: str) -> str:
+    # Plain strings: load_policy runs on every Bash and write call.
+    merged = os.path.join(root, ".claude", POLICY_FILENAME)
+    return merged if os.path.exists(merged) else _KIT_POLICY_FILE
+
+
+def policy_path(project_dir: Path | None = None) -> Path:
+    """The policy in force: the project's merged file, else the kit's."""
+    return Path(_policy_file(str(project_dir or _project_dir())))
+
+
+def _components(path: str) -> list[str]:
+    return [part for part in path.split("/") if part]
+
+
+def _absolute(path: str, root: Path) -> str:
+    return os.path.normpath(os.path.join(root, os.path.expanduser(path)))
+
+
+def compile_policy(text: str, root: Path) -> dict:
+    """The compiled (JSON-serializable) form of a policy file's ``text``:
+    ``{"v", "trie", "commands": [[scope, pattern, message, flags]],
+    "errors"}``."""
+    errors: list[str] = []
+    trie: dict = {}
+    commands: list[list] = []
+    try:
+        policy = json.loads(text) if text.strip() else {}
+    except ValueError as e:
+        policy = {}
+        errors.append(f"not valid JSON ({e})")
+    if not isinstance(policy, dict):
+        errors.append("top level is not an object")
+        policy = {}
+
+    for i, entry in enumerate(policy.get("paths") or ()):
+        where = f"paths[{i}]"
+        if not isinstance(entry, dict) or not isinstance(
+                entry.get("prefix"), str) or not entry["prefix"]:
+            errors.append(f"{where}: needs a non-empty \"prefix\"")
+            continue
+        action = entry.get("action", "block")
+        if action not in _ACTIONS:
+            errors.append(f"{where}: action must be one of {_ACTIONS}")
+            continue
+        prefix = _absolute(entry["prefix"], root)
+        message = entry.get("message") or (
+            f"BLOCKED: {prefix} is protected by the project's hook policy")
+        node = trie
+        for part in _components(prefix):
+            node = node.setdefault(part, {})
+        # The first entry for a prefix wins: the shared layer comes first.
+        node.setdefault(_END, [action, str(message)])
+
+    for i, entry in enumerate(policy.get("commands") or ()):
+        where = f"commands[{i}]"
+        if not isinstance(entry, dict) or not isinstance(
+                entry.get("pattern"), str):
+            errors.append(f"{where}: needs a \"pattern\"")
+            continue
+        scope = entry.get("scope", "command")
+        if scope not in _SCOPES:
+            errors.append(f"{where}: scope must be one of {_SCOPES}")
+            continue
+        flags = re.IGNORECASE if entry.get("ignore_case") else 0
+        try:
+            Rule(entry["pattern"], None, flags)
+        except re.error as e:
+            errors.append(f"{where}: bad pattern ({e})")
+            continue
+        message = entry.get("message") or (
+            "BLOCKED: command is forbidden by the project's hook policy")
+        commands.append([scope, entry["pattern"], str(message), flags])
+
+    return {"v": _WIRE_VERSION, "trie": trie, "commands": commands,
+            "errors": errors}
+
+
+class Policy:
+    """A compiled policy, ready to match."""
+
+    __slots__ = ("path", "version", "trie", "commands", "errors",
+                 "command_rules", "shape_rules")
+
+    def __init__(self, path: Path, wire: dict, version: object = None) -> None:
+        self.path = path
+        # Changes whenever the compiled form may: the file, its stat
+        # signature, or the project root relative prefixes resolve against.
+        self.version = version
+        self.trie: dict = wire["trie"]
+        self.commands: list[tuple[str, str, str, int]] = [
+            tuple(rule) for rule in wire["commands"]]
+        self.errors: list[str] = wire["errors"]
+        self.command_rules = self._rules("command")
+        self.shape_rules = self._rules("shape")
+
+    def _rules(self, scope: str) -> RuleSet:
+        # Actions carry the rule's place in the file: the two scopes are
+        # searched apart, and the earliest hit across both wins.
+        return RuleSet(Rule(pattern, (order, message), flags)
+                       for order, (rule_scope, pattern, message, flags)
+                       in enumerate(self.commands) if rule_scope == scope)
+
+    def path_block(self, path: str) -> str | None:
+        """The block message for writing ``path`` (absolute, normalized),
+        or None to allow it."""
+        node = self.trie
+        decided = node.get(_END)
+        for part in _components(path):
+            node = node.get(part)
+            if node is None:
+                break
+            decided = node.get(_END, decided)
+        if decided is None or decided[0] == "allow":
+            return None
+        return decided[1]
+
+    def command_block(self, texts, shapes) -> str | None:
+        """The block message for a command line given as its simple
+        commands' ``texts`` and its ``shapes``, or None to allow it."""
+        if not self.commands:
+            return None
+        best: tuple[int, str] | None = None
+        for rules, subjects in ((self.command_rules, texts),
+                                (self.shape_rules, shapes)):
+            if not len(rules):
+                continue
+            for subject in subjects:
+                index = rules.first(subject)
+                if index is not None:
+                    hit = rules.rules[index].action
+                    if best is None or hit[0] < best[0]:
+                        best = hit
+        return None if best is None else best[1]
+
+
+def _compiled(path: Path, root: Path) -> dict:
+    def compute() -> dict:
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            text = ""
+        return compile_policy(text, root)
+
+    key = f"{path}\0{root}"
+    wire = disk_memo("hook-policy", key, [path], compute)
+    if not isinstance(wire, dict) or wire.get("v") != _WIRE_VERSION:
+        wire = compute()
+    return wire
+
+
+def load_policy(project_dir: Path | None = None) -> Policy:
+    """The compiled policy in force for the project (default: the
+    ``CLAUDE_PROJECT_DIR`` / cwd); recompiled only when the file changes."""
+    root = str(project_dir or _project_dir())
+    path = _policy_file(root)
+
+    def compute() -> Policy:
+        version = (path, root, stat_signature([path]))
+        policy = Policy(Path(path), _compiled(Path(path), Path(root)), version)
+        for error in policy.errors:
+            print(f"hook-policy: {path}: {error} (entry ignored)",
+                  file=sys.stderr)
+        return policy
+
+    return memo("hook-policy", (path, root), [path], compute)
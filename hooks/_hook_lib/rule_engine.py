@@ -0,0 +1,214 @@
+"""Ordered regex rules, compiled for one scan of the text.
+
+The safety hooks decide by rule lists: the first rule, in list order, whose
+pattern matches anywhere in the text wins. A loop of ``re.search`` calls
+decides that at one full scan of the text per rule — several milliseconds
+for a long heredoc, most of it spent confirming that nothing matches. (One
+alternation of every rule is no cheaper: ``re`` tries each alternative at
+each position.)
+
+:class:`RuleSet` uses the literal each pattern starts with — ``rm`` in
+``rm\\s+-rf``, ``git`` in ``git\\s+push`` — instead. Rules sharing a literal
+are compiled into one alternation, tried only where the literal occurs
+(found with ``str.find``, on a case-folded copy of the text for
+case-insensitive rules). Alternatives are tried in list order, so the
+alternation reports the first rule matching there; over all occurrences and
+all literals the lowest rule wins — exactly the loop's winner. A text in
+which no literal occurs costs one fold and a ``find`` per literal; a rule
+anchored with ``^`` only looks at the start of the text. Rules without a
+leading literal are searched as the loop would.
+
+Each rule keeps its own flags, scoped to its alternative (``(?i:...)``).
+Patterns must not define named groups or use numbered backreferences:
+their groups are renumbered inside the alternation.
+"""
+
+from __future__ import annotations
+
+import re
+import string
+from typing import Iterable, Iterator
+
+__all__ = [
+    "Rule",
+    "RuleSet",
+]
+
+# Flags that can be scoped to one alternative, and their inline letters.
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"),
+                 (re.VERBOSE, "x"))
+
+_LITERAL_CHARS = frozenset(string.ascii_letters + string.digits)
+
+# Characters that match an ASCII letter under re.IGNORECASE but do not
+# lower() to it; İ is also the one character whose lower() is two long.
+_FOLD = (("İ", "i"), ("ı", "i"), ("ſ", "s"))
+
+
+def _fold(text: str) -> str:
+    """``text`` lowered for finding case-insensitive literals, same length."""
+    if not text.isascii():
+        for char, letter in _FOLD:
+            text = text.replace(char, letter)
+    return text.lower()
+
+
+def _has_top_level_branch(pattern: str) -> bool:
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+            # A ] right after [ or [^ is a literal member.
+            if pattern[i + 1:i + 2] == "^":
+                i += 1
+            if pattern[i + 1:i + 2] == "]":
+                i += 1
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _literal_prefix(pattern: str, flags: int) -> str:
+    """The letters and digits every match of ``pattern`` starts with ('' if
+    that cannot be told simply: alternations, verbose patterns, ...)."""
+    if flags & re.VERBOSE or _has_top_level_branch(pattern):
+        return ""
+    i = 0
+    for zero_width in ("^", "\\b"):  # tested where the literal is found
+        if pattern.startswith(zero_width):
+            i = len(zero_width)
+            break
+    j = i
+    while j < len(pattern) and pattern[j] in _LITERAL_CHARS:
+        j += 1
+    if pattern[j:j + 1] in ("*", "?", "{"):
+        j -= 1  # the last letter is optional or counted
+    return pattern[i:j]
+
+
+class Rule:
+    """One pattern and what a hit on it means.
+
+    ``action`` is opaque here: a block message, a callable, a label — the
+    caller decides. ``regex`` is the rule compiled on its own; ``anchor`` the
+    literal every match starts with ('' if none), lowered when the rule
+    ignores case; ``at_start`` whether matches start only at the start of
+    the text (``^`` without MULTILINE).
+    """
+
+    __slots__ = ("pattern", "action", "flags", "regex", "anchor", "at_start")
+
+    def __init__(self, pattern: str, action: object, flags: int = 0) -> None:
+        unscoped = flags & ~sum(flag for flag, _ in _SCOPED_FLAGS)
+        if unscoped:
+            raise ValueError(f"flags {unscoped:#x} cannot be scoped to a rule")
+        self.pattern = pattern
+        self.action = action
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)
+        anchor = _literal_prefix(pattern, self.regex.flags)
+        self.anchor = anchor.lower() if self.ignorecase else anchor
+        self.at_start = (pattern.startswith("^")
+                         and not self.regex.flags & re.MULTILINE)
+
+    @property
+    def ignorecase(self) -> bool:
+        return bool(self.regex.flags & re.IGNORECASE)
+
+    def scoped(self) -> str:
+        """The pattern with its flags inline, for use inside an alternation."""
+        letters = "".join(ch for flag, ch in _SCOPED_FLAGS if self.flags & flag)
+        return f"(?{letters}:{self.pattern})" if letters else f"(?:{self.pattern})"
+
+    def __repr__(self) -> str:
+        return f"Rule({self.pattern!r}, {self.action!r})"
+
+
+class RuleSet:
+    """An ordered rule list, searched by the literals its rules start with."""
+
+    __slots__ = ("rules", "_anchored", "_unanchored")
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules = tuple(rules)
+        groups: dict[tuple[str, bool, bool], list[int]] = {}
+        self._unanchored: list[int] = []
+        for i, rule in enumerate(self.rules):
+            if rule.anchor:
+                key = (rule.anchor, rule.ignorecase, rule.at_start)
+                groups.setdefault(key, []).append(i)
+            else:
+                self._unanchored.append(i)
+        # (lowest rule index, literal, ignorecase, at start, alternation of
+        # the rules) — lowest first, so a search stops at the first group
+        # that cannot beat the winner so far.
+        self._anchored = sorted(
+            (indices[0], *key, re.compile("|".join(
+                f"(?P<r{i}>{self.rules[i].scoped()})" for i in indices)))
+            for key, indices in groups.items()
+        )
+
+    def first(self, text: str, start: int = 0) -> int | None:
+        """Index of the first rule, in list order and from ``start`` on,
+        that matches anywhere in ``text``; None if none does."""
+        if start > 0:
+            for i in range(start, len(self.rules)):
+                if self.rules[i].regex.search(text):
+                    return i
+            return None
+        best = len(self.rules)
+        folded = None
+        for lowest, anchor, ignorecase, at_start, combined in self._anchored:
+            if lowest >= best:
+                break
+            if at_start:
+                head = text[:len(anchor)]
+                if (_fold(head) if ignorecase else head) == anchor:
+                    m = combined.match(text)
+                    if m is not None:
+                        best = min(best, int(m.lastgroup[1:]))
+                continue
+            if ignorecase:
+                if folded is None:
+                    folded = _fold(text)
+                haystack = folded
+            else:
+                haystack = text
+            pos = haystack.find(anchor)
+            while pos >= 0:
+                m = combined.match(text, pos)
+                if m is not None:
+                    best = min(best, int(m.lastgroup[1:]))
+                    if best == lowest:
+                        break
+                pos = haystack.find(anchor, pos + 1)
+        for i in self._unanchored:
+            if i >= best:
+                break
+            if self.rules[i].regex.search(text):
+                best = i
+                break
+        return best if best < len(self.rules) else None
+
+    def matches(self, text: str) -> Iterator[Rule]:
+        """The rules matching ``text``, in list order, found lazily."""
+        index = self.first(text)
+        while index is not None:
+            yield self.rules[index]
+            index = self.first(text, index + 1)
+
+    def __len__(self) -> int:
+        return len(self.rules)
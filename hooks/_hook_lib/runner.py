@@ -0,0 +1,146 @@
+"""Run a hook script in-process with its stdin/exit-code contract intact.
+
+Each hook is a standalone script that reads the tool payload from stdin,
+prints to stdout/stderr and ends with ``sys.exit(code)``. ``run_hook``
+executes a hook's ``main()`` inside the current process with those streams
+redirected to buffers and ``SystemExit`` captured, returning exactly what
+the subprocess would have produced. Hook modules are imported once and
+re-imported only when their file changes, so a resident process (see
+hook-server.py) skips the import cost on every call after the first.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import io
+import os
+import re
+import sys
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+from types import ModuleType
+
+__all__ = [
+    "HOOKS_DIR",
+    "HookResult",
+    "hook_path",
+    "load_hook",
+    "run_hook",
+]
+
+HOOKS_DIR = Path(__file__).resolve().parent.parent
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# hook name -> (mtime_ns, module)
+_MODULES: dict[str, tuple[int, ModuleType]] = {}
+
+
+class HookResult:
+    """Exit code and captured output of one hook run."""
+
+    __slots__ = ("exit_code", "stdout", "stderr")
+
+    def __init__(self, exit_code: int, stdout: str, stderr: str) -> None:
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def to_dict(self) -> dict:
+        return {
+            "exit": self.exit_code, "stdout": self.stdout,
+            "stderr": self.stderr,
+        }
+
+
+def hook_path(name: str) -> Path:
+    """Path of the hook script called ``name`` (without ``.py``).
+
+    Raises ValueError for names that are not a plain hook file name or do
+    not exist under hooks/.
+    """
+    if not _NAME_RE.match(name):
+        raise ValueError(f"invalid hook name: {name!r}")
+    path = HOOKS_DIR / f"{name}.py"
+    if not path.is_file():
+        raise ValueError(f"no such hook: {name}")
+    return path
+
+
+def load_hook(name: str) -> ModuleType:
+    """Import (or re-import, if its file changed) the hook called ``name``."""
+    path = hook_path(name)
+    mtime = path.stat().st_mtime_ns
+    cached = _MODULES.get(name)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    module_name = "hook_" + name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"cannot load hook {name}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _MODULES[name] = (mtime, module)
+    return module
+
+
+def _exit_code(exc: SystemExit, stderr: io.StringIO) -> int:
+    """Map a SystemExit to a process exit code the way the interpreter does."""
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=stderr)
+    return 1
+
+
+@contextmanager
+def _process_context(cwd: str | None, env: dict[str, str] | None):
+    """Temporarily adopt the caller's cwd and environment."""
+    old_cwd = os.getcwd()
+    old_env = dict(os.environ) if env is not None else None
+    try:
+        if env is not None:
+            os.environ.clear()
+            os.environ.update(env)
+        if cwd:
+            os.chdir(cwd)
+        yield
+    finally:
+        os.chdir(old_cwd)
+        if old_env is not None:
+            os.environ.clear()
+            os.environ.update(old_env)
+
+
+def run_hook(
+    name: str, payload: bytes, cwd: str | None = None,
+    env: dict[str, str] | None = None, args: list[str] | None = None,
+) -> HookResult:
+    """Run hook ``name`` on ``payload`` in this process.
+
+    ``args`` become the hook's ``sys.argv[1:]`` (dispatch.py takes the
+    event name there).
+
+    Not thread-safe: it swaps the process-wide std streams, cwd and
+    environment for the duration of the call.
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    stdin = io.TextIOWrapper(io.BytesIO(payload), encoding="utf-8")
+    saved = sys.stdin, sys.stdout, sys.stderr, sys.argv
+    exit_code = 0
+    with _process_context(cwd, env):
+        try:
+            module = load_hook(name)
+            sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+            sys.argv = [str(hook_path(name)), *(args or ())]
+            module.main()
+        except SystemExit as exc:
+            exit_code = _exit_code(exc, stderr)
+        except Exception:
+            traceback.print_exc(file=stderr)
+            exit_code = 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr, sys.argv = saved
+    return HookResult(exit_code, stdout.getvalue(), stderr.getvalue())
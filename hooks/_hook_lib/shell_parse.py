@@ -0,0 +1,672 @@
+"""Split a bash command line into the simple commands it runs.
+
+bash_safety's rules are about commands — ``rm`` with these operands, ``git
+push`` to that branch, a shell fed by ``curl`` — but a hook gets one string.
+Matched against the raw string, a rule fires on an ``rm -rf /`` quoted in
+an ``echo`` or written out by a heredoc, and every rule rescans every
+command of a long ``&&`` chain.
+
+:func:`parse` lexes the string once, as bash splits it: quotes and
+backslashes, comments, ``|`` ``&&`` ``||`` ``;`` ``&`` and newlines,
+subshells, redirections and heredocs. Each simple command comes out as the
+argv it runs, quotes removed and redirections dropped, starting at the
+command actually executed: leading assignments and reserved words (``if``,
+``then``, ``{``, ...) are skipped, and so are wrappers that run their
+arguments (``sudo``, ``env``, ``xargs``, ``timeout``, ``coproc``,
+``parallel``, ...). The name has its directory stripped (``/bin/rm`` is
+``rm``).
+
+Text that bash runs as commands is parsed too, as command lists of its
+own: ``$(...)``, backticks and process substitutions (also inside double
+quotes, unquoted heredocs and ``${...}`` / ``$((...))`` expansions),
+``find -exec``, the string of ``bash -c``, ``eval``, ``su -c``, ``watch``
+and ``ssh host ...``, and the heredoc, here-string or piped-in text a
+shell reads as its script. Text that is only data — the
+arguments of ``echo``, a heredoc fed to ``cat`` — is not.
+
+Nesting deeper than :data:`_MAX_DEPTH` is not followed: the line parses to
+no commands, with :attr:`Script.too_deep` set, and it is up to the caller
+to refuse what it cannot see into.
+
+Parses are cached: the resident hook server sees the same commands over
+and over.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+__all__ = [
+    "SimpleCommand",
+    "Script",
+    "parse",
+]
+
+# Nesting ($(...) in bash -c in a heredoc ...) beyond this is not followed
+# (Script.too_deep).
+_MAX_DEPTH = 16
+
+# Characters with no special meaning outside quotes.
+_PLAIN = re.compile(r"[^ \t\n\\'\"$`<>|&;()#]+")
+# The common tokens in one match, blanks before them skipped: a word of
+# plain characters and single-quoted strings ending where a blank or
+# operator starts, or an operator (&> is a redirection). Anything else
+# (the empty alternative) is lexed char by char.
+_TOKEN = re.compile(
+    r"[ \t]*(?:(?P<word>(?=[^ \t\n\\\"$`<>|&;()#])"
+    r"[^ \t\n\\'\"$`<>|&;()]*(?:'[^']*'[^ \t\n\\'\"$`<>|&;()]*)*)"
+    r"(?=[ \t\n|&;()<>]|$)"
+    r"|(?P<op>&&|\|\||;;&|;;|;&|\|&|&(?!>)|[|;()\n])|)"
+)
+_DQ_PLAIN = re.compile(r'[^"\\$`]+')
+_REDIRECTS = ("<<<", "<<-", "<<", "<>", "<&", ">>", ">&", ">|", "&>>", "&>",
+              "<", ">")
+_OP_NAMES = {";;&": ";", ";;": ";", ";&": ";", "|&": "|"}
+# Operators that end a command but do not join it to the next one.
+_WEAK_OPS = frozenset((";", "\n"))
+
+_ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\[[^]]*\])?\+?=")
+_RESERVED = frozenset(("!", "{", "}", "if", "then", "else", "elif", "fi",
+                       "do", "done", "while", "until", "esac"))
+# Compound-command headers: no command runs from these words.
+_HEADERS = frozenset(("for", "case", "select"))
+
+# Commands that run their arguments as a command: short options taking a
+# value, long options taking a separate one.
+_WRAPPERS: dict[str, tuple[str, frozenset[str]]] = {
+    "sudo": ("ughpCDrtUT", frozenset(("--user", "--group", "--host",
+                                      "--prompt", "--chdir", "--role",
+                                      "--type", "--other-user",
+                                      "--close-from", "--command-timeout"))),
+    "doas": ("uC", frozenset()),
+    "env": ("uCS", frozenset(("--unset", "--chdir", "--split-string"))),
+    "nice": ("n", frozenset(("--adjustment",))),
+    "ionice": ("cnp", frozenset(("--class", "--classdata", "--pid"))),
+    "nohup": ("", frozenset()),
+    "time": ("f", frozenset(("--format", "--output"))),
+    "timeout": ("sk", frozenset(("--signal", "--kill-after"))),
+    "stdbuf": ("ioe", frozenset(("--input", "--output", "--error"))),
+    "xargs": ("adEILnPs", frozenset(("--arg-file", "--delimiter",
+                                     "--max-args", "--max-lines",
+                                     "--max-procs", "--max-chars"))),
+    "command": ("", frozenset()),
+    "builtin": ("", frozenset()),
+    "exec": ("a", frozenset()),
+    "coproc": ("", frozenset()),
+    # GNU parallel: the command is followed by its ::: argument lists.
+    "parallel": ("adEIjLNnPSs", frozenset(("--arg-file", "--delimiter",
+                                          "--jobs", "--sshlogin",
+                                          "--max-args", "--max-lines",
+                                          "--max-chars", "--joblog",
+                                          "--results", "--colsep",
+                                          "--tmpdir", "--workdir",
+                                          "--timeout", "--retries",
+                                          "--delay", "--halt"))),
+}
+# Where the arguments of parallel's command begin.
+_PARALLEL_ARGS = frozenset((":::", "::::", ":::+", "::::+"))
+_PARALLEL_PLACEHOLDER = re.compile(r"\{[^{}\s]*\}")
+
+_SHELLS = frozenset(("sh", "bash", "zsh", "dash", "ksh", "ash"))
+_SHELL_VALUE_OPTS = frozenset(("-o", "+o", "-O", "+O", "--rcfile",
+                               "--init-file"))
+_SSH_VALUE_OPTS = "BbcDEeFIiJLlmOopQRSWw"
+_FIND_EXEC = frozenset(("-exec", "-execdir", "-ok", "-okdir"))
+
+_NEEDS_QUOTES = re.compile(r"[ \t\n']")
+_NEEDS_QUOTES_NOT_SPACE = re.compile(r"[\t\n']")
+_SHAPE_TOKEN = re.compile(r"[\w.+-]+")
+
+
+class SimpleCommand:
+    """One simple command.
+
+    ``argv`` is the command run and its arguments; ``op`` the operator
+    joining it to the previous command of its list ("" for the first, or
+    ``|``, ``&&``, ``||``, ``;``, ``&``); ``text`` is argv joined by single
+    spaces (a word with blanks or quotes single-quoted) — what command rules
+    match, the command name first.
+    """
+
+    __slots__ = ("argv", "op", "text")
+
+    def __init__(self, argv: tuple[str, ...], op: str) -> None:
+        self.argv = argv
+        self.op = op
+        text = " ".join(argv)
+        # Quote only when some word needs it: a blank beyond the separators.
+        if (text.count(" ") != len(argv) - 1 or _NEEDS_QUOTES_NOT_SPACE.search(text)
+                or "" in argv):
+            text = " ".join(
+                "'" + word.replace("'", "'\\''") + "'"
+                if not word or _NEEDS_QUOTES.search(word) else word
+                for word in argv
+            )
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"SimpleCommand({self.op!r}, {self.text!r})"
+
+
+class Script:
+    """A parsed command line.
+
+    ``commands`` holds every simple command, list after list (a list's
+    first command has op ""); ``shapes`` each list as its command names
+    joined by their operators — ``curl | grep x | bash`` has the shape
+    ``curl | grep | bash`` — for rules about how commands are combined.
+    ``too_deep`` is set, and both are empty, when the line nests deeper
+    than the parser follows.
+    """
+
+    __slots__ = ("commands", "shapes", "too_deep")
+
+    def __init__(self, lists: list[list[SimpleCommand]],
+                 too_deep: bool = False) -> None:
+        self.commands = tuple(cmd for cmds in lists for cmd in cmds)
+        self.shapes = tuple(_shape(cmds) for cmds in lists if cmds)
+        self.too_deep = too_deep
+
+    def __repr__(self) -> str:
+        return f"Script({list(self.commands)!r})"
+
+
+def _shape(commands: list[SimpleCommand]) -> str:
+    parts = []
+    for cmd in commands:
+        name = cmd.argv[0]
+        token = name if _SHAPE_TOKEN.fullmatch(name) else "?"
+        parts.append(f"{cmd.op} {token}" if parts else token)
+    return " ".join(parts)
+
+
+@lru_cache(maxsize=256)
+def parse(command: str) -> Script:
+    """The simple commands ``command`` runs (cached)."""
+    try:
+        return Script(_lists(command, 0))
+    except (_TooDeep, RecursionError):
+        return Script([], too_deep=True)
+
+
+# --- lexing -------------------------------------------------------------------
+
+class _TooDeep(Exception):
+    pass
+
+
+class _Raw:
+    """A simple command as lexed: words, and the input it reads."""
+
+    __slots__ = ("words", "op", "heredocs", "herestrings")
+
+    def __init__(self, op: str) -> None:
+        self.words: list[str] = []
+        self.op = op
+        # [delimiter, strip tabs, quoted delimiter, body]
+        self.heredocs: list[list] = []
+        self.herestrings: list[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.words or self.heredocs or self.herestrings)
+
+    def stdin_texts(self) -> list[str]:
+        return [h[3] for h in self.heredocs if h[3]] + self.herestrings
+
+
+class _Lexer:
+    """Lexes one script; ``lists`` collects the command lists of
+    substitutions found on the way."""
+
+    def __init__(self, text: str, depth: int) -> None:
+        if depth > _MAX_DEPTH:
+            raise _TooDeep
+        self.text = text
+        self.pos = 0
+        self.depth = depth
+        self.nesting = 0
+        self.lists: list[list[_Raw]] = []
+        self.pending: list[list] = []  # heredocs whose body comes next
+
+    def script(self) -> list[list[_Raw]]:
+        top = self._list(nested=False)
+        return [top, *self.lists]
+
+    def _list(self, nested: bool) -> list[_Raw]:
+        """Commands up to the end of the text, or (``nested``) up to the
+        ``)`` closing a ``$(`` / ``<(``."""
+        self.nesting += 1
+        if self.nesting > _MAX_DEPTH:
+            raise _TooDeep
+        text = self.text
+        n = len(text)
+        commands: list[_Raw] = []
+        cur = _Raw("")
+        subshells = 0
+        while self.pos < n:
+            m = _TOKEN.match(text, self.pos)
+            self.pos = m.end()
+            kind = m.lastgroup
+            if kind is None:
+                if self.pos == n:
+                    break
+                c = text[self.pos]
+                if c == "#":
+                    end = text.find("\n", self.pos)
+                    self.pos = n if end < 0 else end
+                elif (c in "<>" and text[self.pos + 1:self.pos + 2] != "("
+                        or text.startswith("&>", self.pos)):
+                    self._redirect(cur)
+                else:
+                    word, _ = self._word()
+                    if not (word.isdigit() and self._is_fd()):
+                        cur.words.append(word)
+            elif kind == "word":
+                # Outside the quotes the word is plain: only quotes to drop.
+                word = m.group(kind).replace("'", "")
+                if not (word.isdigit() and self._is_fd()):
+                    cur.words.append(word)
+            else:
+                op = m.group(kind)
+                if op == "\n":
+                    cur = self._end(commands, cur, op)
+                    self._heredoc_bodies()
+                elif op == "(":
+                    subshells += 1
+                    cur = self._end(commands, cur, "\n")
+                elif op == ")":
+                    if subshells:
+                        subshells -= 1
+                    elif nested:
+                        break
+                    cur = self._end(commands, cur, "\n")
+                else:
+                    cur = self._end(commands, cur, _OP_NAMES.get(op, op))
+        if cur:
+            commands.append(cur)
+        self.nesting -= 1
+        return commands
+
+    def _is_fd(self) -> bool:
+        """Whether the number just lexed is the file descriptor of a
+        redirection: 2>&1."""
+        return (self.text[self.pos:self.pos + 1] in ("<", ">")
+                and self.text[self.pos + 1:self.pos + 2] != "(")
+
+    @staticmethod
+    def _end(commands: list[_Raw], cur: _Raw, op: str) -> _Raw:
+        if cur:
+            commands.append(cur)
+            return _Raw(";" if op == "\n" else op)
+        if op not in _WEAK_OPS and commands:
+            cur.op = op  # `a &&<newline>b`: the && still joins them
+        return cur
+
+    def _word(self) -> tuple[str, bool]:
+        """One word, quotes removed; and whether any of it was quoted."""
+        text = self.text
+        n = len(text)
+        parts: list[str] = []
+        quoted = False
+        while self.pos < n:
+            m = _PLAIN.match(text, self.pos)
+            if m:
+                parts.append(m.group())
+                self.pos = m.end()
+                continue
+            c = text[self.pos]
+            if c == "'":
+                end = text.find("'", self.pos + 1)
+                end = n if end < 0 else end
+                parts.append(text[self.pos + 1:end])
+                self.pos = end + 1
+                quoted = True
+            elif c == '"':
+                self.pos += 1
+                parts.append(self._double_quoted('"'))
+                quoted = True
+            elif c == "\\":
+                nxt = text[self.pos + 1:self.pos + 2]
+                if nxt != "\n":  # backslash-newline continues the line
+                    parts.append(nxt or "\\")
+                    quoted = True
+                self.pos += 2
+            elif c == "$":
+                if text.startswith("$'", self.pos):
+                    parts.append(self._ansi_c())
+                    quoted = True
+                else:
+                    parts.append(self._dollar())
+            elif c == "`":
+                parts.append(self._backtick())
+            elif c == "#":
+                parts.append(c)  # mid-word: not a comment
+                self.pos += 1
+            elif c in "<>" and text[self.pos + 1:self.pos + 2] == "(":
+                start = self.pos
+                self.pos += 2
+                self.lists.append(self._list(nested=True))
+                parts.append(text[start:self.pos])
+            else:
+                break  # blank or operator
+        return "".join(parts), quoted
+
+    def _double_quoted(self, closing: str | None) -> str:
+        """Text up to ``closing`` (None: to the end) with double-quote
+        rules: backslashes, and substitutions run."""
+        text = self.text
+        n = len(text)
+        parts: list[str] = []
+        while self.pos < n:
+            m = _DQ_PLAIN.match(text, self.pos)
+            if m:
+                parts.append(m.group())
+                self.pos = m.end()
+                continue
+            c = text[self.pos]
+            if c == closing:
+                self.pos += 1
+                break
+            if c == "\\":
+                nxt = text[self.pos + 1:self.pos + 2]
+                if nxt in ("$", "`", '"', "\\"):
+                    parts.append(nxt)
+                elif nxt != "\n":
+                    parts.append("\\" + nxt)
+                self.pos += 2
+            elif c == "$":
+                parts.append(self._dollar())
+            elif c == "`":
+                parts.append(self._backtick())
+            else:
+                parts.append(c)
+                self.pos += 1
+        return "".join(parts)
+
+    def _dollar(self) -> str:
+        """``$...`` as written; a ``$(...)`` is lexed as a command list, and
+        so are the substitutions inside ``$((...))`` and ``${...}``."""
+        text = self.text
+        start = self.pos
+        if text.startswith("$((", start):
+            self.pos = self._balanced(start + 1, "(", ")")
+            self._expansion(start + 3, "))")
+        elif text.startswith("$(", start):
+            self.pos += 2
+            self.lists.append(self._list(nested=True))
+        elif text.startswith("${", start):
+            self.pos = self._balanced(start + 1, "{", "}")
+            self._expansion(start + 2, "}")
+        else:
+            self.pos += 1
+        return text[start:self.pos]
+
+    def _expansion(self, start: int, closing: str) -> None:
+        """The substitutions run by the arithmetic or parameter expansion
+        from ``start`` to before ``closing`` (``${x:-$(cmd)}``,
+        ``$(( $(cmd) + 1 ))``)."""
+        end = self.pos
+        if self.text.endswith(closing, start, end):
+            end -= len(closing)
+        inner = self.text[start:end]
+        if "$" in inner or "`" in inner:
+            self._sublex(inner, quoted_context=True)
+
+    def _balanced(self, start: int, opening: str, closing: str) -> int:
+        depth = 0
+        for i in range(start, len(self.text)):
+            ch = self.text[i]
+            if ch == opening:
+                depth += 1
+            elif ch == closing:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        return len(self.text)
+
+    def _ansi_c(self) -> str:
+        text = self.text
+        i = self.pos + 2
+        parts = []
+        while i < len(text) and text[i] != "'":
+            if text[i] == "\\" and i + 1 < len(text):
+                nxt = text[i + 1]
+                parts.append({"n": "\n", "t": "\t"}.get(nxt, nxt))
+                i += 2
+            else:
+                parts.append(text[i])
+                i += 1
+        self.pos = i + 1
+        return "".join(parts)
+
+    def _backtick(self) -> str:
+        text = self.text
+        start = self.pos
+        i = start + 1
+        inner = []
+        while i < len(text) and text[i] != "`":
+            if text[i] == "\\" and text[i + 1:i + 2] in ("`", "\\", "$"):
+                i += 1
+            inner.append(text[i])
+            i += 1
+        self.pos = i + 1
+        self._sublex("".join(inner))
+        return text[start:self.pos]
+
+    def _sublex(self, text: str, quoted_context: bool = False) -> None:
+        """Lex ``text`` as a script of its own (or, ``quoted_context``, as
+        an unquoted heredoc body: only its substitutions run)."""
+        lexer = _Lexer(text, self.depth + 1)
+        if quoted_context:
+            lexer._double_quoted(None)
+            self.lists.extend(lexer.lists)
+        else:
+            self.lists.extend(lexer.script())
+
+    def _redirect(self, cur: _Raw) -> None:
+        text = self.text
+        op = next(o for o in _REDIRECTS if text.startswith(o, self.pos))
+        self.pos += len(op)
+        while self.pos < len(text) and text[self.pos] in " \t":
+            self.pos += 1
+        target, quoted = self._word()
+        if op in ("<<", "<<-"):
+            heredoc = [target, op == "<<-", quoted, ""]
+            cur.heredocs.append(heredoc)
+            self.pending.append(heredoc)
+        elif op == "<<<":
+            cur.herestrings.append(target)
+
+    def _heredoc_bodies(self) -> None:
+        text = self.text
+        n = len(text)
+        for heredoc in self.pending:
+            delimiter, strip_tabs, quoted, _ = heredoc
+            start = self.pos
+            while self.pos < n:
+                end = text.find("\n", self.pos)
+                end = n if end < 0 else end
+                line = text[self.pos:end]
+                self.pos = min(end + 1, n)
+                if (line.lstrip("\t") if strip_tabs else line) == delimiter:
+                    heredoc[3] = text[start:end - len(line)]
+                    break
+            else:
+                heredoc[3] = text[start:]
+            if not quoted and ("$" in heredoc[3] or "`" in heredoc[3]):
+                self._sublex(heredoc[3], quoted_context=True)
+        self.pending.clear()
+
+
+# --- from words to commands ---------------------------------------------------
+
+def _lists(text: str, depth: int) -> list[list[SimpleCommand]]:
+    raw_lists = _Lexer(text, depth).script()
+    lists: list[list[SimpleCommand]] = []
+    for raw_list in raw_lists:
+        commands: list[SimpleCommand] = []
+        nested: list[str] = []
+        for i, raw in enumerate(raw_list):
+            argv = _effective(raw.words)
+            if not argv:
+                continue
+            scripts, argvs, reads_stdin = _runs(argv)
+            if reads_stdin:
+                scripts.extend(raw.stdin_texts())
+                j = i
+                while raw_list[j].op == "|" and j > 0:  # text piped in
+                    j -= 1
+                    upstream = raw_list[j]
+                    scripts.extend(upstream.stdin_texts())
+                    args = _effective(upstream.words)[1:]
+                    scripts.append(" ".join(args))
+                    scripts.extend(a for a in args if _NEEDS_QUOTES.search(a))
+            nested.extend(s for s in scripts if s.strip())
+            for words in argvs:
+                inner = _effective(words)
+                if inner:
+                    lists.append([SimpleCommand(inner, "")])
+            commands.append(SimpleCommand(argv, raw.op if commands else ""))
+        lists.append(commands)
+        for script in nested:
+            lists.extend(_lists(script, depth + 1))
+    return [cmds for cmds in lists if cmds]
+
+
+def _effective(words: list[str]) -> tuple[str, ...]:
+    """``words`` from the command actually run on, its name without
+    directory; () when no command runs."""
+    i = 0
+    n = len(words)
+    while i < n:
+        word = words[i]
+        if word in _RESERVED or _ASSIGNMENT.match(word):
+            i += 1
+            continue
+        if word == "function":
+            i += 2  # and the function's name; its body follows
+            continue
+        name = word.rsplit("/", 1)[-1]
+        if name in _HEADERS:
+            return ()
+        wrapper = _WRAPPERS.get(name)
+        if wrapper is None:
+            return (name, *words[i + 1:])
+        i = _skip_options(words, i + 1, *wrapper)
+        if name == "env":
+            while i < n and _ASSIGNMENT.match(words[i]):
+                i += 1
+        elif name == "timeout":
+            i += 1  # the duration
+        elif name == "coproc" and i + 1 < n and words[i + 1] == "{":
+            i += 1  # the coprocess's name
+        elif name == "parallel":
+            return _parallel(words[i:])
+    return ()
+
+
+def _parallel(words: list[str]) -> tuple[str, ...]:
+    """What ``parallel`` runs: its command with the arguments in place of
+    the placeholders (after it when there are none) — or, without a
+    command, ``parallel`` itself, whose arguments are the commands."""
+    end = next((i for i, w in enumerate(words) if w in _PARALLEL_ARGS),
+               len(words))
+    template = words[:end]
+    if not template:
+        return ("parallel", *words)
+    args = [w for w in words[end:] if w not in _PARALLEL_ARGS]
+    argv = [w for w in template if not _PARALLEL_PLACEHOLDER.fullmatch(w)]
+    return _effective([*argv, *args])
+
+
+def _skip_options(words: list[str], i: int, short: str,
+                  long: frozenset[str]) -> int:
+    while i < len(words):
+        word = words[i]
+        if word == "--":
+            return i + 1
+        if not word.startswith("-") or word == "-":
+            break
+        takes_value = (len(word) == 2 and word[1] in short) or word in long
+        i += 2 if takes_value else 1
+    return i
+
+
+def _runs(argv: tuple[str, ...]) -> tuple[list[str], list[list[str]], bool]:
+    """What ``argv`` runs besides itself: script strings, argvs, and
+    whether it runs the text on its stdin."""
+    name = argv[0]
+    if name in _SHELLS:
+        return _shell_runs(argv)
+    if name == "eval":
+        return [" ".join(argv[1:])], [], False
+    if name == "watch":
+        # Runs its arguments with `sh -c`, or (-x) as an argv.
+        i = _skip_options(list(argv), 1, "nq", frozenset(("--interval",
+                                                          "--equexit")))
+        command = list(argv[i:])
+        if not command:
+            return [], [], False
+        if any(word == "--exec" or (word[:1] == "-" and word[1:2] != "-"
+                                    and "x" in word[1:])
+               for word in argv[1:i]):
+            return [], [command], False
+        return [" ".join(command)], [], False
+    if name == "parallel":  # no command: each argument is one
+        return [w for w in argv[1:] if w not in _PARALLEL_ARGS], [], False
+    if name == "ssh":
+        i = 1
+        while i < len(argv) and argv[i].startswith("-"):
+            if argv[i] == "--":
+                i += 1
+                break
+            i += 2 if len(argv[i]) == 2 and argv[i][1] in _SSH_VALUE_OPTS else 1
+        remote = argv[i + 1:]
+        return ([" ".join(remote)], [], False) if remote else ([], [], True)
+    if name == "su":
+        for i, word in enumerate(argv):
+            if word in ("-c", "--command") and i + 1 < len(argv):
+                return [argv[i + 1]], [], False
+            if word.startswith("--command="):
+                return [word.partition("=")[2]], [], False
+        return [], [], False
+    if name == "find":
+        argvs = []
+        words = None
+        for word in argv[1:]:
+            if words is not None:
+                if word in (";", "+"):
+                    argvs.append(words)
+                    words = None
+                else:
+                    words.append(word)
+            elif word in _FIND_EXEC:
+                words = []
+        if words:
+            argvs.append(words)
+        return [], argvs, False
+    return [], [], False
+
+
+def _shell_runs(argv: tuple[str, ...]) -> tuple[list[str], list[list[str]], bool]:
+    command_string = from_stdin = False
+    i = 1
+    while i < len(argv):
+        word = argv[i]
+        if word in ("--", "-"):
+            i += 1
+            break
+        if word in _SHELL_VALUE_OPTS:
+            i += 2
+            continue
+        if word[:1] not in ("-", "+"):
+            break
+        if not word.startswith("--"):
+            command_string = command_string or "c" in word[1:]
+            from_stdin = from_stdin or "s" in word[1:]
+        i += 1
+    operand = argv[i] if i < len(argv) else None
+    if command_string:
+        return ([operand] if operand is not None else []), [], False
+    return [], [], from_stdin or operand is None
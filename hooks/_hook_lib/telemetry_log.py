@@ -0,0 +1,258 @@
+"""Append-only per-bean telemetry event log.
+
+The log — ``ai/beans/BEAN-NNN-slug/.telemetry-events.jsonl`` — is the
+record of what telemetry-stamp measured; the bean.md Telemetry table is a
+projection of it (see ``render_telemetry`` in telemetry-stamp.py).
+
+Each event is one JSON object per line, written with a single ``write`` on
+an ``O_APPEND`` descriptor, so parallel workers closing tasks of the same
+bean never interleave or lose each other's events the way concurrent
+read-modify-write cycles on bean.md can. Readers skip lines that do not
+parse (a torn tail after a crash), and :func:`replay` folds the events into
+a :class:`TelemetryState`, memoized on the log's stat so the resident hook
+server re-reads it only after an append.
+
+Events (``"event"`` key; every event also carries ``"v"`` and ``"ts"``, the
+epoch seconds of the append — or, for a deferred job, of the moment it
+measured):
+
+- ``task_started`` — ``task``, ``at`` (the minute-resolution Started cell;
+  ``ts`` is the precise start), optional ``tokens`` (session
+  position [in, out, cache_creation, cache_read] when the task started:
+  the token watermark) and ``transcript`` / ``offset`` (the session
+  transcript and its size then: where the task's turns start).
+- ``task_done`` — ``task``, ``at``, ``duration``, optional ``seconds`` (the
+  exact duration, from the task_started ``ts``), ``tokens_in`` /
+  ``tokens_out`` (display strings, possibly ``N/A``), ``cache_creation``,
+  ``cache_read``; for a task run by workers (native subagents, worktree
+  sessions) also ``dispatch`` (``agent-subagent`` / ``agent-worktree``),
+  ``workers`` (transcript count) and ``worker_tokens`` (their [in, out,
+  cache_creation, cache_read], already included in the totals); optional
+  ``timing`` — ``turns``, ``model_s``, ``tool_s``, ``hook_s`` (None when
+  hook metrics are off) and ``tools`` ({name: [seconds, calls]}) over the
+  task's transcript window.
+- ``bean_started`` / ``bean_done`` — ``at`` and, for done, ``duration`` and
+  optional ``seconds``.
+- ``dispatch_mode`` — ``mode``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+from .cache import memo
+
+__all__ = [
+    "EVENTS_FILENAME",
+    "SCHEMA_VERSION",
+    "TaskTelemetry",
+    "TelemetryState",
+    "log_path",
+    "append_event",
+    "read_events",
+    "replay",
+]
+
+EVENTS_FILENAME = ".telemetry-events.jsonl"
+SCHEMA_VERSION = 1
+
+# Fields of task_done that fill a task's row. The latest task_done for a
+# task wins (a task re-opened and closed again is re-measured); the
+# projection still never overwrites a cell that is already set.
+_DONE_FIELDS = ("duration", "seconds", "tokens_in", "tokens_out",
+                "cache_creation", "cache_read")
+
+
+def log_path(bean_dir: Path) -> Path:
+    """The event log of the bean in ``bean_dir``."""
+    return bean_dir / EVENTS_FILENAME
+
+
+def append_event(bean_dir: Path, event: str, **fields: object) -> dict:
+    """Append one event to the bean's log and return it.
+
+    ``ts`` defaults to now; a deferred job passes the moment it measured.
+    """
+    if fields.get("ts") is None:
+        fields["ts"] = round(time.time(), 3)
+    record = {"v": SCHEMA_VERSION, "ts": fields.pop("ts"), "event": event,
+              **fields}
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+    fd = os.open(log_path(bean_dir), os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+    return record
+
+
+def read_events(bean_dir: Path) -> list[dict]:
+    """All well-formed events in the bean's log, oldest first."""
+    try:
+        raw = log_path(bean_dir).read_bytes()
+    except OSError:
+        return []
+    events = []
+    for line in raw.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and "event" in record:
+            events.append(record)
+    return events
+
+
+class TaskTelemetry:
+    """What the log knows about one task."""
+
+    __slots__ = ("num", "started_at", "started_ts", "watermark",
+                 "transcript", "offset", "completed_at", "dispatch",
+                 "workers", "timing", *_DONE_FIELDS)
+
+    def __init__(self, num: str) -> None:
+        self.num = num
+        self.started_at: str | None = None
+        self.started_ts: float | None = None
+        self.watermark: tuple[int, int, int, int] | None = None
+        self.transcript: str | None = None
+        self.offset: int | None = None
+        self.completed_at: str | None = None
+        self.dispatch: str | None = None
+        self.workers = 0
+        self.timing: dict | None = None
+        self.duration: str | None = None
+        self.seconds: float | None = None
+        self.tokens_in: str | None = None
+        self.tokens_out: str | None = None
+        self.cache_creation = 0
+        self.cache_read = 0
+
+    @property
+    def done(self) -> bool:
+        return self.completed_at is not None
+
+
+class TelemetryState:
+    """The log folded into per-task and per-bean values."""
+
+    __slots__ = ("tasks", "started_at", "started_ts", "completed_at",
+                 "duration", "seconds", "dispatch_mode")
+
+    def __init__(self) -> None:
+        self.tasks: dict[str, TaskTelemetry] = {}
+        self.started_at: str | None = None
+        self.started_ts: float | None = None
+        self.completed_at: str | None = None
+        self.duration: str | None = None
+        self.seconds: float | None = None
+        self.dispatch_mode: str | None = None
+
+    def task(self, num: str) -> TaskTelemetry:
+        entry = self.tasks.get(num)
+        if entry is None:
+            entry = self.tasks[num] = TaskTelemetry(num)
+        return entry
+
+    def apply(self, record: dict) -> None:
+        kind = record.get("event")
+        if kind == "task_started" and record.get("task"):
+            entry = self.task(str(record["task"]))
+            entry.started_at = record.get("at") or entry.started_at
+            entry.started_ts = record.get("ts") or entry.started_ts
+            tokens = record.get("tokens")
+            if isinstance(tokens, list) and len(tokens) == 4:
+                # A re-started task re-baselines, as the watermark always did.
+                entry.watermark = tuple(int(t) for t in tokens)
+            transcript = record.get("transcript")
+            entry.transcript = str(transcript) if transcript else None
+            entry.offset = int(record.get("offset") or 0) if transcript else None
+        elif kind == "task_done" and record.get("task"):
+            entry = self.task(str(record["task"]))
+            entry.completed_at = record.get("at") or ""
+            for name in ("duration", "tokens_in", "tokens_out"):
+                value = record.get(name)
+                setattr(entry, name, None if value is None else str(value))
+            seconds = record.get("seconds")
+            entry.seconds = None if seconds is None else float(seconds)
+            entry.cache_creation = int(record.get("cache_creation") or 0)
+            entry.cache_read = int(record.get("cache_read") or 0)
+            entry.dispatch = record.get("dispatch")
+            entry.workers = int(record.get("workers") or 0)
+            timing = record.get("timing")
+            entry.timing = timing if isinstance(timing, dict) else None
+        elif kind == "bean_started":
+            self.started_at = record.get("at")
+            self.started_ts = record.get("ts")
+        elif kind == "bean_done":
+            self.completed_at = record.get("at")
+            self.duration = record.get("duration")
+            seconds = record.get("seconds")
+            self.seconds = None if seconds is None else float(seconds)
+        elif kind == "dispatch_mode":
+            self.dispatch_mode = record.get("mode")
+
+    def done_tasks(self) -> list[TaskTelemetry]:
+        return [t for t in self.tasks.values() if t.done]
+
+    def token_totals(self) -> tuple[int, int, int, int] | None:
+        """Summed (in, out, cache_creation, cache_read) over done tasks
+        with numeric token counts; None when there are none."""
+        totals = [0, 0, 0, 0]
+        found = False
+        for entry in self.done_tasks():
+            try:
+                tin = int((entry.tokens_in or "").replace(",", ""))
+                tout = int((entry.tokens_out or "").replace(",", ""))
+            except ValueError:
+                continue
+            found = True
+            totals[0] += tin
+            totals[1] += tout
+            totals[2] += entry.cache_creation
+            totals[3] += entry.cache_read
+        return tuple(totals) if found else None
+
+    def timing_totals(self) -> dict | None:
+        """Task ``timing`` records summed over done tasks (same keys; a
+        ``hook_s`` of None counts as unknown); None when no task has one."""
+        totals: dict = {"turns": 0, "model_s": 0.0, "tool_s": 0.0,
+                        "hook_s": None, "tools": {}}
+        found = False
+        for entry in self.done_tasks():
+            timing = entry.timing
+            if not timing:
+                continue
+            found = True
+            totals["turns"] += int(timing.get("turns") or 0)
+            totals["model_s"] += float(timing.get("model_s") or 0)
+            totals["tool_s"] += float(timing.get("tool_s") or 0)
+            if timing.get("hook_s") is not None:
+                totals["hook_s"] = (totals["hook_s"] or 0.0) + float(
+                    timing["hook_s"])
+            for name, (secs, calls) in (timing.get("tools") or {}).items():
+                tool = totals["tools"].setdefault(name, [0.0, 0])
+                tool[0] += float(secs)
+                tool[1] += int(calls)
+        return totals if found else None
+
+
+def replay(bean_dir: Path) -> TelemetryState:
+    """Fold the bean's log into a :class:`TelemetryState` (do not mutate it:
+    it is shared until the log changes)."""
+    path = log_path(bean_dir)
+
+    def compute() -> TelemetryState:
+        state = TelemetryState()
+        for record in read_events(bean_dir):
+            try:
+                state.apply(record)
+            except (TypeError, ValueError):
+                continue  # hand-edited / foreign record: skip it
+        return state
+
+    return memo("telemetry-log", str(path), [path], compute)
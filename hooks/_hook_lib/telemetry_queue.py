@@ -0,0 +1,212 @@
+"""Deferred telemetry jobs: a spool directory drained by one worker at a time.
+
+telemetry-stamp's PostToolUse work that reaches beyond the edited file —
+token deltas over whole transcripts, the event log, bean.md rows — is
+written here as a compact job and done by a background worker, so the hook
+returns without waiting for it.
+
+Each job is one JSON file, ``<time_ns>-<pid>.json``, written atomically
+into the queue directory; the names sort in enqueue order. A drainer holds
+an exclusive lock on the queue while it runs every queued job oldest first
+— so the jobs of one bean run in the order they were queued — and unlinks
+a batch only after it ran. Delivery is therefore at-least-once (a drainer
+killed mid-batch leaves the batch for the next one) and jobs must be
+idempotent. Within a batch, a job supersedes an earlier one with the same
+``key``, and each distinct follow-up a job asks for (:func:`drain`'s
+``finish``) runs once, after the whole batch. A job that raises is renamed
+to ``.failed`` and kept for inspection.
+
+Drainers never wait for each other: one that finds the lock taken leaves,
+and the holder lists the queue again after releasing the lock, so a job
+queued meanwhile is never stranded. :func:`flush` is the blocking form,
+for readers that need every queued result on disk (merge-bean totals); it
+and :func:`drain` can be limited to one bean's jobs, so a hook about to
+read one bean does not pay for every other project's backlog.
+
+The queue lives in ``/tmp``, so its directory is trusted only when it is
+this user's and nobody else's (mode 0700): otherwise another user could
+have made it first and fed the drainer jobs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Hashable
+
+from .fileio import LockTimeout, atomic_write_text, file_lock
+
+__all__ = [
+    "UnsafeQueueDir",
+    "queue_dir",
+    "enqueue",
+    "pending",
+    "failed",
+    "drain",
+    "flush",
+]
+
+_SUFFIX = ".json"
+_FAILED_SUFFIX = ".failed"
+
+
+class UnsafeQueueDir(OSError):
+    """The queue directory exists but is not this user's private one."""
+
+
+def queue_dir() -> Path:
+    """The per-user queue directory (jobs carry absolute paths), created
+    with mode 0700 if missing. Raises :class:`UnsafeQueueDir` if it is not
+    a directory owned by this user and closed to everyone else."""
+    directory = Path(f"/tmp/.foundry-telemetry-queue-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(directory)
+    if (not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid()
+            or st.st_mode & 0o077):
+        raise UnsafeQueueDir(f"{directory} is not a private directory of "
+                             f"this user; not using it")
+    return directory
+
+
+def enqueue(job: dict) -> Path:
+    """Spool one job; returns its file."""
+    path = queue_dir() / f"{time.time_ns():020d}-{os.getpid()}{_SUFFIX}"
+    atomic_write_text(path, json.dumps(job, separators=(",", ":")) + "\n")
+    return path
+
+
+def _job_files() -> list[Path]:
+    try:
+        directory = queue_dir()
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    # Temp files of an in-flight atomic write start with a dot.
+    return [directory / name for name in sorted(names)
+            if name.endswith(_SUFFIX) and not name.startswith(".")]
+
+
+def _load(path: Path) -> dict | None:
+    try:
+        job = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return job if isinstance(job, dict) else None
+
+
+def pending(bean: str | None = None) -> int:
+    """Number of queued jobs (only those for ``bean`` when given)."""
+    files = _job_files()
+    if bean is None or not files:
+        return len(files)
+    return sum(1 for path in files if (_load(path) or {}).get("bean") == bean)
+
+
+def failed() -> list[Path]:
+    """Jobs that raised, kept for inspection."""
+    try:
+        directory = queue_dir()
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return [directory / name for name in sorted(names)
+            if name.endswith(_FAILED_SUFFIX)]
+
+
+def _run_batch(
+    run: Callable[[dict], Hashable | None],
+    finish: Callable[[Hashable], None] | None,
+    bean: str | None = None,
+) -> bool:
+    """Run every queued job (only those for ``bean`` when given) once;
+    False when there were none."""
+    jobs: list[tuple[Path, dict]] = []
+    latest: dict[object, int] = {}
+    for path in _job_files():
+        job = _load(path)
+        if job is None:
+            if bean is None:
+                path.unlink(missing_ok=True)  # torn or foreign: nothing to run
+            continue
+        if bean is not None and job.get("bean") != bean:
+            continue
+        if job.get("key") is not None:
+            latest[job["key"]] = len(jobs)
+        jobs.append((path, job))
+    if not jobs:
+        return False
+
+    followups: dict[Hashable, None] = {}
+    for i, (path, job) in enumerate(jobs):
+        if job.get("key") is not None and latest[job["key"]] != i:
+            continue  # superseded later in this batch
+        try:
+            followup = run(job)
+        except Exception:
+            traceback.print_exc()
+            path.rename(path.with_suffix(_FAILED_SUFFIX))
+            continue
+        if followup is not None:
+            followups[followup] = None
+    if finish is not None:
+        for followup in followups:
+            try:
+                finish(followup)
+            except Exception:
+                traceback.print_exc()
+    for path, _ in jobs:
+        path.unlink(missing_ok=True)
+    return True
+
+
+def drain(
+    run: Callable[[dict], Hashable | None],
+    finish: Callable[[Hashable], None] | None = None,
+    timeout: float = 0.0,
+    bean: str | None = None,
+) -> bool:
+    """Run queued jobs (only those for ``bean`` when given) until none are
+    left.
+
+    ``run(job)`` does one job and may return a follow-up; ``finish`` is
+    called once per distinct follow-up of a batch, after it. Waits up to
+    ``timeout`` seconds for another drainer's lock (0: leave at once).
+    Returns True if this call ran the last of them, False if another
+    drainer holds the queue.
+    """
+    while pending(bean):
+        try:
+            with file_lock(queue_dir(), timeout=timeout):
+                while _run_batch(run, finish, bean):
+                    pass
+        except LockTimeout:
+            return False
+    return True
+
+
+def flush(
+    run: Callable[[dict], Hashable | None],
+    finish: Callable[[Hashable], None] | None = None,
+    timeout: float = 60.0,
+    bean: str | None = None,
+) -> bool:
+    """Block until every queued job (every one for ``bean`` when given) has
+    run, here or by the drainer that holds the queue. False if that took
+    longer than ``timeout``."""
+    deadline = time.monotonic() + timeout
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            print(f"telemetry-queue: {pending(bean)} job(s) still queued",
+                  file=sys.stderr)
+            return False
+        if drain(run, finish, timeout=left, bean=bean):
+            return True
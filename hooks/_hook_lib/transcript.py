@@ -0,0 +1,283 @@
+"""Token usage from Claude Code session transcripts (JSONL).
+
+Only ``"type": "assistant"`` lines carry ``message.usage``, and they are a
+small share of a transcript's bytes — most of it is user lines holding tool
+results. :func:`scan_usage` memory-maps the transcript, looks for the
+``"assistant"`` literal in the raw bytes, and parses only the lines that
+contain it (and a ``"usage"`` key); every other line is skipped without
+ever becoming a Python object.
+
+The prefilter is exact for JSON as Claude Code writes it. Inside a JSON
+string every quote is escaped, so an unescaped ``"assistant"`` only occurs
+as a real string token, and a line whose top-level type is assistant must
+contain one — unless the writer spelled the key or value with ``\\u``
+escapes, which JSON.stringify never does. :func:`add_usage_line` is the
+reference per-line parser; ``telemetry-stamp.py --verify-tokens`` runs both
+over real transcripts and reports any difference.
+
+Candidate lines are parsed whole: picking ``message.usage`` out by offset
+would need the same structural parse to tell it from a ``usage`` key nested
+in a tool input. With orjson installed they are parsed with it, falling back
+to json for the inputs orjson rejects (NaN, integers past 64 bits).
+
+:func:`scan_timing` reads a window of a transcript for where the time
+went: model turns, model time and tool execution time per tool name (see
+:class:`TurnTiming`).
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # optional: json is the baseline parser
+    orjson = None  # type: ignore[assignment]
+
+__all__ = [
+    "USAGE_KEYS",
+    "add_usage",
+    "add_usage_line",
+    "scan_usage",
+    "TurnTiming",
+    "scan_timing",
+]
+
+# message.usage keys, in the order of a totals list (in, out, cc, cr)
+USAGE_KEYS = ("input_tokens", "output_tokens", "cache_creation_input_tokens",
+              "cache_read_input_tokens")
+_ASSISTANT = b'"assistant"'
+_USAGE = b'"usage"'
+
+
+def _loads(raw: bytes) -> object:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
+def add_usage(msg: object, totals: list[int]) -> None:
+    """Add one parsed transcript record's usage to ``totals`` in place."""
+    if not isinstance(msg, dict) or msg.get("type") != "assistant":
+        return
+    message = msg.get("message")
+    usage = message.get("usage") if isinstance(message, dict) else None
+    if not isinstance(usage, dict):
+        return
+    totals[0] += usage.get("input_tokens", 0) or 0
+    totals[1] += usage.get("output_tokens", 0) or 0
+    totals[2] += usage.get("cache_creation_input_tokens", 0) or 0
+    totals[3] += usage.get("cache_read_input_tokens", 0) or 0
+
+
+def add_usage_line(raw: bytes, totals: list[int]) -> None:
+    """Reference parser: ``json.loads`` one whole line, no prefilter."""
+    raw = raw.strip()
+    if not raw:
+        return
+    try:
+        msg = json.loads(raw)
+    except ValueError:
+        return
+    add_usage(msg, totals)
+
+
+def _add_candidate(raw: bytes, totals: list[int]) -> None:
+    if _USAGE not in raw:
+        return
+    raw = raw.strip()
+    try:
+        msg = _loads(raw)
+    except ValueError:
+        return
+    add_usage(msg, totals)
+
+
+def _scan(buf, start: int, stop: int, totals: list[int]) -> int:
+    """Add usage from the complete lines of ``buf[start:stop]``; return the
+    index just past the last newline (``start`` if there is none)."""
+    complete = buf.rfind(b"\n", start, stop) + 1
+    if complete <= start:
+        return start
+    pos = start
+    while True:
+        hit = buf.find(_ASSISTANT, pos, complete)
+        if hit < 0:
+            return complete
+        newline = buf.rfind(b"\n", pos, hit)
+        line_start = newline + 1 if newline >= 0 else pos
+        line_end = buf.find(b"\n", hit, complete) + 1
+        _add_candidate(buf[line_start:line_end], totals)
+        pos = line_end
+
+
+def scan_usage(f, offset: int, end: int,
+               totals: list[int]) -> tuple[int, list[int]]:
+    """Scan bytes ``[offset, end)`` of the open binary transcript ``f``.
+
+    ``offset`` must be a line start. Usage from complete lines is added to
+    ``totals`` (input, output, cache_creation, cache_read) in place.
+    Returns the offset just past the last complete line and a copy of the
+    totals that also counts a trailing line without a newline — the writer
+    may still be appending to it, so callers count it without committing
+    past it.
+    """
+    if end <= offset:
+        return offset, list(totals)
+    try:
+        buf = mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ)
+        base = 0
+    except (OSError, ValueError):  # not mappable (pipe, special file)
+        f.seek(offset)
+        buf = f.read(end - offset)
+        base = offset
+    try:
+        committed = _scan(buf, offset - base, end - base, totals) + base
+        with_tail = list(totals)
+        if committed < end:
+            tail = buf[committed - base:end - base]
+            if _ASSISTANT in tail:
+                _add_candidate(tail, with_tail)
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+    return committed, with_tail
+
+
+# --- Turn timing ------------------------------------------------------------
+
+_TIMESTAMP = b'"timestamp"'
+
+
+def _epoch(value: object) -> float | None:
+    """Epoch seconds of a transcript ISO-8601 timestamp (None if invalid)."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class TurnTiming:
+    """Model and tool time, folded from transcript records in order.
+
+    A model turn is one API response (one ``message.id``, possibly logged as
+    several assistant lines, one per content block); its time runs from the
+    record that prompted it — the user prompt or the last tool result — to
+    its last logged block. A tool call's time runs from its ``tool_use``
+    block to the matching ``tool_result``, so it includes permission
+    prompts and PreToolUse/PostToolUse hooks; parallel calls overlap, so
+    their sum can exceed wall time. Sidechain records (subagents logged
+    inline by older versions) are skipped.
+    """
+
+    __slots__ = ("turns", "model_secs", "tool_secs", "tools", "_pending",
+                 "_input_ts", "_turn")
+
+    def __init__(self) -> None:
+        self.turns = 0
+        self.model_secs = 0.0
+        self.tool_secs = 0.0
+        # tool name -> [seconds, calls]
+        self.tools: dict[str, list] = {}
+        self._pending: dict[str, tuple[str, float]] = {}
+        self._input_ts: float | None = None
+        self._turn: list | None = None  # [message id, start, end]
+
+    def add(self, msg: object, since: float | None = None) -> None:
+        """Fold one parsed transcript record (ignored before ``since``)."""
+        if not isinstance(msg, dict) or msg.get("isSidechain"):
+            return
+        ts = _epoch(msg.get("timestamp"))
+        message = msg.get("message")
+        if ts is None or (since is not None and ts < since) or not isinstance(
+            message, dict
+        ):
+            return
+        content = message.get("content")
+        blocks = content if isinstance(content, list) else ()
+        kind = msg.get("type")
+        if kind == "assistant":
+            turn_id = message.get("id") or msg.get("requestId") or msg.get("uuid")
+            if self._turn is not None and self._turn[0] == turn_id:
+                self._turn[2] = ts
+            else:
+                self._close_turn()
+                start = ts if self._input_ts is None else self._input_ts
+                self._turn = [turn_id, start, ts]
+            for block in blocks:
+                if isinstance(block, dict) and block.get("type") == "tool_use":
+                    self._pending[str(block.get("id"))] = (
+                        str(block.get("name") or "?"), ts,
+                    )
+        elif kind == "user":
+            self._close_turn()
+            for block in blocks:
+                if not isinstance(block, dict) or block.get(
+                    "type"
+                ) != "tool_result":
+                    continue
+                started = self._pending.pop(str(block.get("tool_use_id")), None)
+                if started is None:
+                    continue
+                name, t0 = started
+                secs = max(0.0, ts - t0)
+                self.tool_secs += secs
+                entry = self.tools.setdefault(name, [0.0, 0])
+                entry[0] += secs
+                entry[1] += 1
+            self._input_ts = ts
+
+    def _close_turn(self) -> None:
+        if self._turn is not None:
+            self.turns += 1
+            self.model_secs += max(0.0, self._turn[2] - self._turn[1])
+            self._turn = None
+
+    def finish(self) -> TurnTiming:
+        """Close the turn in progress; returns self."""
+        self._close_turn()
+        return self
+
+    def slowest_tools(self, limit: int = 3) -> list[tuple[str, float, int]]:
+        """(name, seconds, calls) of the tools with the most time."""
+        ranked = sorted(self.tools.items(), key=lambda kv: -kv[1][0])
+        return [(name, secs, calls) for name, (secs, calls) in ranked[:limit]]
+
+
+def scan_timing(f, offset: int, end: int,
+                since: float | None = None) -> TurnTiming:
+    """Fold the complete lines of bytes ``[offset, end)`` of the open binary
+    transcript ``f`` into a :class:`TurnTiming`.
+
+    ``offset`` need not be a line start: a line it cuts into began before
+    the window and is skipped. Records stamped before ``since`` (epoch
+    seconds) are ignored too.
+    """
+    timing = TurnTiming()
+    if offset > 0:
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+    else:
+        f.seek(0)
+    pos = f.tell()
+    while pos < end:
+        raw = f.readline()
+        pos += len(raw)
+        if not raw.endswith(b"\n") or pos > end:
+            break  # still being written
+        if _TIMESTAMP not in raw:
+            continue
+        try:
+            msg = _loads(raw)
+        except ValueError:
+            continue
+        timing.add(msg, since)
+    return timing.finish()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Branch Guard Hook (PreToolUse, Edit|Write|NotebookEdit).
+
+Python form of the inline branch-protection shell check that used to live
+in hooks.json/settings.json, so it can run inside the resident hook server
+(hook-server.py) instead of forking a shell and ``git`` per tool call.
+The branch lookup is memoized on ``.git/HEAD`` (see _hook_lib.git_context).
+
+Exit code and stream are unchanged from the shell version: the message
+goes to stdout and the hook exits 1 on a protected branch, 0 otherwise.
+(The shell version single-quoted its message, so it printed a literal
+``$branch``; this one names the branch.)
+"""
+
+from __future__ import annotations
+
+import sys
+
+from _hook_lib.git_context import current_branch
+
+PROTECTED = ("main", "master", "test", "prod")
+
+
+def check(_input_data: dict | None = None) -> int:
+    """Branch check for one tool call; the payload itself is not needed."""
+    branch = current_branch()
+    if branch in PROTECTED:
+        print(
+            f"BLOCKED: Cannot edit files on a protected branch ({branch}). "
+            "Create a feature branch first."
+        )
+        return 1
+    return 0
+
+
+def main() -> None:
+    sys.exit(check())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Per-event hook dispatcher.
+
+Usage (from hooks.json / settings.json, via hook-client.py):
+
+    python3 hook-client.py dispatch <PreToolUse|PostToolUse|SessionStart|Stop>
+
+One registered command per event instead of one per hook: the payload is
+read and parsed once, then handed to each matching hook's ``check()`` as an
+in-process call, in the order the hooks used to be registered. The first
+hard block (exit 2) stops the chain — later hooks do not run — and becomes
+the dispatcher's exit code, with the blocking hook's stderr unchanged.
+
+Otherwise every matching hook runs and the exit code is the first non-zero
+one (branch-guard's exit 1), else 0. Each hook writes straight to
+stdout/stderr as it would standalone, and an unexpected exception in one
+hook is reported the way the interpreter would (traceback, exit 1)
+without stopping the others.
+
+Matchers are regular expressions over ``tool_name``, matched in full, as
+in the hook registration they replace. A hook may be routed for more than
+one event; its ``check()`` tells them apart by ``hook_event_name``.
+
+The hooks in :data:`GATES` only read: run twice, they decide the same and
+change nothing. ``dispatch.py --gates-only <event>`` runs just those —
+what hook-client.py falls back to when the hook server took a request and
+died before answering.
+
+Every hook call is measured (wall time, subprocesses, bytes read, decision,
+payload size) into the project's hook-metrics ring — see _hook_lib.metrics
+and ``hook-metrics.py report``.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+import traceback
+
+from _hook_lib import metrics
+from _hook_lib.runner import load_hook
+
+# event -> ordered (tool-name matcher or None for "any", hook name)
+ROUTES: dict[str, tuple[tuple[str | None, str], ...]] = {
+    "PreToolUse": (
+        ("Edit|Write|NotebookEdit", "branch-guard"),
+        ("Bash", "bash_safety"),
+        ("Write|Edit|MultiEdit|NotebookEdit", "write_safety"),
+        ("Edit|Write", "validate-task-inputs"),
+        ("Edit|Write", "vdd-gate"),
+        ("Edit|Write", "handoff-reminder"),
+        # Last: it rewrites the tool input, so only once the gates pass.
+        ("Edit|Write", "telemetry-stamp"),
+    ),
+    "PostToolUse": (
+        ("Edit|Write", "telemetry-stamp"),
+        ("Edit|Write", "format-on-save"),
+    ),
+    "SessionStart": (
+        (None, "session-start-context"),
+    ),
+    "Stop": (
+        (None, "stop-quality-reminder"),
+    ),
+}
+
+# The PreToolUse hooks that only decide (telemetry-stamp, last in the
+# chain, writes files).
+GATES = frozenset((
+    "branch-guard", "bash_safety", "write_safety", "validate-task-inputs",
+    "vdd-gate", "handoff-reminder",
+))
+
+BLOCK = 2
+
+
+def routes_for(event: str, tool_name: str) -> list[tuple[str | None, str]]:
+    """(matcher, hook name) pairs that apply to ``tool_name``, in order."""
+    return [
+        (matcher, name) for matcher, name in ROUTES.get(event, ())
+        if matcher is None or re.fullmatch(matcher, tool_name)
+    ]
+
+
+def hooks_for(event: str, tool_name: str) -> list[str]:
+    """Names of the hooks that apply to ``tool_name`` for ``event``, in order."""
+    return [name for _, name in routes_for(event, tool_name)]
+
+
+def _decision(code: int) -> str:
+    return {0: "allow", BLOCK: "block"}.get(code, f"exit {code}")
+
+
+def dispatch(event: str, payload: dict, payload_bytes: int = 0,
+             gates_only: bool = False) -> int:
+    """Run the hooks for ``event`` on a parsed payload (only the
+    :data:`GATES` if ``gates_only``); return the exit code."""
+    tool_name = payload.get("tool_name", "") if isinstance(payload, dict) else ""
+    record = metrics.enabled()
+    exit_code = 0
+    for matcher, name in routes_for(event, str(tool_name)):
+        if gates_only and name not in GATES:
+            continue
+        probe = metrics.Probe() if record else None
+        decision = None
+        try:
+            code = load_hook(name).check(payload)
+        except Exception:
+            traceback.print_exc()
+            code, decision = 1, "error"
+        if probe is not None:
+            metrics.append_record(probe.finish(
+                event=event, hook=name, matcher=matcher or "*",
+                tool=tool_name, decision=decision or _decision(code),
+                payload_bytes=payload_bytes, session=payload.get("session_id"),
+            ))
+        if code == BLOCK:
+            return BLOCK
+        if code and not exit_code:
+            exit_code = code
+    return exit_code
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    gates_only = args[:1] == ["--gates-only"]
+    if gates_only:
+        args = args[1:]
+    if len(args) != 1 or args[0] not in ROUTES:
+        print(f"usage: dispatch.py [--gates-only] <{'|'.join(ROUTES)}>",
+              file=sys.stderr)
+        sys.exit(0)  # Misconfiguration must never block a tool call
+    event = args[0]
+    raw = sys.stdin.buffer.read()
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        if event in ("PreToolUse", "PostToolUse"):
+            sys.exit(0)  # Allow on parse error, as each hook did
+        payload = {}  # SessionStart/Stop hooks never read the payload
+    sys.exit(dispatch(event, payload, len(raw), gates_only=gates_only))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,27 +18,23 @@ import sys
 from pathlib import Path
 
 
-def main() -> None:
-    try:
-        input_data = json.load(sys.stdin)
-    except json.JSONDecodeError:
-        sys.exit(0)
-
+def check(input_data: dict) -> int:
+    """Format the file named in one parsed payload; always returns 0."""
     if input_data.get("tool_name") not in ("Write", "Edit"):
-        sys.exit(0)
+        return 0
     file_path = input_data.get("tool_input", {}).get("file_path", "")
     if not file_path.endswith(".py"):
-        sys.exit(0)
+        return 0
     path = Path(file_path)
     if not path.is_file():
-        sys.exit(0)
+        return 0
 
     ruff = shutil.which("ruff")
     runner = [ruff] if ruff else (
         ["uv", "run", "ruff"] if shutil.which("uv") else None
     )
     if runner is None:
-        sys.exit(0)
+        return 0
 
     try:
         subprocess.run(
@@ -57,7 +53,15 @@ def main() -> None:
             )
     except Exception:
         pass
-    sys.exit(0)
+    return 0
+
+
+def main() -> None:
+    try:
+        input_data = json.load(sys.stdin)
+    except json.JSONDecodeError:
+        sys.exit(0)
+    sys.exit(check(input_data))
 
 
 if __name__ == "__main__":
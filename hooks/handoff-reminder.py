@@ -18,50 +18,44 @@ import re
 import sys
 from pathlib import Path
 
+from _hook_lib.cache import find_project_root, list_dir_names
+
 STATUS_DONE_RE = re.compile(r"\*\*Status\*\*\s*\|\s*Done\b", re.IGNORECASE)
 BEAN_ID_RE = re.compile(r"BEAN-(\d+)")
 
 
-def main() -> None:
-    try:
-        input_data = json.load(sys.stdin)
-    except json.JSONDecodeError:
-        sys.exit(0)
-
+def check(input_data: dict) -> int:
+    """Print the handoff reminder for one parsed payload; always returns 0."""
     tool_name = input_data.get("tool_name", "")
     tool_input = input_data.get("tool_input", {})
     if tool_name not in ("Write", "Edit"):
-        sys.exit(0)
+        return 0
 
     path = Path(tool_input.get("file_path", ""))
     if path.name != "bean.md" or "beans" not in path.parts:
-        sys.exit(0)
+        return 0
 
     new_text = (
         tool_input.get("content", "") if tool_name == "Write"
         else tool_input.get("new_string", "")
     )
     if not STATUS_DONE_RE.search(new_text):
-        sys.exit(0)
+        return 0
     old_text = tool_input.get("old_string", "") if tool_name == "Edit" else ""
     if STATUS_DONE_RE.search(old_text):
-        sys.exit(0)  # not a transition
+        return 0  # not a transition
 
     m = BEAN_ID_RE.search(str(path))
     if not m:
-        sys.exit(0)
+        return 0
     bean_num = m.group(1)
 
-    project_root = path.parent
-    while project_root != project_root.parent:
-        if (project_root / "ai" / "beans").is_dir():
-            break
-        project_root = project_root.parent
+    project_root = find_project_root(path.parent)
 
     handoffs_dir = project_root / "ai" / "handoffs"
-    has_packet = handoffs_dir.is_dir() and any(
-        bean_num in p.name for p in handoffs_dir.glob("*.md")
-        if p.name != "_index.md"
+    has_packet = any(
+        bean_num in name for name in list_dir_names(handoffs_dir, "*.md")
+        if name != "_index.md"
     )
     if not has_packet:
         print(
@@ -71,7 +65,15 @@ def main() -> None:
             f"/handoff before closing. Single-persona beans may ignore this.",
             file=sys.stderr,
         )
-    sys.exit(0)
+    return 0
+
+
+def main() -> None:
+    try:
+        input_data = json.load(sys.stdin)
+    except json.JSONDecodeError:
+        sys.exit(0)
+    sys.exit(check(input_data))
 
 
 if __name__ == "__main__":
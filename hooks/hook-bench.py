@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""Benchmark the hooks against a synthetic project.
+
+Usage:
+    python3 hook-bench.py generate [--profile small|medium|large] [--workdir DIR]
+    python3 hook-bench.py run [--profile P] [--runs N] [--only SUBSTR]
+                              [--save-baseline [FILE]] [--compare [FILE]]
+
+``run`` builds (or reuses) a synthetic project for the profile — thousands
+of bean dirs, a fat ai/beans/_index.md, VDD reports, handoffs, and a session
+transcript from 1 MB (small) to 1 GB (large); see _hook_lib.bench_fixtures —
+then drives each scenario through the hook's real contract: a fresh
+``python3 hooks/<hook>.py`` process, the payload on stdin, the exit code
+checked against the one the scenario expects. Per-run setup (restoring the
+bean files a stamp rewrote, dropping the transcript cursor for a cold scan)
+is not timed. The report gives p50/p95/p99/max wall time per scenario.
+
+Regression mode: ``--compare`` (default file: hooks/bench-baseline.json)
+exits 1 when a scenario's p95 is more than ``--tolerance`` (default 25%)
+and ``--min-delta-ms`` (default 2 ms) slower than the baseline's.
+Baselines are machine-specific: record one with ``--save-baseline`` on the
+machine that compares against it, before the change under test.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from _hook_lib import metrics
+from _hook_lib.bench_fixtures import (
+    BENCH_BEAN,
+    BENCH_SESSION,
+    PROFILES,
+    Fixture,
+    ensure_fixture,
+)
+from _hook_lib.runner import load_hook
+
+HOOKS_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HOOKS_DIR / "bench-baseline.json"
+DEFAULT_WORKDIR = Path("/tmp/.foundry-bench")
+
+
+class Scenario:
+    """One benchmarked hook invocation.
+
+    ``payload`` and ``setup`` take the fixture; ``setup`` runs (untimed)
+    before every run so each one starts from the same state.
+    """
+
+    __slots__ = ("name", "script", "args", "payload", "expect", "setup")
+
+    def __init__(self, name: str, script: str, payload, expect: int = 0,
+                 args: tuple[str, ...] = (), setup=None) -> None:
+        self.name = name
+        self.script = script
+        self.args = args
+        self.payload = payload
+        self.expect = expect
+        self.setup = setup
+
+
+# --- payloads ------------------------------------------------------------
+
+def _edit(path: Path, old: str = "", new: str = "x = 1",
+          event: str = "PreToolUse"):
+    return lambda fx: {
+        "hook_event_name": event, "tool_name": "Edit",
+        "session_id": BENCH_SESSION, "transcript_path": str(fx.transcript),
+        "cwd": str(fx.project),
+        "tool_input": {"file_path": str(fx.project / path),
+                       "old_string": old, "new_string": new},
+    }
+
+
+def _bash(command: str):
+    return lambda fx: {
+        "hook_event_name": "PreToolUse", "tool_name": "Bash",
+        "session_id": BENCH_SESSION, "cwd": str(fx.project),
+        "tool_input": {"command": command},
+    }
+
+
+def _batch(paths: list[Path]):
+    """A MultiEdit whose edits carry their own ``file_path`` each."""
+    return lambda fx: {
+        "hook_event_name": "PreToolUse", "tool_name": "MultiEdit",
+        "session_id": BENCH_SESSION, "cwd": str(fx.project),
+        "tool_input": {"file_path": str(fx.project / paths[0]), "edits": [
+            {"file_path": str(fx.project / path), "old_string": "",
+             "new_string": "x = 1"} for path in paths]},
+    }
+
+
+def _bare(event: str):
+    return lambda fx: {
+        "hook_event_name": event, "session_id": BENCH_SESSION,
+        "transcript_path": str(fx.transcript), "cwd": str(fx.project),
+    }
+
+
+# --- bench bean state ----------------------------------------------------
+
+_BEAN = Path("ai", "beans", BENCH_BEAN)
+_TASK = _BEAN / "tasks" / "01-developer-implement-feature.md"
+_STATUS_IN_PROGRESS = "| **Status** | In Progress |"
+_STATUS_PENDING = "| **Status** | Pending |"
+_STATUS_DONE = "| **Status** | Done |"
+
+_pristine: dict[Path, str] = {}
+
+
+def _restore(fx: Fixture) -> None:
+    """Put the bench bean back as committed and drop its event log."""
+    # Jobs the last run queued must not land after the reset.
+    subprocess.run(
+        [sys.executable, str(HOOKS_DIR / "telemetry-stamp.py"), "--flush"],
+        cwd=fx.project, env=_env(fx), capture_output=True,
+    )
+    for rel in (_BEAN / "bean.md", _TASK):
+        if rel not in _pristine:
+            _pristine[rel] = subprocess.run(
+                ["git", "show", f"HEAD:{rel.as_posix()}"], cwd=fx.project,
+                capture_output=True, text=True, check=True,
+            ).stdout
+        (fx.project / rel).write_text(_pristine[rel], encoding="utf-8")
+    telemetry_stamp = load_hook("telemetry-stamp")
+    telemetry_stamp.telemetry_log.log_path(fx.project / _BEAN).unlink(
+        missing_ok=True)
+
+
+def _drop_cursor(fx: Fixture) -> None:
+    load_hook("telemetry-stamp")._cursor_path(fx.transcript).unlink(
+        missing_ok=True)
+
+
+def _started_at() -> str:
+    # Twelve minutes ago, so stamped durations look like real ones.
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(time.time() - 720))
+
+
+def _task_status(status: str, started: bool = False):
+    def apply(fx: Fixture) -> None:
+        path = fx.project / _TASK
+        text = path.read_text(encoding="utf-8").replace(
+            _STATUS_PENDING, f"| **Status** | {status} |")
+        if started:
+            text = text.replace("| **Started** | — |",
+                                f"| **Started** | {_started_at()} |")
+        path.write_text(text, encoding="utf-8")
+    return apply
+
+
+def _seed_task_started(fx: Fixture) -> None:
+    load_hook("telemetry-stamp").telemetry_log.append_event(
+        fx.project / _BEAN, "task_started", task="1", at=_started_at(),
+        tokens=[0, 0, 0, 0])
+
+
+def _bean_done(fx: Fixture) -> None:
+    path = fx.project / _BEAN / "bean.md"
+    text = path.read_text(encoding="utf-8").replace(
+        _STATUS_IN_PROGRESS, _STATUS_DONE, 1)
+    path.write_text(text.replace("| **Started** | 2026-03-01 09:00 |",
+                                 f"| **Started** | {_started_at()} |", 1),
+                    encoding="utf-8")
+
+
+def _steps(*steps):
+    def run(fx: Fixture) -> None:
+        for step in steps:
+            step(fx)
+    return run
+
+
+def _task_done(cold: bool):
+    return _steps(_restore, _task_status("Done", started=True),
+                  _seed_task_started, *([_drop_cursor] if cold else []))
+
+
+def _task_start(cold: bool):
+    return _steps(_restore, _task_status("In Progress"),
+                  *([_drop_cursor] if cold else []))
+
+
+_DONE_EDIT = _edit(_BEAN / "bean.md", _STATUS_IN_PROGRESS, _STATUS_DONE)
+_CLAIM_EDIT = _edit(_TASK, _STATUS_PENDING, _STATUS_IN_PROGRESS)
+_TASK_POST = _edit(_TASK, event="PostToolUse")
+_BEAN_POST = _edit(_BEAN / "bean.md", event="PostToolUse")
+
+# A long commit message: prose full of "rm"/"git" in ordinary words.
+_HEREDOC = ("git commit -F - <<'EOF'\nPerform the format migration\n\n"
+            + "Inform the terminal of the git log permissions.\n" * 400
+            + "EOF")
+
+SCENARIOS = [
+    Scenario("branch-guard/edit", "branch-guard", _edit(Path("src/app.py"))),
+    Scenario("bash_safety/allow", "bash_safety",
+             _bash("git status && pytest -q tests/")),
+    Scenario("bash_safety/block", "bash_safety", _bash("rm -rf /"), expect=2),
+    Scenario("bash_safety/heredoc", "bash_safety", _bash(_HEREDOC)),
+    Scenario("write_safety/allow", "write_safety", _edit(Path("src/app.py"))),
+    Scenario("write_safety/block", "write_safety", _edit(Path(".env")),
+             expect=2),
+    Scenario("write_safety/batch", "write_safety",
+             _batch([Path("src", f"pkg{i % 8}", f"mod{i}.py")
+                     for i in range(300)])),
+    Scenario("validate-task-inputs/claim", "validate-task-inputs",
+             _CLAIM_EDIT),
+    Scenario("vdd-gate/done-no-report", "vdd-gate", _DONE_EDIT, expect=2,
+             setup=_restore),
+    Scenario("handoff-reminder/done", "handoff-reminder", _DONE_EDIT),
+    Scenario("format-on-save/py", "format-on-save",
+             _edit(Path("src/models.py"), event="PostToolUse")),
+    Scenario("telemetry-stamp/task-start-cold", "telemetry-stamp", _TASK_POST,
+             setup=_task_start(cold=True)),
+    Scenario("telemetry-stamp/task-done-cold", "telemetry-stamp", _TASK_POST,
+             setup=_task_done(cold=True)),
+    Scenario("telemetry-stamp/task-done-warm", "telemetry-stamp", _TASK_POST,
+             setup=_task_done(cold=False)),
+    Scenario("telemetry-stamp/bean-done", "telemetry-stamp", _BEAN_POST,
+             setup=_steps(_restore, _bean_done)),
+    Scenario("telemetry-stamp/other-file", "telemetry-stamp",
+             _edit(Path("src/app.py"), event="PostToolUse")),
+    Scenario("session-start-context", "session-start-context",
+             _bare("SessionStart")),
+    Scenario("stop-quality-reminder", "stop-quality-reminder", _bare("Stop")),
+    Scenario("dispatch/PreToolUse-Bash", "dispatch", _bash("ls -la"),
+             args=("PreToolUse",)),
+    Scenario("dispatch/PreToolUse-Edit", "dispatch",
+             _edit(Path("src/app.py")), args=("PreToolUse",)),
+    Scenario("dispatch/PreToolUse-bean-done", "dispatch", _DONE_EDIT,
+             expect=2, args=("PreToolUse",), setup=_restore),
+    Scenario("dispatch/PostToolUse-task-done", "dispatch", _TASK_POST,
+             args=("PostToolUse",), setup=_task_done(cold=False)),
+    Scenario("dispatch/SessionStart", "dispatch", _bare("SessionStart"),
+             args=("SessionStart",)),
+    Scenario("dispatch/Stop", "dispatch", _bare("Stop"), args=("Stop",)),
+]
+
+
+# --- running -------------------------------------------------------------
+
+def _env(fx: Fixture) -> dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "HOME": str(fx.home),
+        "CLAUDE_PROJECT_DIR": str(fx.project),
+        "CLAUDE_KIT_HOOK_METRICS": "0",
+    })
+    return env
+
+
+def run_scenario(fx: Fixture, scenario: Scenario, runs: int,
+                 warmup: int) -> list[float]:
+    """Wall-clock milliseconds of ``runs`` timed invocations.
+
+    Raises RuntimeError if an invocation exits with an unexpected code.
+    """
+    command = [sys.executable, str(HOOKS_DIR / f"{scenario.script}.py"),
+               *scenario.args]
+    env = _env(fx)
+    data = json.dumps(scenario.payload(fx)).encode("utf-8")
+    times: list[float] = []
+    for i in range(warmup + runs):
+        if scenario.setup is not None:
+            scenario.setup(fx)
+        t0 = time.perf_counter()
+        result = subprocess.run(command, input=data, capture_output=True,
+                                cwd=fx.project, env=env)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if result.returncode != scenario.expect:
+            raise RuntimeError(
+                f"{scenario.name}: exit {result.returncode}, expected "
+                f"{scenario.expect}\n{result.stderr.decode(errors='replace')}"
+            )
+        if i >= warmup:
+            times.append(elapsed)
+    return times
+
+
+def summarize(times: list[float]) -> dict[str, float]:
+    ordered = sorted(times)
+    return {
+        "p50": round(metrics.percentile(ordered, 50), 2),
+        "p95": round(metrics.percentile(ordered, 95), 2),
+        "p99": round(metrics.percentile(ordered, 99), 2),
+        "max": round(ordered[-1], 2),
+        "mean": round(sum(ordered) / len(ordered), 2),
+    }
+
+
+def compare(results: dict[str, dict], baseline: dict, tolerance: float,
+            min_delta_ms: float) -> dict[str, str]:
+    """Verdict per scenario against ``baseline``: ok, regressed, improved
+    or new."""
+    verdicts = {}
+    for name, stats in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            verdicts[name] = "new"
+            continue
+        delta = stats["p95"] - base["p95"]
+        if delta > min_delta_ms and stats["p95"] > base["p95"] * (1 + tolerance):
+            verdicts[name] = "REGRESSED"
+        elif -delta > min_delta_ms and stats["p95"] < base["p95"] * (1 - tolerance):
+            verdicts[name] = "improved"
+        else:
+            verdicts[name] = "ok"
+    return verdicts
+
+
+def _report(results: dict[str, dict], baseline: dict | None,
+            verdicts: dict[str, str]) -> str:
+    headers = ["Scenario", "p50 ms", "p95 ms", "p99 ms", "max ms"]
+    if baseline is not None:
+        headers += ["base p95", "Δ p95", "Verdict"]
+    rows = []
+    for name, stats in results.items():
+        row = [name, *(f"{stats[k]:.1f}" for k in ("p50", "p95", "p99", "max"))]
+        if baseline is not None:
+            base = baseline.get("scenarios", {}).get(name)
+            if base is None:
+                row += ["—", "—", verdicts[name]]
+            else:
+                pct = (stats["p95"] / base["p95"] - 1) * 100 if base["p95"] else 0
+                row += [f"{base['p95']:.1f}", f"{pct:+.0f}%", verdicts[name]]
+        rows.append(row)
+    return metrics.format_table(headers, rows)
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    profile = PROFILES[args.profile]
+    fx = ensure_fixture(args.workdir / profile.name, profile, args.seed)
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"hook-bench: cannot read baseline {args.compare}: {e}",
+                  file=sys.stderr)
+            return 2
+        if (baseline.get("profile"), baseline.get("fixture_version")) != (
+                profile.name, fx.info["version"]):
+            print(f"hook-bench: baseline is for profile "
+                  f"{baseline.get('profile')!r} (fixture v"
+                  f"{baseline.get('fixture_version')}), not {profile.name!r} "
+                  f"(v{fx.info['version']}); re-record it", file=sys.stderr)
+            return 2
+
+    scenarios = [s for s in SCENARIOS if not args.only or args.only in s.name]
+    print(f"hook-bench: profile {profile.name} "
+          f"({profile.beans} beans, {fx.info['transcript_bytes'] / 1e6:.0f} MB "
+          f"transcript), {args.runs} runs per scenario", file=sys.stderr)
+    results: dict[str, dict] = {}
+    try:
+        for scenario in scenarios:
+            results[scenario.name] = summarize(
+                run_scenario(fx, scenario, args.runs, args.warmup))
+    except RuntimeError as e:
+        print(f"hook-bench: {e}", file=sys.stderr)
+        return 2
+    finally:
+        _restore(fx)
+
+    verdicts = (compare(results, baseline, args.tolerance, args.min_delta_ms)
+                if baseline is not None else {})
+    print(_report(results, baseline, verdicts))
+
+    if args.save_baseline:
+        record = {
+            "profile": profile.name,
+            "fixture_version": fx.info["version"],
+            "runs": args.runs,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "scenarios": results,
+        }
+        Path(args.save_baseline).write_text(
+            json.dumps(record, indent=2) + "\n", encoding="utf-8")
+        print(f"hook-bench: baseline written to {args.save_baseline}",
+              file=sys.stderr)
+
+    regressed = [n for n, v in verdicts.items() if v == "REGRESSED"]
+    if regressed:
+        print(f"hook-bench: p95 regressed: {', '.join(regressed)}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("generate", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--profile", choices=sorted(PROFILES), default="small")
+        p.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+        p.add_argument("--seed", type=int, default=0)
+    run = sub.choices["run"]
+    run.add_argument("--runs", type=int, default=20)
+    run.add_argument("--warmup", type=int, default=2)
+    run.add_argument("--only", help="only scenarios whose name contains this")
+    run.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE))
+    run.add_argument("--compare", nargs="?", const=str(DEFAULT_BASELINE))
+    run.add_argument("--tolerance", type=float, default=0.25)
+    run.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        profile = PROFILES[args.profile]
+        t0 = time.perf_counter()
+        fx = ensure_fixture(args.workdir / profile.name, profile, args.seed)
+        print(f"hook-bench: {fx.root} ready "
+              f"({time.perf_counter() - t0:.1f}s)")
+        sys.exit(0)
+    sys.exit(cmd_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Hook client shim: run a hook through the resident hook server.
+
+Usage (from hooks.json / settings.json):
+
+    python3 hook-client.py <hook-name> [args...]
+    python3 hook-client.py dispatch PreToolUse    # one entry per event
+
+Reads the tool payload from stdin and forwards it to hook-server.py over
+its UNIX socket. The server runs the already-imported hook and sends back
+its stdout, stderr and exit code, which this shim reproduces exactly.
+
+When no server is running (the default — the server is opt-in), the shim
+runs the hook in this process, with the same streams and exit code as
+invoking ``python3 <hook-name>.py`` directly. Setting
+``CLAUDE_KIT_HOOK_DAEMON=1`` makes a miss also start the server in the
+background, so the following tool calls take the fast path.
+
+A server that took the request but never answered may have run the hook
+already, side effects and all, so the hook is not simply run again here.
+The gates (dispatch.GATES) have none: a gate, or ``dispatch PreToolUse``
+cut down to its gates, is run here so a block still blocks. Anything else
+is reported (exit 1, a non-blocking error).
+
+To check that, against a server killed in the middle of each request:
+
+    python3 hook-client.py --verify
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+from _hook_lib import hookd
+
+
+def _emit(reply: dict) -> None:
+    if reply.get("stdout"):
+        sys.stdout.write(reply["stdout"])
+        sys.stdout.flush()
+    if reply.get("stderr"):
+        sys.stderr.write(reply["stderr"])
+        sys.stderr.flush()
+    sys.exit(int(reply.get("exit", 0)))
+
+
+def _spawn_server() -> None:
+    import subprocess
+
+    server = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                          "hook-server.py")
+    try:
+        subprocess.Popen(
+            [sys.executable, server, "serve"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+    except OSError:
+        pass
+
+
+def _rerun(name: str, args: list[str]) -> tuple[str, list[str]] | None:
+    """The side-effect-free part of a hook call that went unanswered, to
+    run here; None if there is none."""
+    from _hook_lib.runner import load_hook
+
+    if name == "dispatch" and args == ["PreToolUse"]:
+        return name, ["--gates-only", *args]
+    if name in load_hook("dispatch").GATES:
+        return name, args
+    return None
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["--verify"]:
+        sys.exit(verify())
+    if len(sys.argv) < 2:
+        print("usage: hook-client.py <hook-name> [args...]", file=sys.stderr)
+        sys.exit(0)  # Misconfiguration must never block a tool call
+    name, args = sys.argv[1], sys.argv[2:]
+    payload = sys.stdin.buffer.read()
+
+    try:
+        reply = hookd.request(
+            {"op": "run", "hook": name, "args": args, "cwd": os.getcwd(),
+             "env": dict(os.environ)},
+            payload,
+        )
+    except hookd.NoReply as e:
+        # The server may already have run the hook (and its side effects):
+        # only what is safe to run twice is run here.
+        print(f"hook-client: {name}: {e}", file=sys.stderr)
+        rerun = _rerun(name, args)
+        if rerun is None:
+            sys.exit(1)
+        from _hook_lib.runner import run_hook
+
+        _emit(run_hook(rerun[0], payload, args=rerun[1]).to_dict())
+    if reply is not None and "exit" in reply:
+        _emit(reply)
+
+    if reply is None and os.environ.get("CLAUDE_KIT_HOOK_DAEMON") == "1":
+        _spawn_server()
+
+    from _hook_lib.runner import run_hook
+
+    _emit(run_hook(name, payload, args=args).to_dict())
+
+
+# --- Verification -------------------------------------------------------------
+
+# A server that reads one request and is killed before it answers.
+_DYING_SERVER = """
+import os, signal, socket, sys
+sys.path.insert(0, sys.argv[1])
+from _hook_lib import hookd
+server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+server.bind(hookd.socket_path())
+server.listen(1)
+print("ready", flush=True)
+conn, _ = server.accept()
+hookd.read_message(conn)
+os.kill(os.getpid(), signal.SIGKILL)
+"""
+
+# (hook, args, payload, exit code expected from the client)
+_CASES = (
+    ("dispatch", ["PreToolUse"],
+     {"tool_name": "Bash", "tool_input": {"command": "rm -rf /"}}, 2),
+    ("dispatch", ["PreToolUse"],
+     {"tool_name": "Bash", "tool_input": {"command": "ls"}}, 0),
+    ("dispatch", ["PreToolUse"],
+     {"tool_name": "Write", "tool_input": {"file_path": "/etc/hosts"}}, 2),
+    ("bash_safety", [],
+     {"tool_name": "Bash", "tool_input": {"command": "rm -rf /"}}, 2),
+    ("dispatch", ["PostToolUse"],
+     {"tool_name": "Edit", "tool_input": {"file_path": "x.py"}}, 1),
+)
+
+
+def verify() -> int:
+    """Run :data:`_CASES` against a server killed mid-request; 1 if a
+    client exits otherwise than expected."""
+    import json
+    import subprocess
+    import tempfile
+
+    here = os.path.dirname(os.path.realpath(__file__))
+    failures = 0
+    for name, args, payload, want in _CASES:
+        with tempfile.TemporaryDirectory() as runtime:
+            env = dict(os.environ, XDG_RUNTIME_DIR=runtime)
+            server = subprocess.Popen(
+                [sys.executable, "-c", _DYING_SERVER, here], env=env,
+                stdout=subprocess.PIPE, text=True)
+            try:
+                server.stdout.readline()
+                client = subprocess.run(
+                    [sys.executable, os.path.join(here, "hook-client.py"),
+                     name, *args],
+                    input=json.dumps(payload), env=env, cwd=runtime,
+                    capture_output=True, text=True, timeout=30)
+            finally:
+                server.kill()
+                server.wait()
+        what = f"{name} {' '.join(args)} {json.dumps(payload['tool_input'])}"
+        if client.returncode != want:
+            failures += 1
+            print(f"FAIL {what}: exit {client.returncode}, expected {want}\n"
+                  f"{client.stderr}")
+        else:
+            print(f"ok   {what}: exit {want}")
+    print(f"hook-client: {len(_CASES) - failures} of {len(_CASES)} "
+          f"unanswered requests handled as expected")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Report on hook latency records (see _hook_lib.metrics).
+
+Usage:
+    python3 hook-metrics.py report [--slowest N] [--hook NAME] [--project DIR]
+    python3 hook-metrics.py clear [--project DIR]
+
+``report`` prints p50/p95/p99 wall time per hook and per event matcher, with
+subprocess and bytes-read averages, then the slowest invocations with their
+payload sizes. Records come from the project's ``.claude/hook-metrics/``
+ring (CLAUDE_PROJECT_DIR or the cwd unless ``--project`` is given).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+from _hook_lib import metrics
+
+
+def _fmt_ms(value: float) -> str:
+    return f"{value:.1f}"
+
+
+def _fmt_bytes(value: float | None) -> str:
+    if value is None:
+        return "—"
+    if value < 1024:
+        return f"{value:.0f} B"
+    if value < 1024 * 1024:
+        return f"{value / 1024:.1f} KB"
+    return f"{value / (1024 * 1024):.1f} MB"
+
+
+def _stats_rows(groups: dict[tuple, list[dict]]) -> list[list[str]]:
+    rows = []
+    for key, recs in sorted(
+        groups.items(), key=lambda kv: -metrics.percentile(
+            sorted(r["ms"] for r in kv[1]), 95),
+    ):
+        ms = sorted(r["ms"] for r in recs)
+        reads = [r["read_bytes"] for r in recs
+                 if r.get("read_bytes") is not None]
+        blocks = sum(1 for r in recs if r.get("decision") == "block")
+        rows.append([
+            *key, str(len(recs)),
+            _fmt_ms(metrics.percentile(ms, 50)),
+            _fmt_ms(metrics.percentile(ms, 95)),
+            _fmt_ms(metrics.percentile(ms, 99)),
+            _fmt_ms(ms[-1]),
+            f"{sum(r.get('subprocs', 0) for r in recs) / len(recs):.2f}",
+            _fmt_bytes(sum(reads) / len(reads) if reads else None),
+            str(blocks),
+        ])
+    return rows
+
+
+def report(records: list[dict], slowest: int) -> str:
+    if not records:
+        return "hook-metrics: no records yet"
+    since = time.strftime("%Y-%m-%d %H:%M",
+                          time.localtime(records[0].get("ts", 0)))
+    stat_headers = ["Calls", "p50 ms", "p95 ms", "p99 ms", "max ms",
+                    "Subprocs/call", "Read/call", "Blocks"]
+
+    by_hook: dict[tuple, list[dict]] = defaultdict(list)
+    by_matcher: dict[tuple, list[dict]] = defaultdict(list)
+    for rec in records:
+        by_hook[(str(rec.get("hook", "?")),)].append(rec)
+        by_matcher[(str(rec.get("event", "?")),
+                    str(rec.get("matcher", "*")))].append(rec)
+
+    worst = sorted(records, key=lambda r: r["ms"], reverse=True)[:slowest]
+    slow_rows = [
+        [
+            time.strftime("%m-%d %H:%M:%S", time.localtime(r.get("ts", 0))),
+            str(r.get("hook", "?")), str(r.get("tool") or "—"),
+            _fmt_ms(r["ms"]), str(r.get("subprocs", 0)),
+            _fmt_bytes(r.get("read_bytes")),
+            _fmt_bytes(r.get("payload_bytes")),
+            str(r.get("decision", "?")),
+        ]
+        for r in worst
+    ]
+
+    return "\n\n".join([
+        f"Hook latency — {len(records)} calls since {since}",
+        "By hook\n" + metrics.format_table(
+            ["Hook", *stat_headers], _stats_rows(by_hook),
+        ),
+        "By matcher\n" + metrics.format_table(
+            ["Event", "Matcher", *stat_headers], _stats_rows(by_matcher),
+        ),
+        f"Slowest {len(slow_rows)}\n" + metrics.format_table(
+            ["When", "Hook", "Tool", "ms", "Subprocs", "Read", "Payload",
+             "Decision"], slow_rows,
+        ),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("report", "clear"))
+    parser.add_argument("--slowest", type=int, default=10)
+    parser.add_argument("--hook", help="only records for this hook")
+    parser.add_argument("--project", help="project dir (default: "
+                        "CLAUDE_PROJECT_DIR or the cwd)")
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        directory = metrics.metrics_dir(args.project)
+        for name in ("current.jsonl", "previous.jsonl"):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        print("hook-metrics: cleared")
+        return
+
+    records = metrics.read_records(args.project)
+    if args.hook:
+        records = [r for r in records if r.get("hook") == args.hook]
+    print(report(records, args.slowest))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
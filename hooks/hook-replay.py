@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Replay recorded tool calls through the hooks of one or two kit versions.
+
+Usage:
+    python3 hook-replay.py [TRANSCRIPT ...] [--repo DIR] [--kit KIT]
+                           [--kit KIT] [--hooks NAMES] [--jobs N]
+                           [--limit N] [--diffs N] [--json FILE]
+
+Every Bash / Edit / Write / MultiEdit / NotebookEdit call in the session
+transcripts (default: the repo's own, under ~/.claude/projects) goes through
+the PreToolUse hooks, then the PostToolUse hooks, the way dispatch.py runs
+them for the kit's ``ROUTES``:
+- hooks run in order, and the first hard block (exit 2) stops the chain;
+- input a hook rewrites (``updatedInput``) is what the later steps see;
+- an allowed Write / Edit / MultiEdit is applied to the repo, so the
+  hooks after it see the files it wrote;
+- Bash commands are never run.
+
+Only the hooks in ``--hooks`` run. The default is the stateless gates and
+the bean tooling: bash_safety, write_safety, validate-task-inputs, vdd-gate,
+handoff-reminder and telemetry-stamp.
+
+Each (kit, transcript) pair replays in its own sandbox, a fresh copy of
+``--repo`` (default: CLAUDE_PROJECT_DIR or the cwd), with HOME pointed
+inside it. Paths under the repo are rewritten to the copy, and back in
+the hooks' messages; a write outside the repo is not applied. Telemetry
+runs inline (CLAUDE_KIT_TELEMETRY_SYNC=1). The real repo, home and
+transcripts are only ever read.
+
+KIT is a kit checkout (a directory holding ``hooks/``) or a git revision
+of this kit, which is exported with ``git archive``. It defaults to this
+checkout. Each kit replays in its own worker processes, ``--jobs`` of them
+(default: one per CPU), with one transcript per task. The kit's own
+_hook_lib (its runner in particular) is used, so any kit recent enough to
+have hooks/_hook_lib/runner.py can be replayed.
+
+The report gives, per kit, each hook's calls, block rate and in-process
+p50/p95/p99 latency. With two kits (baseline first) it also lists the calls
+whose decision changed: allow/block, the blocking hook, or its message.
+``--json`` writes every replayed call. The exit code is 1 if any decision
+changed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+HOOKS_DIR = Path(__file__).resolve().parent
+KIT_ROOT = HOOKS_DIR.parent
+
+TOOLS = ("Bash", "Edit", "Write", "MultiEdit", "NotebookEdit")
+DEFAULT_HOOKS = ("bash_safety", "write_safety", "validate-task-inputs",
+                 "vdd-gate", "handoff-reminder", "telemetry-stamp")
+BLOCK = 2
+
+# Never copied into a sandbox: caches and environments nothing replays.
+_SANDBOX_IGNORE = shutil.ignore_patterns(
+    "node_modules", ".venv", "venv", "__pycache__", ".mypy_cache",
+    ".pytest_cache", ".tox", "hook-metrics")
+
+
+# --- transcripts ---------------------------------------------------------
+
+def transcript_dir(repo: Path) -> Path:
+    """Where Claude Code keeps the sessions started in ``repo``."""
+    return (Path.home() / ".claude" / "projects"
+            / re.sub(r"[^A-Za-z0-9]", "-", str(repo)))
+
+
+def tool_calls(path: Path, limit: int | None = None) -> list[dict]:
+    """The replayable tool calls of one transcript, in order:
+    ``{"line", "id", "tool", "input", "session"}``."""
+    calls: list[dict] = []
+    with open(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            if b'"tool_use"' not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            message = record.get("message") if isinstance(record, dict) else None
+            content = message.get("content") if isinstance(message, dict) else None
+            for block in content if isinstance(content, list) else ():
+                if (isinstance(block, dict) and block.get("type") == "tool_use"
+                        and block.get("name") in TOOLS
+                        and isinstance(block.get("input"), dict)):
+                    calls.append({
+                        "line": number, "id": block.get("id"),
+                        "tool": block["name"], "input": block["input"],
+                        "session": record.get("sessionId", ""),
+                    })
+                    if limit is not None and len(calls) >= limit:
+                        return calls
+    return calls
+
+
+def _subject(call: dict) -> str:
+    """What a call is about, for the report: its command or file."""
+    tool_input = call["input"]
+    value = (tool_input.get("command") or tool_input.get("file_path")
+             or tool_input.get("notebook_path") or "")
+    value = str(value).replace("\n", "⏎ ")
+    return value if len(value) <= 80 else value[:77] + "..."
+
+
+# --- kits ----------------------------------------------------------------
+
+def materialize_kit(spec: str, workdir: Path) -> Path:
+    """The ``hooks/`` directory of kit ``spec``: a checkout, or a revision
+    of this kit exported under ``workdir``.
+
+    Raises ValueError when it is neither, or too old to replay.
+    """
+    if Path(spec).is_dir():
+        root = Path(spec).resolve()
+    else:
+        rev = subprocess.run(
+            ["git", "-C", str(KIT_ROOT), "rev-parse", "--verify", "--quiet",
+             f"{spec}^{{commit}}"], capture_output=True, text=True)
+        if rev.returncode != 0:
+            raise ValueError(f"{spec}: neither a kit directory nor a revision")
+        sha = rev.stdout.strip()
+        root = workdir / f"kit-{sha[:12]}"
+        if not root.is_dir():
+            archive = subprocess.run(
+                ["git", "-C", str(KIT_ROOT), "archive", "--format=tar", sha],
+                capture_output=True, check=True)
+            with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+                try:
+                    tar.extractall(root, filter="data")
+                except TypeError:  # Python without extraction filters
+                    tar.extractall(root)
+    hooks = root / "hooks"
+    if not (hooks / "_hook_lib" / "runner.py").is_file():
+        raise ValueError(f"{spec}: no hooks/_hook_lib/runner.py (kit too old "
+                         f"to replay)")
+    return hooks
+
+
+# --- worker (one per kit process) ----------------------------------------
+
+def _init_worker(kit_hooks: str) -> None:
+    """Make this process import the hooks and _hook_lib of ``kit_hooks``."""
+    for name in list(sys.modules):
+        if name == "_hook_lib" or name.startswith(("_hook_lib.", "hook_")):
+            del sys.modules[name]
+    sys.path.insert(0, kit_hooks)
+
+
+def _rewrite(value, old: str, new: str):
+    """``value`` (a tool input) with every ``old`` path prefix as ``new``."""
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, list):
+        return [_rewrite(v, old, new) for v in value]
+    if isinstance(value, dict):
+        return {k: _rewrite(v, old, new) for k, v in value.items()}
+    return value
+
+
+def _apply(tool: str, tool_input: dict, project: Path) -> bool:
+    """Do an allowed write in the sandbox; False if it cannot be done (the
+    file moved on since the transcript was recorded) or would land outside
+    the sandbox's repo."""
+    path = tool_input.get("file_path")
+    if not isinstance(path, str) or not path:
+        return False
+    try:
+        if not Path(path).resolve().is_relative_to(project):
+            return False
+        if tool == "Write":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(str(tool_input.get("content", "")),
+                                  encoding="utf-8")
+            return True
+        text = Path(path).read_text(encoding="utf-8")
+        edits = tool_input.get("edits") if tool == "MultiEdit" else [tool_input]
+        for edit in edits if isinstance(edits, list) else ():
+            old, new = edit.get("old_string", ""), edit.get("new_string", "")
+            if not old or old not in text:
+                return False
+            text = (text.replace(old, new) if edit.get("replace_all")
+                    else text.replace(old, new, 1))
+        Path(path).write_text(text, encoding="utf-8")
+        return True
+    except (OSError, UnicodeDecodeError, AttributeError):
+        return False
+
+
+def _updated_input(stdout: str) -> dict | None:
+    try:
+        output = json.loads(stdout) if stdout.strip() else None
+    except ValueError:
+        return None
+    specific = output.get("hookSpecificOutput") if isinstance(output, dict) else None
+    updated = specific.get("updatedInput") if isinstance(specific, dict) else None
+    return updated if isinstance(updated, dict) else None
+
+
+def replay_transcript(transcript: str, repo: str, hooks: list[str],
+                      limit: int | None, workdir: str) -> list[dict]:
+    """Replay one transcript in a fresh sandbox (runs in a kit worker).
+
+    Returns one record per call: ``{"transcript", "line", "id", "tool",
+    "subject", "decision", "message", "applied", "runs": [[hook, event,
+    exit, ms]]}``; ``decision`` is ``allow`` or ``block:<hook>``.
+    """
+    from _hook_lib.runner import load_hook, run_hook
+
+    routes = load_hook("dispatch").ROUTES
+    sandbox = Path(tempfile.mkdtemp(prefix="replay-", dir=workdir))
+    project = sandbox / "repo"
+    shutil.copytree(repo, project, symlinks=True, ignore=_SANDBOX_IGNORE)
+    home = sandbox / "home"
+    home.mkdir()
+    # Hooks key per-transcript state (telemetry scan cursors) by path: a
+    # link of its own keeps the replay's apart from live sessions'.
+    session_log = sandbox / Path(transcript).name
+    session_log.symlink_to(transcript)
+    env = dict(os.environ)
+    env.update({
+        "HOME": str(home),
+        "CLAUDE_PROJECT_DIR": str(project),
+        "CLAUDE_KIT_HOOK_METRICS": "0",
+        "CLAUDE_KIT_TELEMETRY_SYNC": "1",
+    })
+    records = []
+    try:
+        for call in tool_calls(Path(transcript), limit):
+            tool = call["tool"]
+            tool_input = _rewrite(call["input"], repo, str(project))
+            record = {
+                "transcript": transcript, "line": call["line"],
+                "id": call["id"], "tool": tool, "subject": _subject(call),
+                "decision": "allow", "message": "", "applied": False,
+                "runs": [],
+            }
+            for event in ("PreToolUse", "PostToolUse"):
+                payload = {
+                    "hook_event_name": event, "tool_name": tool,
+                    "tool_input": tool_input, "session_id": call["session"],
+                    "transcript_path": str(session_log),
+                    "cwd": str(project),
+                }
+                if event == "PostToolUse":
+                    payload["tool_response"] = {}
+                data = json.dumps(payload).encode("utf-8")
+                for matcher, name in routes.get(event, ()):
+                    if name not in hooks or (
+                            matcher is not None
+                            and not re.fullmatch(matcher, tool)):
+                        continue
+                    t0 = time.perf_counter()
+                    result = run_hook(name, data, cwd=str(project), env=env)
+                    ms = (time.perf_counter() - t0) * 1000
+                    record["runs"].append([name, event, result.exit_code,
+                                           round(ms, 3)])
+                    if event == "PreToolUse":
+                        updated = _updated_input(result.stdout)
+                        if updated is not None:
+                            tool_input = updated
+                            payload["tool_input"] = tool_input
+                            data = json.dumps(payload).encode("utf-8")
+                    if result.exit_code == BLOCK and event == "PreToolUse":
+                        record["decision"] = f"block:{name}"
+                        record["message"] = result.stderr.strip().replace(
+                            str(project), repo)
+                        break
+                if record["decision"] != "allow":
+                    break
+                if event == "PreToolUse" and tool in ("Write", "Edit",
+                                                      "MultiEdit"):
+                    record["applied"] = _apply(tool, tool_input,
+                                               project.resolve())
+            records.append(record)
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+    return records
+
+
+# --- report --------------------------------------------------------------
+
+def hook_stats(records: list[dict]) -> dict[tuple[str, str], dict]:
+    """Per (hook, event): calls, blocks and latency percentiles."""
+    from _hook_lib import metrics
+
+    times: dict[tuple[str, str], list[float]] = defaultdict(list)
+    blocks: dict[tuple[str, str], int] = defaultdict(int)
+    for record in records:
+        for name, event, code, ms in record["runs"]:
+            times[(name, event)].append(ms)
+            blocks[(name, event)] += code == BLOCK
+    stats = {}
+    for key, values in sorted(times.items()):
+        values.sort()
+        stats[key] = {
+            "calls": len(values), "blocks": blocks[key],
+            "p50": metrics.percentile(values, 50),
+            "p95": metrics.percentile(values, 95),
+            "p99": metrics.percentile(values, 99),
+            "total": sum(values),
+        }
+    return stats
+
+
+def decision_diffs(base: list[dict], head: list[dict]) -> list[tuple[dict, dict]]:
+    """Calls replayed by both kits whose decision or message differ."""
+    index = {(r["transcript"], r["line"], r["id"]): r for r in base}
+    diffs = []
+    for record in head:
+        other = index.get((record["transcript"], record["line"], record["id"]))
+        if other is not None and (other["decision"], other["message"]) != (
+                record["decision"], record["message"]):
+            diffs.append((other, record))
+    return diffs
+
+
+def _kit_report(label: str, records: list[dict]) -> str:
+    from _hook_lib import metrics
+
+    blocked = sum(1 for r in records if r["decision"] != "allow")
+    applied = sum(1 for r in records if r["applied"])
+    rows = [[name, event, str(s["calls"]), str(s["blocks"]),
+             f"{s['blocks'] / s['calls'] * 100:.1f}%", f"{s['p50']:.2f}",
+             f"{s['p95']:.2f}", f"{s['p99']:.2f}", f"{s['total']:.0f}"]
+            for (name, event), s in hook_stats(records).items()]
+    table = metrics.format_table(
+        ["Hook", "Event", "Calls", "Blocks", "Block rate", "p50 ms", "p95 ms",
+         "p99 ms", "Total ms"], rows)
+    return (f"## {label}\n\n{len(records)} calls replayed: {blocked} "
+            f"blocked, {applied} writes applied\n\n{table}\n")
+
+
+def _diff_report(diffs: list[tuple[dict, dict]], shown: int) -> str:
+    from _hook_lib import metrics
+
+    rows = []
+    for base, head in diffs[:shown]:
+        rows.append([f"{Path(base['transcript']).name}:{base['line']}",
+                     base["tool"], base["subject"],
+                     f"{base['decision']} {base['message'][:60]}".strip(),
+                     f"{head['decision']} {head['message'][:60]}".strip()])
+    text = f"## Decision changes: {len(diffs)}\n"
+    if rows:
+        text += "\n" + metrics.format_table(
+            ["Call", "Tool", "Subject", "Baseline", "Candidate"], rows) + "\n"
+        if len(diffs) > shown:
+            text += f"\n({len(diffs) - shown} more; see --json)\n"
+    return text
+
+
+# --- main ----------------------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcripts", nargs="*", type=Path)
+    parser.add_argument("--repo", type=Path, default=Path(
+        os.environ.get("CLAUDE_PROJECT_DIR") or os.getcwd()))
+    parser.add_argument("--kit", action="append",
+                        help="kit directory or revision; twice to compare "
+                             "(baseline first)")
+    parser.add_argument("--hooks", default=",".join(DEFAULT_HOOKS))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--limit", type=int,
+                        help="replay at most N calls per transcript")
+    parser.add_argument("--diffs", type=int, default=20,
+                        help="decision changes to list (default 20)")
+    parser.add_argument("--json", type=Path, help="write every replayed call")
+    args = parser.parse_args()
+
+    kits = args.kit or [str(KIT_ROOT)]
+    if len(kits) > 2:
+        parser.error("--kit: at most two (baseline, candidate)")
+    repo = args.repo.resolve()
+    transcripts = args.transcripts or sorted(
+        transcript_dir(repo).glob("*.jsonl"))
+    if not transcripts:
+        print(f"hook-replay: no transcripts (looked in {transcript_dir(repo)})",
+              file=sys.stderr)
+        sys.exit(2)
+    hooks = [name for name in args.hooks.split(",") if name]
+
+    workdir = Path(tempfile.mkdtemp(prefix="hook-replay-"))
+    try:
+        try:
+            kit_hooks = [materialize_kit(spec, workdir) for spec in kits]
+        except (ValueError, subprocess.CalledProcessError) as e:
+            print(f"hook-replay: {e}", file=sys.stderr)
+            sys.exit(2)
+        print(f"hook-replay: {len(transcripts)} transcript(s), "
+              f"{len(kits)} kit(s), {args.jobs} job(s) per kit",
+              file=sys.stderr)
+        pools = [ProcessPoolExecutor(args.jobs, initializer=_init_worker,
+                                     initargs=(str(hooks_dir),))
+                 for hooks_dir in kit_hooks]
+        t0 = time.perf_counter()
+        try:
+            futures = [[pool.submit(replay_transcript, str(t.resolve()),
+                                    str(repo), hooks, args.limit,
+                                    str(workdir))
+                        for t in transcripts] for pool in pools]
+            results = [[record for future in kit for record in future.result()]
+                       for kit in futures]
+        finally:
+            for pool in pools:
+                pool.shutdown(cancel_futures=True)
+        seconds = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"hook-replay: done in {seconds:.1f}s", file=sys.stderr)
+    for spec, records in zip(kits, results):
+        print(_kit_report(f"Kit {spec}", records))
+    diffs = decision_diffs(*results) if len(results) == 2 else []
+    if len(results) == 2:
+        print(_diff_report(diffs, args.diffs))
+    if args.json:
+        args.json.write_text(json.dumps(
+            {"kits": kits, "repo": str(repo),
+             "calls": dict(zip(kits, results))}, indent=1) + "\n",
+            encoding="utf-8")
+    sys.exit(1 if diffs else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Resident hook server (opt-in).
+
+Every Edit/Write used to fork one ``python3`` per hook, and each of them
+re-imported its modules, re-parsed stdin and re-ran git. This server keeps
+the hook modules imported and their caches warm (git branch memoized on
+.git/HEAD, project roots, pricing, VDD/handoff directory listings — see
+_hook_lib.cache) and runs hooks on behalf of hook-client.py over a
+UNIX socket in a private per-user directory (see _hook_lib.hookd). The
+client falls back to running the hook itself whenever the server is
+absent, so nothing depends on it being up.
+
+Usage:
+    python3 hook-server.py start     # spawn in the background
+    python3 hook-server.py stop
+    python3 hook-server.py status
+    python3 hook-server.py serve     # run in the foreground
+
+Requests are handled one at a time: hooks swap process-wide state
+(std streams, cwd, environment) while they run. The server exits after
+``--idle-timeout`` seconds without a request (default 30 minutes), and
+answers "stale" then exits when its own support code (_hook_lib) changes
+on disk; edited hook scripts are simply re-imported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from _hook_lib import hookd
+from _hook_lib.cache import stat_signature
+from _hook_lib.runner import HOOKS_DIR, load_hook, run_hook
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+# Hooks imported at startup so the first tool call is already warm.
+PRELOAD = (
+    "dispatch", "branch-guard", "bash_safety", "write_safety", "validate-task-inputs",
+    "vdd-gate", "handoff-reminder", "telemetry-stamp", "format-on-save",
+    "session-start-context", "stop-quality-reminder",
+)
+
+
+def _lib_signature() -> tuple:
+    return stat_signature(sorted((HOOKS_DIR / "_hook_lib").glob("*.py")))
+
+
+def _reply(conn: socket.socket, data: dict) -> None:
+    conn.sendall(json.dumps(data).encode("utf-8") + b"\n")
+
+
+def _request(header: dict) -> dict | None:
+    """A control request's reply; None when there is none."""
+    try:
+        return hookd.request(header)
+    except hookd.NoReply:
+        return None
+
+
+def serve(idle_timeout: float) -> None:
+    path = hookd.socket_path()
+    if path is None:
+        print("hook-server: no private directory for the socket "
+              "($XDG_RUNTIME_DIR or /tmp/.foundry-hookd-<uid>, mode 0700)",
+              file=sys.stderr)
+        return
+    if _request({"op": "ping"}) is not None:
+        print(f"hook-server: already running on {path}", file=sys.stderr)
+        return
+    if os.path.lexists(path):
+        if hookd.owned_socket(path) is None:
+            print(f"hook-server: {path} exists and is not our socket",
+                  file=sys.stderr)
+            return
+        os.unlink(path)  # left behind by a server that died
+
+    for name in PRELOAD:
+        try:
+            load_hook(name)
+        except Exception as e:
+            print(f"hook-server: preload {name} failed: {e}", file=sys.stderr)
+
+    lib_sig = _lib_signature()
+    started = time.time()
+    served = 0
+    old_umask = os.umask(0o177)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    bound = os.lstat(path).st_ino
+    server.listen(16)
+    server.settimeout(idle_timeout)
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+            with conn:
+                conn.settimeout(hookd.REPLY_TIMEOUT)
+                try:
+                    header, payload = hookd.read_message(conn)
+                except (OSError, ValueError, ConnectionError):
+                    continue
+                op = header.get("op")
+                try:
+                    if op == "ping":
+                        _reply(conn, {
+                            "ok": True, "pid": os.getpid(),
+                            "uptime": round(time.time() - started, 1),
+                            "served": served,
+                        })
+                    elif op == "shutdown":
+                        _reply(conn, {"ok": True})
+                        break
+                    elif op == "run":
+                        if _lib_signature() != lib_sig:
+                            _reply(conn, {"stale": True})
+                            break
+                        result = run_hook(
+                            str(header.get("hook", "")), payload,
+                            cwd=header.get("cwd"), env=header.get("env"),
+                            args=[str(a) for a in header.get("args") or ()],
+                        )
+                        served += 1
+                        _reply(conn, result.to_dict())
+                    else:
+                        _reply(conn, {"error": f"unknown op {op!r}"})
+                except OSError:
+                    continue
+    finally:
+        server.close()
+        st = hookd.owned_socket(path)
+        if st is not None and st.st_ino == bound:
+            os.unlink(path)
+
+
+def start(idle_timeout: float) -> int:
+    if _request({"op": "ping"}) is not None:
+        print(f"hook-server: already running ({hookd.socket_path()})")
+        return 0
+    subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "serve",
+         "--idle-timeout", str(idle_timeout)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        reply = _request({"op": "ping"})
+        if reply is not None:
+            print(f"hook-server: started (pid {reply['pid']}, "
+                  f"{hookd.socket_path()})")
+            return 0
+        time.sleep(0.05)
+    print("hook-server: failed to start", file=sys.stderr)
+    return 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("start", "stop", "status", "serve"))
+    parser.add_argument("--idle-timeout", type=float,
+                        default=DEFAULT_IDLE_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.idle_timeout)
+    elif args.command == "start":
+        sys.exit(start(args.idle_timeout))
+    elif args.command == "stop":
+        reply = _request({"op": "shutdown"})
+        print("hook-server: stopped" if reply else "hook-server: not running")
+    else:
+        reply = _request({"op": "ping"})
+        if reply is None:
+            print("hook-server: not running")
+            sys.exit(1)
+        print(f"hook-server: running (pid {reply['pid']}, "
+              f"uptime {reply['uptime']}s, {reply['served']} hook runs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,22 +12,17 @@ Always exits 0 — context injection must never block a session.
 from __future__ import annotations
 
 import re
-import subprocess
 import sys
 from collections import Counter
 from pathlib import Path
 
+from _hook_lib.git_context import current_branch
+
 PROTECTED = ("main", "master", "test", "prod")
 
 
 def _branch() -> str:
-    try:
-        return subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True, text=True, timeout=5,
-        ).stdout.strip()
-    except Exception:
-        return ""
+    return current_branch()
 
 
 def _backlog_counts() -> Counter[str] | None:
@@ -51,7 +46,8 @@ def _backlog_counts() -> Counter[str] | None:
     return counts
 
 
-def main() -> None:
+def check(_input_data: dict | None = None) -> int:
+    """Print the session context block; never blocks (returns 0)."""
     lines: list[str] = []
     branch = _branch()
     if branch:
@@ -72,7 +68,11 @@ def main() -> None:
         )
     if lines:
         print("\n".join(lines))
-    sys.exit(0)
+    return 0
+
+
+def main() -> None:
+    sys.exit(check())
 
 
 if __name__ == "__main__":
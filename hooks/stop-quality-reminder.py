@@ -12,21 +12,19 @@ The hard gates live elsewhere (vdd-gate.py, branch protection).
 
 from __future__ import annotations
 
-import subprocess
 import sys
 
+from _hook_lib.git_context import porcelain_status
 
-def main() -> None:
-    try:
-        result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            capture_output=True, text=True, timeout=10,
-        )
-    except Exception:
-        sys.exit(0)
+
+def check(_input_data: dict | None = None) -> int:
+    """Print the quality reminder if needed; never blocks (returns 0)."""
+    status = porcelain_status()
+    if status is None:
+        return 0
 
     py_changes = [
-        line for line in result.stdout.splitlines()
+        line for line in status.splitlines()
         if line.strip().endswith(".py") and not line.startswith("??")
     ]
     if py_changes:
@@ -35,7 +33,11 @@ def main() -> None:
             f"in the working tree. Before marking work done: run the test "
             f"suite and lint (e.g. `uv run pytest` and `uv run ruff check`)."
         )
-    sys.exit(0)
+    return 0
+
+
+def main() -> None:
+    sys.exit(check())
 
 
 if __name__ == "__main__":
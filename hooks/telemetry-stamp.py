@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
-"""PostToolUse hook: auto-stamp telemetry timestamps in bean/task files.
+"""Edit/Write hook: auto-stamp telemetry timestamps in bean/task files.
 
-Fires after Edit/Write on files matching:
+Fires on Edit/Write of files matching:
   ai/beans/BEAN-*/bean.md
   ai/beans/BEAN-*/tasks/*.md
 
@@ -13,20 +13,74 @@ When a bean is marked Done, duration is computed from git timestamps
 (first commit on the feature branch → now) for second-level precision.
 Falls back to Started/Completed metadata if git is unavailable.
 
+Each file is parsed once into a ``BeanDocument`` (hooks/_hook_lib); all
+field reads, stamps and table updates run against that model and the file
+is written back at most once, byte-identical outside the edited rows.
+
+Measurements (task start watermarks, per-task durations and token deltas,
+bean start/done, dispatch mode) are appended to the bean's event log
+(_hook_lib.telemetry_log); the bean.md Telemetry rows are rendered from
+that log, so a row lost to a concurrent bean.md write is restored by the
+next render.
+
+A task's token delta also counts its workers' transcripts: the session's
+native subagents and the sessions run in the repository's linked worktrees,
+each attributed to the task whose file its opening prompt names first.
+
+On Done, the task's window of the session transcript (from its
+task_started event) is also read for model turns, model time, tool time
+and the slowest tools, with hook time from the hook metrics ring; they are
+stamped into the task file and rolled up into the bean's Telemetry summary.
+
+In PreToolUse the stamps are applied to the content the tool is about to
+write and returned as its updated input, so the file lands already stamped
+and the model need not re-read it. PostToolUse then does the cross-file
+work (watermarks, token deltas, the bean.md row, the event log) and stamps
+the file itself only when the PreToolUse stamps did not land.
+
+From a hook, that cross-file work is not done inline: it is queued as a
+compact job (_hook_lib.telemetry_queue) and run by a detached
+``telemetry-stamp.py --drain`` worker, so the tool call does not wait on
+transcript scans. Hooks that read a bean's log first run its queued jobs;
+``CLAUDE_KIT_TELEMETRY_SYNC=1`` runs them inline instead. Before reading
+totals (merge-bean), wait for the queue:
+
+    python3 telemetry-stamp.py --flush [--timeout S]
+
 Reads hook input JSON from stdin, writes JSON message to stdout when
 a file is modified.
+
+Bulk mode, for pricing changes and imported beans — recomputes rollups
+(Total Tokens/Cost/Duration, per-task Cost, Orchestration fields) for every
+bean, idempotently, across a process pool:
+
+    python3 telemetry-stamp.py --backfill ai/beans [--check] [--jobs N]
+
+``--check`` writes nothing, lists the drift and exits 1 if there is any.
+
+Transcript token sums use a prefiltered fast path (_hook_lib.transcript);
+to check it against plain per-line ``json.loads`` on real transcripts:
+
+    python3 telemetry-stamp.py --verify-tokens [TRANSCRIPT ...]
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import re
-import subprocess
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
-SENTINEL = "—"
+from _hook_lib import SENTINEL, BeanDocument, TableRow
+from _hook_lib import git_context, metrics, telemetry_log, telemetry_queue
+from _hook_lib.cache import disk_memo, list_dir_names, memo
+from _hook_lib.fileio import atomic_write_text, file_lock
+from _hook_lib.transcript import add_usage_line, scan_timing, scan_usage
+
 TIMESTAMP_FMT = "%Y-%m-%d %H:%M"
 
 # Fallback pricing if config file is missing or unparseable
@@ -40,20 +94,107 @@ BEAN_RE = re.compile(r"ai/beans/BEAN-\d+-[^/]+/bean\.md$")
 TASK_RE = re.compile(r"ai/beans/BEAN-\d+-[^/]+/tasks/.*\.md$")
 
 
-def read_pricing() -> tuple[float, float, float, float]:
-    """Read token pricing from ai/context/token-pricing.md.
+_PRICING_REL = Path("ai") / "context" / "token-pricing.md"
+# Fallback next to the kit checkout: two levels above hooks/
+_KIT_REPO_PRICING = Path(__file__).resolve().parent.parent.parent / _PRICING_REL
+
+
+def _pricing_candidates() -> list[Path]:
+    """Candidate locations of ai/context/token-pricing.md, in priority order."""
+    return [Path(os.getcwd()) / _PRICING_REL, _KIT_REPO_PRICING]
+
 
-    Returns (input_rate, cache_creation_rate, cache_read_rate, output_rate)
-    in dollars per token. Falls back to defaults if the file is missing.
+_RATE_RE = re.compile(r"\$([0-9.]+)\s+per token")
+_CELL_RATE_RE = re.compile(r"^\$?([0-9.]+)(?:\s+per token)?$")
+# Summary rows in token-pricing.md -> index in a rates tuple
+_RATE_LABELS = (
+    ("**Input Rate**", 0),
+    ("**Cache Creation Rate**", 1),
+    ("**Cache Read Rate**", 2),
+    ("**Output Rate**", 3),
+)
+# Header cells of the optional per-model table -> index in a rates tuple
+_MODEL_COLUMNS = (("input", 0), ("cache creation", 1), ("cache read", 2),
+                  ("output", 3))
+
+Rates = tuple[float, float, float, float]
+DEFAULT_RATES: Rates = (DEFAULT_INPUT_RATE, DEFAULT_CACHE_CREATION_RATE,
+                        DEFAULT_CACHE_READ_RATE, DEFAULT_OUTPUT_RATE)
+
+
+class Pricing:
+    """Parsed token pricing: a default rate table plus per-model tables.
+
+    Rates are (input, cache_creation, cache_read, output) in dollars per
+    token. ``rates(model)`` resolves a transcript model id (e.g.
+    ``claude-opus-4-1-20250805``) to the longest matching table name and
+    remembers the answer, so repeated lookups are a dict hit.
     """
-    try:
-        candidates = [
-            Path.cwd() / "ai" / "context" / "token-pricing.md",
-        ]
-        script_dir = Path(__file__).resolve().parent
-        repo_root = script_dir.parent.parent
-        candidates.append(repo_root / "ai" / "context" / "token-pricing.md")
 
+    __slots__ = ("default", "models", "_resolved")
+
+    def __init__(self, default: Rates = DEFAULT_RATES,
+                 models: dict[str, Rates] | None = None) -> None:
+        self.default = default
+        self.models = models or {}
+        self._resolved: dict[str, Rates] = {}
+
+    def rates(self, model: str | None = None) -> Rates:
+        if not model or not self.models:
+            return self.default
+        hit = self._resolved.get(model)
+        if hit is None:
+            name = max((m for m in self.models if model.startswith(m)),
+                       key=len, default=None)
+            hit = self.models[name] if name is not None else self.default
+            self._resolved[model] = hit
+        return hit
+
+    def to_json(self) -> dict:
+        return {"default": list(self.default),
+                "models": {m: list(r) for m, r in self.models.items()}}
+
+    @classmethod
+    def from_json(cls, data: dict) -> Pricing:
+        return cls(tuple(data["default"]),
+                   {m: tuple(r) for m, r in data.get("models", {}).items()})
+
+
+def _parse_model_table(lines: list[str], start: int,
+                       default: Rates) -> dict[str, Rates]:
+    """Rows of a ``| Model | Input Rate | ... |`` table starting at ``start``.
+
+    Columns may appear in any order; a missing or unparseable cell takes the
+    file's default rate for that tier.
+    """
+    header = [
+        c.strip().lower() for c in lines[start].strip().strip("|").split("|")
+    ]
+    columns: dict[int, int] = {}
+    for col, name in enumerate(header):
+        for label, idx in _MODEL_COLUMNS:
+            if name.startswith(label):
+                columns[col] = idx
+                break
+    models: dict[str, Rates] = {}
+    for line in lines[start + 1:]:
+        stripped = line.strip()
+        if not stripped.startswith("|"):
+            break
+        cells = [c.strip() for c in stripped.strip("|").split("|")]
+        if not cells or not cells[0] or set(cells[0]) <= set("-: "):
+            continue
+        rates = list(default)
+        for col, idx in columns.items():
+            m = _CELL_RATE_RE.match(cells[col]) if col < len(cells) else None
+            if m:
+                rates[idx] = float(m.group(1))
+        models[cells[0].strip("`")] = tuple(rates)
+    return models
+
+
+def _parse_pricing(candidates: list[Path]) -> Pricing:
+    try:
         content = None
         for path in candidates:
             if path.exists():
@@ -61,44 +202,75 @@ def read_pricing() -> tuple[float, float, float, float]:
                 break
 
         if content is None:
-            return (DEFAULT_INPUT_RATE, DEFAULT_CACHE_CREATION_RATE,
-                    DEFAULT_CACHE_READ_RATE, DEFAULT_OUTPUT_RATE)
+            return Pricing()
+
+        rates = list(DEFAULT_RATES)
+        lines = content.splitlines()
+        table_starts: list[int] = []
+        for i, line in enumerate(lines):
+            m = _RATE_RE.search(line)
+            if m:
+                for label, idx in _RATE_LABELS:
+                    if label in line:
+                        rates[idx] = float(m.group(1))
+                        break
+            elif line.lstrip().startswith("|"):
+                first = line.strip().strip("|").split("|")[0].strip().lower()
+                if first == "model":
+                    table_starts.append(i)
+
+        default = tuple(rates)
+        models: dict[str, Rates] = {}
+        for start in table_starts:
+            models.update(_parse_model_table(lines, start, default))
+        return Pricing(default, models)
+
+    except Exception:
+        return Pricing()
 
-        input_rate = DEFAULT_INPUT_RATE
-        cache_creation_rate = DEFAULT_CACHE_CREATION_RATE
-        cache_read_rate = DEFAULT_CACHE_READ_RATE
-        output_rate = DEFAULT_OUTPUT_RATE
 
-        for line in content.splitlines():
-            m = re.search(r"\$([0-9.]+)\s+per token", line)
-            if not m:
-                continue
-            rate = float(m.group(1))
-            if "**Input Rate**" in line:
-                input_rate = rate
-            elif "**Cache Creation Rate**" in line:
-                cache_creation_rate = rate
-            elif "**Cache Read Rate**" in line:
-                cache_read_rate = rate
-            elif "**Output Rate**" in line:
-                output_rate = rate
-
-        return input_rate, cache_creation_rate, cache_read_rate, output_rate
+def load_pricing() -> Pricing:
+    """Load token pricing from ai/context/token-pricing.md.
 
-    except Exception:
-        return (DEFAULT_INPUT_RATE, DEFAULT_CACHE_CREATION_RATE,
-                DEFAULT_CACHE_READ_RATE, DEFAULT_OUTPUT_RATE)
+    The file's ``**Input Rate**``-style rows give the default table; an
+    optional table whose first column is ``Model`` adds per-model rates.
+    Falls back to the built-in defaults if the file is missing. Cached per
+    process and in /tmp against the candidate files' stat signature, so
+    only an edited pricing file is ever re-parsed; a batch recompute should
+    call this once and pass the result to :func:`compute_cost`.
+    """
+    candidates = _pricing_candidates()
+    key = "|".join(str(p) for p in candidates)
+
+    def from_disk() -> Pricing:
+        return Pricing.from_json(disk_memo(
+            "pricing", key, candidates,
+            lambda: _parse_pricing(candidates).to_json(),
+        ))
+
+    return memo("pricing-table", key, candidates, from_disk)
+
+
+def read_pricing() -> Rates:
+    """Default (input, cache_creation, cache_read, output) rates per token."""
+    return load_pricing().default
 
 
 def compute_cost(tokens_in: int, tokens_out: int,
-                  cache_creation: int = 0, cache_read: int = 0) -> float:
+                  cache_creation: int = 0, cache_read: int = 0,
+                  model: str | None = None,
+                  pricing: Pricing | None = None) -> float:
     """Compute dollar cost from token counts using config rates.
 
     tokens_in is the combined total (non-cached + cache_creation + cache_read).
     Cache tokens are subtracted from tokens_in before applying the base input
-    rate, then charged at their own tier rates.
+    rate, then charged at their own tier rates. ``model`` selects a
+    per-model table (default table otherwise); pass ``pricing`` to skip the
+    lookup entirely when costing many rows.
     """
-    input_rate, cache_creation_rate, cache_read_rate, output_rate = read_pricing()
+    input_rate, cache_creation_rate, cache_read_rate, output_rate = (
+        (pricing or load_pricing()).rates(model)
+    )
     non_cached_in = max(0, tokens_in - cache_creation - cache_read)
     return (non_cached_in * input_rate
             + cache_creation * cache_creation_rate
@@ -121,73 +293,6 @@ def now_stamp() -> str:
     return datetime.now().strftime(TIMESTAMP_FMT)
 
 
-def parse_metadata_field(content: str, field: str) -> str | None:
-    """Extract value of a bold field from a markdown metadata table.
-
-    Looks for rows like: | **Field** | Value |
-    Returns the stripped value, or None if not found.
-    """
-    pattern = re.compile(
-        r"^\|\s*\*\*" + re.escape(field) + r"\*\*\s*\|\s*(.*?)\s*\|",
-        re.MULTILINE,
-    )
-    m = pattern.search(content)
-    if m:
-        return m.group(1).strip()
-    return None
-
-
-def replace_metadata_field(content: str, field: str, value: str) -> str:
-    """Replace value of a bold field in a markdown metadata table.
-
-    Replaces: | **Field** | old_value |
-    With:     | **Field** | new_value |
-    """
-    pattern = re.compile(
-        r"(^\|\s*\*\*" + re.escape(field) + r"\*\*\s*\|\s*)(.*?)(\s*\|)",
-        re.MULTILINE,
-    )
-    return pattern.sub(rf"\g<1>{value}\3", content, count=1)
-
-
-def add_metadata_field(content: str, field: str, value: str) -> str:
-    """Add a new metadata field row to the first markdown table in content.
-
-    Inserts | **Field** | value | after the last row of the first metadata table.
-    Returns content unchanged if no table is found.
-    """
-    lines = content.splitlines()
-    last_row_idx = -1
-    separator_seen = False
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith("|") and re.match(r"^\|[\s\-|]+\|$", stripped):
-            separator_seen = True
-            continue
-        if separator_seen and stripped.startswith("|"):
-            last_row_idx = i
-        elif separator_seen and not stripped.startswith("|"):
-            break
-
-    if last_row_idx < 0:
-        return content
-
-    new_row = f"| **{field}** | {value} |"
-    lines.insert(last_row_idx + 1, new_row)
-    return "\n".join(lines)
-
-
-def ensure_metadata_field(content: str, field: str, default: str = SENTINEL) -> str:
-    """Ensure a metadata field exists, adding it if missing.
-
-    Returns content unchanged if the field already exists.
-    """
-    if parse_metadata_field(content, field) is not None:
-        return content
-    return add_metadata_field(content, field, default)
-
-
 def format_seconds(seconds: float) -> str:
     """Format a duration in seconds to human-readable string.
 
@@ -205,6 +310,33 @@ def format_seconds(seconds: float) -> str:
     return f"{hours}h {minutes}m"
 
 
+def format_elapsed(seconds: float) -> str:
+    """Second-resolution elapsed time: '4.2s', '3m 12s', '1h 4m'.
+
+    Used wherever the seconds are actually known (epoch event stamps,
+    transcript timestamps); ``parse_duration_to_seconds`` reads it back.
+    The value is rounded to a unit's resolution before the unit is chosen,
+    so 59.95 is '1m 0s', never '60.0s' (see :data:`ELAPSED_CASES`).
+    """
+    tenths = round(seconds, 1)
+    if tenths < 60:
+        return f"{tenths:.1f}s"
+    total = round(seconds)
+    if total < 3600:
+        return f"{total // 60}m {total % 60}s"
+    minutes = round(seconds / 60)
+    return f"{minutes // 60}h {minutes % 60}m"
+
+
+# format_elapsed at and around its unit boundaries: (seconds, text).
+ELAPSED_CASES = (
+    (0, "0.0s"), (4.24, "4.2s"), (59.94, "59.9s"), (59.95, "1m 0s"),
+    (59.99, "1m 0s"), (60, "1m 0s"), (192.4, "3m 12s"), (3599.4, "59m 59s"),
+    (3599.6, "1h 0m"), (3600, "1h 0m"), (3629.9, "1h 0m"),
+    (3630.1, "1h 1m"), (7199.9, "2h 0m"),
+)
+
+
 def format_duration(started: str, completed: str) -> str:
     """Compute human-readable duration between two timestamps.
 
@@ -219,6 +351,31 @@ def format_duration(started: str, completed: str) -> str:
         return "< 1m"
 
 
+# Started/Completed cells are minute-resolution, so an epoch start and the
+# cells' own difference can disagree by up to a minute either way.
+_PRECISE_TOLERANCE_SECONDS = 120
+
+
+def precise_seconds(
+    started_ts: float | None, started: str | None, completed: str | None,
+) -> float | None:
+    """Seconds from the epoch ``started_ts`` (a logged start event) to now.
+
+    Only trusted when it agrees with the Started→Completed cells — a clock
+    step or a hand-edited Started makes it None, and callers fall back to
+    the minute-resolution cells.
+    """
+    start, end = parse_timestamp(started), parse_timestamp(completed)
+    if not started_ts or start is None or end is None:
+        return None
+    seconds = time.time() - started_ts
+    if seconds < 0 or abs(
+        seconds - (end - start).total_seconds()
+    ) > _PRECISE_TOLERANCE_SECONDS:
+        return None
+    return seconds
+
+
 def parse_timestamp(value: str | None) -> datetime | None:
     """Parse a metadata timestamp; None if missing/unparseable."""
     if not value:
@@ -236,13 +393,7 @@ def _checkpoint_path() -> Path:
     on their own branch; keying the checkpoint by branch keeps their token
     baselines from clobbering each other (SPEC-005).
     """
-    try:
-        branch = subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True, text=True, timeout=5,
-        ).stdout.strip()
-    except Exception:
-        branch = ""
+    branch = git_context.current_branch()
     suffix = re.sub(r"[^A-Za-z0-9_-]", "_", branch) if branch else "default"
     return Path(f"/tmp/.foundry-telemetry-checkpoint-{suffix}.json")
 
@@ -262,36 +413,19 @@ def git_branch_duration() -> str | None:
     sanity ceiling.
     """
     try:
-        # Get current branch name
-        branch = subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True, text=True, timeout=5,
-        ).stdout.strip()
-
+        branch = git_context.current_branch()
         if not branch or branch == "main":
             return None
 
-        # Find the merge base with main
-        for base in ("main",):
-            result = subprocess.run(
-                ["git", "merge-base", base, "HEAD"],
-                capture_output=True, text=True, timeout=5,
-            )
-            if result.returncode == 0:
-                merge_base = result.stdout.strip()
-                break
-        else:
+        merge_base = git_context.merge_base("main")
+        if merge_base is None:
             return None
 
-        # Get timestamp of first commit after merge base
-        result = subprocess.run(
-            ["git", "log", "--format=%aI", "--reverse", f"{merge_base}..HEAD"],
-            capture_output=True, text=True, timeout=5,
-        )
-        if result.returncode != 0 or not result.stdout.strip():
+        # Timestamp of the first commit after the merge base
+        first_commit_ts = git_context.first_commit_date(merge_base)
+        if first_commit_ts is None:
             return None
 
-        first_commit_ts = result.stdout.strip().split("\n")[0]
         dt_start = datetime.fromisoformat(first_commit_ts)
         dt_now = datetime.now(timezone.utc)
         # Ensure both are offset-aware for comparison
@@ -306,219 +440,120 @@ def git_branch_duration() -> str | None:
         return None
 
 
-def parse_duration_to_seconds(dur: str) -> int | None:
-    """Parse a duration string like '< 1m', '5m', '1h 30m' to seconds."""
+DURATION_RE = re.compile(
+    r"^(?:(\d+)h)?\s*(?:(\d+)m)?\s*(?:(\d+(?:\.\d+)?)s)?$"
+)
+
+
+def parse_duration_to_seconds(dur: str) -> float | None:
+    """Parse a duration string to seconds: the minute-resolution '< 1m',
+    '5m', '1h 30m' and the second-resolution '42.5s', '3m 12s'."""
     dur = dur.strip()
     if dur == "< 1m":
         return 30  # approximate
-    m = re.match(r"^(?:(\d+)h)?\s*(?:(\d+)m)?$", dur)
-    if m and (m.group(1) or m.group(2)):
+    m = DURATION_RE.match(dur)
+    if m and any(m.groups()):
         hours = int(m.group(1) or 0)
         minutes = int(m.group(2) or 0)
-        return hours * 3600 + minutes * 60
+        return hours * 3600 + minutes * 60 + float(m.group(3) or 0)
     return None
 
 
-def parse_tasks_table(content: str) -> list[tuple[str, str, str]]:
-    """Parse the Tasks table in a bean.md.
-
-    Returns list of (num, task_name, owner) for rows with non-empty task names.
-    """
-    rows: list[tuple[str, str, str]] = []
-    in_tasks = False
-    separator_seen = False
-    for line in content.splitlines():
-        stripped = line.strip()
-        if stripped.startswith("## Tasks"):
-            in_tasks = True
-            continue
-        if in_tasks and stripped.startswith("##"):
-            break
-        if not in_tasks:
-            continue
-        if not stripped.startswith("|"):
-            if separator_seen and stripped and not stripped.startswith(">"):
-                break
-            continue
-        if re.match(r"^\|[\s\-|]+\|$", stripped):
-            separator_seen = True
-            continue
-        if not separator_seen:
-            continue
-        cells = [c.strip() for c in stripped.split("|")]
-        cells = [c for c in cells if c]
-        if len(cells) >= 3 and cells[1]:
-            rows.append((cells[0], cells[1], cells[2]))
-    return rows
-
-
-def find_telemetry_table(content: str) -> tuple[int, int, list[str]]:
-    """Find the per-task Telemetry table in a bean.md.
-
-    Returns (first_data_line_idx, last_data_line_idx+1, data_row_lines).
-    Returns (-1, -1, []) if not found.
-    """
-    lines = content.splitlines()
-    in_telemetry = False
-    separator_idx = -1
-    data_rows: list[tuple[int, str]] = []
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith("## Telemetry"):
-            in_telemetry = True
-            continue
-        if in_telemetry and stripped.startswith("##"):
-            break
-        if not in_telemetry:
-            continue
-        # Identify the per-task header (has "Duration" — the summary table has "Metric")
-        if stripped.startswith("|") and "Duration" in stripped and "Task" in stripped:
-            continue
-        if separator_idx < 0 and re.match(r"^\|[\s\-|]+\|$", stripped):
-            separator_idx = i
-            continue
-        if separator_idx >= 0 and stripped.startswith("|"):
-            # Stop at the summary table (has "Metric" or bold fields)
-            if "**" in stripped or "Metric" in stripped:
-                break
-            data_rows.append((i, stripped))
-        elif separator_idx >= 0 and not stripped.startswith("|"):
-            if stripped:
-                break
-
-    if separator_idx < 0:
-        return -1, -1, []
-
-    if not data_rows:
-        return separator_idx + 1, separator_idx + 1, []
-
-    return data_rows[0][0], data_rows[-1][0] + 1, [row for _, row in data_rows]
-
-
-def telemetry_row_nums(rows: list[str]) -> set[str]:
+def telemetry_row_nums(rows: list[TableRow]) -> set[str]:
     """Extract task numbers from telemetry table rows."""
-    nums: set[str] = set()
-    for row in rows:
-        cells = [c.strip() for c in row.split("|")]
-        cells = [c for c in cells if c]
-        if cells and cells[0] and cells[0] not in ("", SENTINEL):
-            nums.add(cells[0])
-    return nums
+    return {row.num for row in rows if row.num and row.num != SENTINEL}
 
 
-def is_empty_template_row(row: str) -> bool:
+def is_empty_template_row(row: TableRow) -> bool:
     """Check if a telemetry row is the empty template row."""
-    cells = [c.strip() for c in row.split("|")]
-    cells = [c for c in cells if c]
-    return all(not c or c == SENTINEL for c in cells[1:])
+    return all(not c or c == SENTINEL for c in row.cells[1:])
 
 
-def sync_telemetry_table(content: str) -> tuple[str, list[str]]:
+def sync_telemetry_table(doc: BeanDocument) -> list[str]:
     """Sync the Telemetry per-task table with the Tasks table.
 
     Adds rows for tasks not yet in the Telemetry table.
-    Returns (new_content, actions_taken).
+    Returns the actions taken.
     """
-    tasks = parse_tasks_table(content)
-    if not tasks:
-        return content, []
-
-    lines = content.splitlines()
-    first_data, end_data, existing_rows = find_telemetry_table(content)
-    if first_data < 0:
-        return content, []
+    tasks = [
+        row.cells[:3] for row in doc.task_rows()
+        if len(row.cells) >= 3 and row.cells[1]
+    ]
+    if not tasks or not doc.has_telemetry_table():
+        return []
 
+    existing_rows = doc.telemetry_rows()
     # If only an empty template row exists, treat it as no existing data
     has_only_template = (
         len(existing_rows) == 1 and is_empty_template_row(existing_rows[0])
     )
     existing_nums = set() if has_only_template else telemetry_row_nums(existing_rows)
 
+    # Duration, Tokens In/Out, Cost and any further columns (cache tiers)
+    blanks = f" {SENTINEL} |" * max(4, len(doc.telemetry_columns()) - 3)
     new_rows: list[str] = []
     actions: list[str] = []
     for num, name, owner in tasks:
         if num not in existing_nums:
-            row = (
-                f"| {num} | {name} | {owner}"
-                f" | {SENTINEL} | {SENTINEL} | {SENTINEL} | {SENTINEL} |"
-            )
+            row = f"| {num} | {name} | {owner} |" + blanks
             new_rows.append(row)
             actions.append(f"Telem row {num}")
 
-    if not new_rows:
-        return content, []
-
-    if has_only_template:
-        # Replace the empty template row with real data
-        lines[first_data:end_data] = new_rows
-    else:
-        # Append after existing rows
-        for idx, row in enumerate(new_rows):
-            lines.insert(end_data + idx, row)
-
-    return "\n".join(lines), actions
+    # The empty template row is replaced with real data; otherwise the new
+    # rows are appended after the existing ones.
+    doc.replace_telemetry_rows(new_rows, replace_existing=has_only_template)
+    return actions
 
 
 def update_telemetry_row_duration(
-    content: str, task_num: str, duration: str,
-) -> tuple[str, bool]:
+    doc: BeanDocument, task_num: str, duration: str,
+) -> bool:
     """Update the Duration column of a specific telemetry row.
 
-    Returns (new_content, changed).
+    Returns True if the row changed.
     """
-    lines = content.splitlines()
-    in_telemetry = False
-    separator_seen = False
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith("## Telemetry"):
-            in_telemetry = True
-            continue
-        if in_telemetry and stripped.startswith("##"):
-            break
-        if not in_telemetry:
-            continue
-        if re.match(r"^\|[\s\-|]+\|$", stripped):
-            separator_seen = True
-            continue
-        if not separator_seen or not stripped.startswith("|"):
-            continue
-        if "**" in stripped or "Metric" in stripped:
-            break
-
-        cells = [c.strip() for c in stripped.split("|")]
-        cells = [c for c in cells if c]
-        if cells and cells[0] == task_num and len(cells) >= 4:
-            if cells[3] == SENTINEL:
-                cells[3] = duration
-                lines[i] = "| " + " | ".join(cells) + " |"
-                return "\n".join(lines), True
-
-    return content, False
-
-
-def sum_telemetry_durations(content: str) -> str | None:
-    """Sum per-task durations from the Telemetry table."""
-    _, _, rows = find_telemetry_table(content)
-    total_seconds = 0
+    row = doc.telemetry_row(task_num)
+    if row is None or len(row.cells) < 4 or row.cells[3] != SENTINEL:
+        return False
+    cells = list(row.cells)
+    cells[3] = duration
+    return doc.set_row_cells(row, cells)
+
+
+def sum_telemetry_durations(
+    doc: BeanDocument, state: telemetry_log.TelemetryState | None = None,
+) -> str | None:
+    """Sum per-task durations from the Telemetry table.
+
+    A row whose Duration is still the one the event log recorded counts
+    the log's exact ``seconds``. The total keeps second resolution when any
+    task has it, otherwise the minute format.
+    """
+    total_seconds = 0.0
     found_any = False
+    precise = False
+    logged = state.tasks if state is not None else {}
 
-    for row in rows:
-        cells = [c.strip() for c in row.split("|")]
-        cells = [c for c in cells if c]
-        if len(cells) >= 4:
-            dur = cells[3]
+    for row in doc.telemetry_rows():
+        if len(row.cells) >= 4:
+            dur = row.cells[3]
             if dur and dur != SENTINEL:
-                secs = parse_duration_to_seconds(dur)
+                entry = logged.get(row.num)
+                if entry is not None and entry.seconds is not None and (
+                    entry.duration == dur
+                ):
+                    secs = entry.seconds
+                else:
+                    secs = parse_duration_to_seconds(dur)
                 if secs is not None:
                     total_seconds += secs
                     found_any = True
+                    precise = precise or dur.endswith("s")
 
     if not found_any:
         return None
-    return format_seconds(total_seconds)
+    return format_elapsed(total_seconds) if precise else format_seconds(
+        total_seconds)
 
 
 def extract_task_number(filename: str) -> str | None:
@@ -530,81 +565,131 @@ def extract_task_number(filename: str) -> str | None:
 
 
 def find_git_toplevel() -> Path | None:
-    """Find the git top-level directory (handles worktrees).
+    """Find the main repo's top-level directory (handles worktrees).
+
+    In a worktree, the worktree root differs from the main repo; the shared
+    git common dir lives inside the main repo (see _hook_lib.git_context).
+    """
+    return git_context.main_repo_root()
+
 
-    In a worktree, git rev-parse --show-toplevel returns the worktree root.
-    git rev-parse --git-common-dir returns the path to the shared .git dir,
-    which is inside the main repo.
+def _project_dir_name(path: Path) -> str:
+    """Claude Code's project-dir hash for a path (slashes become dashes)."""
+    name = str(path).replace("/", "-")
+    if not name.startswith("-"):
+        name = "-" + name
+    return name
+
+
+def _candidate_project_dirs(claude_dir: Path, cwd: Path):
+    """Yield candidate ~/.claude/projects/<hash> dirs in priority order.
+
+    Lazy so that callers which find what they need in the cwd dir never
+    pay for resolving the worktree candidates:
+      1. Hash of current working directory (works for normal repos)
+      2. Hash of the git toplevel (worktree's own toplevel)
+      3. Hash of the git common-dir parent (main repo root, for worktrees)
     """
+    seen: set[Path] = set()
+    first = claude_dir / _project_dir_name(cwd)
+    seen.add(first)
+    yield first
+
+    # 2. Toplevel hash (in worktrees, this is the worktree root)
+    toplevel = git_context.toplevel(cwd)
+    if toplevel is not None:
+        candidate = claude_dir / _project_dir_name(toplevel)
+        if toplevel != cwd and candidate not in seen:
+            seen.add(candidate)
+            yield candidate
+
+    # 3. Main repo hash via the common dir (for worktree support)
+    main_repo = find_git_toplevel()
+    if main_repo and main_repo != cwd:
+        candidate = claude_dir / _project_dir_name(main_repo)
+        if candidate not in seen:
+            seen.add(candidate)
+            yield candidate
+
+
+# session_id -> transcript path, filled whenever a payload carries both.
+SESSION_MAP_PATH = Path("/tmp/.foundry-telemetry-sessions.json")
+SESSION_MAP_MAX = 256
+
+
+def _load_session_map() -> dict[str, str]:
     try:
-        result = subprocess.run(
-            ["git", "rev-parse", "--git-common-dir"],
-            capture_output=True, text=True, timeout=5,
-        )
-        if result.returncode == 0:
-            git_common = Path(result.stdout.strip())
-            if not git_common.is_absolute():
-                git_common = (Path.cwd() / git_common).resolve()
-            # .git dir is usually at <repo>/.git
-            return git_common.parent
-    except Exception:
+        data = json.loads(SESSION_MAP_PATH.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def remember_session(session_id: str, transcript: Path) -> None:
+    """Record session_id -> transcript so later payloads without a
+    transcript_path resolve with one dict lookup and one stat."""
+    if _load_session_map().get(session_id) == str(transcript):
+        return
+    try:
+        with file_lock(SESSION_MAP_PATH):
+            mapping = _load_session_map()
+            mapping.pop(session_id, None)
+            mapping[session_id] = str(transcript)
+            # Insertion-ordered: drop the oldest sessions beyond the cap.
+            for stale in list(mapping)[:-SESSION_MAP_MAX]:
+                del mapping[stale]
+            atomic_write_text(
+                SESSION_MAP_PATH, json.dumps(mapping, indent=2) + "\n",
+            )
+    except OSError:
         pass
-    return None
 
 
-def find_session_jsonl() -> Path | None:
+def find_session_jsonl(hook_input: dict | None = None) -> Path | None:
     """Find the JSONL conversation file for the current Claude Code session.
 
-    Looks in ~/.claude/projects/<project-hash>/ for the most recently
-    modified .jsonl file (excluding subagents/).
-
-    Candidate resolution order:
-      1. Hash of current working directory (works for normal repos)
-      2. Hash of git --show-toplevel (worktree's own toplevel)
-      3. Hash of git --git-common-dir parent (main repo root, for worktrees)
+    Resolution order, cheapest and most precise first:
+      1. ``transcript_path`` from the hook payload (what Claude Code sends
+         on stdin) — exact, even when parallel sessions share a project dir.
+      2. ``session_id`` from the payload, via the cached session map.
+      3. ``<session_id>.jsonl`` looked up directly in each candidate
+         project dir (one stat per dir, no directory listing).
+      4. Last resort: the most recently modified .jsonl (excluding
+         subagents/) in the first candidate project dir that has any.
+         See ``_candidate_project_dirs`` for the candidate order.
 
     Returns the path, or None if no JSONL can be found. Never falls back to
     an unrelated project's JSONL — that produced wildly incorrect token data.
     """
+    hook_input = hook_input or {}
+    session_id = str(hook_input.get("session_id") or "")
+    transcript = hook_input.get("transcript_path") or ""
     try:
+        if transcript:
+            path = Path(transcript).expanduser()
+            if path.is_file():
+                if session_id:
+                    remember_session(session_id, path)
+                return path
+
+        if session_id:
+            cached = _load_session_map().get(session_id)
+            if cached and Path(cached).is_file():
+                return Path(cached)
+
         claude_dir = Path.home() / ".claude" / "projects"
         if not claude_dir.exists():
             return None
 
-        # Build candidate project directory paths
-        candidate_dirs: list[Path] = []
-
-        # 1. Current working directory hash
         cwd = Path.cwd()
-        cwd_hash = str(cwd).replace("/", "-")
-        if not cwd_hash.startswith("-"):
-            cwd_hash = "-" + cwd_hash
-        candidate_dirs.append(claude_dir / cwd_hash)
-
-        # 2. git --show-toplevel hash (in worktrees, this is the worktree root)
-        try:
-            result = subprocess.run(
-                ["git", "rev-parse", "--show-toplevel"],
-                capture_output=True, text=True, timeout=5,
-            )
-            if result.returncode == 0:
-                toplevel = Path(result.stdout.strip()).resolve()
-                if toplevel != cwd:
-                    tl_hash = str(toplevel).replace("/", "-")
-                    if not tl_hash.startswith("-"):
-                        tl_hash = "-" + tl_hash
-                    candidate_dirs.append(claude_dir / tl_hash)
-        except Exception:
-            pass
-
-        # 3. Git main repo hash via --git-common-dir (for worktree support)
-        main_repo = find_git_toplevel()
-        if main_repo and main_repo != cwd:
-            repo_hash = str(main_repo).replace("/", "-")
-            if not repo_hash.startswith("-"):
-                repo_hash = "-" + repo_hash
-            if (claude_dir / repo_hash) not in candidate_dirs:
-                candidate_dirs.append(claude_dir / repo_hash)
+        candidate_dirs: list[Path] = []
+        for project_dir in _candidate_project_dirs(claude_dir, cwd):
+            candidate_dirs.append(project_dir)
+            if session_id:
+                direct = project_dir / f"{session_id}.jsonl"
+                if direct.is_file():
+                    remember_session(session_id, direct)
+                    return direct
 
         # Try each candidate directory in priority order
         for project_dir in candidate_dirs:
@@ -616,13 +701,11 @@ def find_session_jsonl() -> Path | None:
             ]
             if jsonl_files:
                 chosen = max(jsonl_files, key=lambda f: f.stat().st_mtime)
-                # Log if we fell back from cwd to a git-resolved path
-                if project_dir != candidate_dirs[0]:
-                    print(
-                        f"telemetry-stamp: JSONL resolved via fallback "
-                        f"(cwd={cwd}, used={project_dir.name})",
-                        file=sys.stderr,
-                    )
+                print(
+                    f"telemetry-stamp: JSONL resolved via mtime fallback "
+                    f"(cwd={cwd}, used={project_dir.name}/{chosen.name})",
+                    file=sys.stderr,
+                )
                 return chosen
 
         # No JSONL found in any candidate directory.
@@ -683,7 +766,73 @@ def validate_token_delta(
     return format_tokens(delta_in), format_tokens(delta_out)
 
 
-def sum_session_tokens(jsonl_path: Path) -> tuple[int, int, int, int]:
+def _cursor_path(jsonl_path: Path) -> Path:
+    """Per-transcript scan cursor, keyed by a hash of the transcript path."""
+    try:
+        key_src = str(jsonl_path.resolve())
+    except OSError:
+        key_src = str(jsonl_path)
+    key = hashlib.sha1(key_src.encode("utf-8")).hexdigest()[:16]
+    return Path(f"/tmp/.foundry-telemetry-cursor-{key}.json")
+
+
+# Bytes immediately before the cursor offset that are fingerprinted so an
+# in-place rewrite (same inode, same-or-larger size) still forces a rescan.
+_CURSOR_FINGERPRINT_BYTES = 64
+
+
+def _tail_fingerprint(f, offset: int) -> str:
+    """sha1 of the bytes just before ``offset`` in an open binary file."""
+    start = max(0, offset - _CURSOR_FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def load_cursor(jsonl_path: Path, st: os.stat_result) -> dict | None:
+    """Load the scan cursor for a transcript if it is still valid.
+
+    A cursor is discarded (forcing a full rescan) when the transcript's
+    inode/device changed (rotation) or the file shrank below the stored
+    offset (truncation). The caller verifies the tail fingerprint.
+    """
+    cursor_path = _cursor_path(jsonl_path)
+    if not cursor_path.exists():
+        return None
+    try:
+        data = json.loads(cursor_path.read_text(encoding="utf-8"))
+        if data.get("ino") != st.st_ino or data.get("dev") != st.st_dev:
+            return None
+        if not 0 <= int(data.get("offset", -1)) <= st.st_size:
+            return None
+        return data
+    except (json.JSONDecodeError, OSError, TypeError, ValueError):
+        return None
+
+
+def save_cursor(
+    jsonl_path: Path, st: os.stat_result, offset: int,
+    totals: list[int], fingerprint: str,
+) -> None:
+    """Persist the byte offset and running four-tier totals for a transcript."""
+    data = {
+        "path": str(jsonl_path),
+        "dev": st.st_dev,
+        "ino": st.st_ino,
+        "offset": offset,
+        "fingerprint": fingerprint,
+        "input": totals[0],
+        "output": totals[1],
+        "cache_creation": totals[2],
+        "cache_read": totals[3],
+    }
+    atomic_write_text(
+        _cursor_path(jsonl_path), json.dumps(data, indent=2) + "\n",
+    )
+
+
+def sum_session_tokens(
+    jsonl_path: Path, end: int | None = None,
+) -> tuple[int, int, int, int]:
     """Sum cumulative tokens from a JSONL conversation file.
 
     Parses all assistant messages and sums token usage across all tiers:
@@ -692,61 +841,358 @@ def sum_session_tokens(jsonl_path: Path) -> tuple[int, int, int, int]:
     - cache_read_input_tokens: tokens read from prompt cache
     - output_tokens: output
 
+    Only assistant lines are parsed, found by a byte-level prefilter over
+    the memory-mapped file (see _hook_lib.transcript).
+
+    Incremental: a per-transcript cursor (see ``_cursor_path``) stores the
+    byte offset of the last complete line scanned and the running totals,
+    so each call parses only the bytes appended since the previous one.
+    Rotation (inode change), truncation (file shrank) or an in-place
+    rewrite (tail fingerprint mismatch) falls back to a full rescan. A
+    trailing line without a newline is counted but not committed to the
+    cursor, since the writer may still be appending to it.
+
+    With ``end``, only the transcript's first ``end`` bytes count: the
+    session position when a deferred job was queued. A cursor already past
+    ``end`` is left alone and the prefix is scanned from the start.
+
     Returns (total_input, total_output, total_cache_creation, total_cache_read).
     Total input includes all three input tiers (input + cache_creation + cache_read).
     """
-    total_in = 0
-    total_out = 0
-    total_cache_creation = 0
-    total_cache_read = 0
+    totals = [0, 0, 0, 0]  # input, output, cache_creation, cache_read
     try:
-        with jsonl_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
+        with jsonl_path.open("rb") as f:
+            st = os.fstat(f.fileno())
+            stop = st.st_size if end is None else min(end, st.st_size)
+            offset = 0
+            cursor = load_cursor(jsonl_path, st)
+            # Never move a cursor back to an earlier end.
+            ahead = cursor is not None and cursor["offset"] > stop
+            if cursor and not ahead and _tail_fingerprint(
+                f, cursor["offset"]
+            ) == cursor.get("fingerprint"):
+                offset = cursor["offset"]
+                totals = [
+                    cursor.get("input", 0), cursor.get("output", 0),
+                    cursor.get("cache_creation", 0), cursor.get("cache_read", 0),
+                ]
+            offset, with_tail = scan_usage(f, offset, stop, totals)
+            committed, totals = totals, with_tail
+            if not ahead:
                 try:
-                    msg = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                if msg.get("type") != "assistant":
-                    continue
-                usage = msg.get("message", {}).get("usage", {})
-                total_in += usage.get("input_tokens", 0)
-                total_cache_creation += usage.get(
-                    "cache_creation_input_tokens", 0)
-                total_cache_read += usage.get(
-                    "cache_read_input_tokens", 0)
-                total_out += usage.get("output_tokens", 0)
+                    save_cursor(
+                        jsonl_path, st, offset, committed,
+                        _tail_fingerprint(f, offset),
+                    )
+                except OSError as e:
+                    print(f"telemetry-stamp: cursor save failed: {e}",
+                          file=sys.stderr)
     except Exception:
         pass
+    total_in, total_out, total_cache_creation, total_cache_read = totals
     # Total input = all three input tiers combined
     combined_in = total_in + total_cache_creation + total_cache_read
     return combined_in, total_out, total_cache_creation, total_cache_read
 
 
+def _reference_scan(jsonl_path: Path) -> tuple[int, list[int], list[int]]:
+    """Every line through ``json.loads`` — what :func:`scan_usage` must
+    reproduce. Returns (committed offset, totals, totals with the tail)."""
+    totals = [0, 0, 0, 0]
+    offset = 0
+    with jsonl_path.open("rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                with_tail = list(totals)
+                add_usage_line(raw, with_tail)
+                return offset, totals, with_tail
+            offset += len(raw)
+            add_usage_line(raw, totals)
+    return offset, totals, list(totals)
+
+
+def verify_transcript(jsonl_path: Path) -> tuple[list[str], float, float]:
+    """Differential check of the fast token scan against the reference.
+
+    Scans the whole file, and again in two halves resumed from the first
+    half's committed offset, as the cursor does. Returns (mismatches,
+    reference seconds, fast seconds).
+    """
+    start = time.perf_counter()
+    expected = _reference_scan(jsonl_path)
+    ref_secs = time.perf_counter() - start
+    problems = []
+    with jsonl_path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start = time.perf_counter()
+        totals = [0, 0, 0, 0]
+        offset, with_tail = scan_usage(f, 0, size, totals)
+        fast_secs = time.perf_counter() - start
+        if (offset, totals, with_tail) != expected:
+            problems.append(f"full scan: {(offset, totals, with_tail)} != "
+                            f"reference {expected}")
+        totals = [0, 0, 0, 0]
+        half, _ = scan_usage(f, 0, size // 2, totals)
+        resumed = scan_usage(f, half, size, totals)
+        if (resumed[0], totals, resumed[1]) != expected:
+            problems.append(f"resumed at {half}: {(resumed[0], totals, resumed[1])}"
+                            f" != reference {expected}")
+    return problems, ref_secs, fast_secs
+
+
+# --- Worker transcripts (native subagents, worktree sessions) -------------
+
+# The first task-file path in a worker's opening prompt names its task:
+# ".../BEAN-012-slug/tasks/02-developer-api.md" -> (b"BEAN-012-slug", b"02").
+_TASK_REF_RE = re.compile(rb"(BEAN-\d+-[\w.-]+)/tasks/(\d+)-[\w.-]*\.md")
+_CWD_RE = re.compile(rb'"cwd"\s*:\s*"((?:[^"\\]|\\.)*)"')
+# Enough to hold the opening prompt (task file + instructions).
+_WORKER_HEAD_BYTES = 64 * 1024
+_WORKER_THREADS = 8
+
+
+def _claude_project_dirs(root: Path) -> list[str]:
+    """Project-dir names Claude Code may use for ``root``: slashes to
+    dashes (as ``_project_dir_name``), or every non-alphanumeric to a dash."""
+    names = [_project_dir_name(root), re.sub(r"[^A-Za-z0-9]", "-", str(root))]
+    return list(dict.fromkeys(names))
+
+
+def find_worker_transcripts(
+    main: Path | None, cwd: Path | None = None,
+) -> list[tuple[Path, str]]:
+    """(transcript, dispatch label) for every worker of this session.
+
+    Workers are the session's native subagents
+    (``<session>/subagents/*.jsonl`` next to the main transcript) and the
+    sessions — and their subagents — recorded for the repository's linked
+    worktrees. A subagent that ran inside a worktree is labelled
+    ``agent-worktree``, any other ``agent-subagent``. The main transcript
+    itself is never included.
+    """
+    found: list[tuple[Path, str]] = []
+    seen: set[Path] = set()
+    if main is not None:
+        seen.add(main.resolve())
+    worktrees = git_context.linked_worktrees(cwd)
+
+    def add(path: Path, label: str) -> None:
+        real = path.resolve()
+        if real not in seen:
+            seen.add(real)
+            found.append((path, label))
+
+    if main is not None:
+        subagents = main.parent / main.stem / "subagents"
+        for name in list_dir_names(subagents, "*.jsonl"):
+            path = subagents / name
+            cwd_bytes = _worker_head(path)[1]
+            in_worktree = cwd_bytes is not None and any(
+                _is_within(cwd_bytes, root) for root in worktrees
+            )
+            add(path, "agent-worktree" if in_worktree else "agent-subagent")
+
+    claude_dir = Path.home() / ".claude" / "projects"
+    for root in worktrees:
+        for dir_name in _claude_project_dirs(root):
+            project_dir = claude_dir / dir_name
+            for name in list_dir_names(project_dir, "*.jsonl"):
+                add(project_dir / name, "agent-worktree")
+            for path in sorted(project_dir.glob("*/subagents/*.jsonl")):
+                add(path, "agent-worktree")
+    return found
+
+
+def _is_within(path_bytes: bytes, root: Path) -> bool:
+    path = path_bytes.decode("utf-8", "replace")
+    root_str = str(root)
+    return path == root_str or path.startswith(root_str.rstrip("/") + "/")
+
+
+def _worker_head(path: Path) -> tuple[tuple[str, str] | None, bytes | None]:
+    """(bean dir name, task number) from the first task-file reference in a
+    transcript's opening bytes, and the first recorded cwd."""
+    try:
+        with path.open("rb") as f:
+            head = f.read(_WORKER_HEAD_BYTES)
+    except OSError:
+        return None, None
+    ref = _TASK_REF_RE.search(head)
+    task = None
+    if ref:
+        task = (ref.group(1).decode("utf-8", "replace"),
+                str(int(ref.group(2))))
+    cwd = _CWD_RE.search(head)
+    return task, cwd.group(1) if cwd else None
+
+
+def worker_usage(
+    bean_dir: Path, task_num: str, main: Path | None, cwd: Path | None = None,
+) -> tuple[list[int], int, str | None]:
+    """Token usage of the worker transcripts attributed to one task.
+
+    A worker transcript belongs to the task whose file its opening prompt
+    names first (/spawn-task puts the task file path there). Each one is
+    summed in full — a worker's whole session is the task's work — with
+    its own incremental cursor, on a small thread pool when there are
+    several. Returns ([in, out, cache_creation, cache_read], transcript
+    count, dispatch label or None), ``in`` covering all three input tiers
+    as ``sum_session_tokens`` does. ``cwd`` locates the repository's
+    worktrees (default: the current directory).
+    """
+    mine = [
+        (path, label) for path, label in find_worker_transcripts(main, cwd)
+        if _worker_head(path)[0] == (bean_dir.name, task_num)
+    ]
+    totals = [0, 0, 0, 0]
+    if not mine:
+        return totals, 0, None
+    paths = [path for path, _ in mine]
+    if len(paths) == 1:
+        results = [sum_session_tokens(paths[0])]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = min(_WORKER_THREADS, len(paths))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(sum_session_tokens, paths))
+    for usage in results:
+        for i, value in enumerate(usage):
+            totals[i] += value
+    labels = {label for _, label in mine}
+    return totals, len(mine), labels.pop() if len(labels) == 1 else "mixed"
+
+
+# --- Turn timing --------------------------------------------------------------
+
+# Task-file fields, and their bean-level rollups in the Telemetry summary.
+TIMING_FIELDS = ("Model Turns", "Model Time", "Tool Time", "Hook Time",
+                 "Slowest Tools")
+TIMING_ROLLUP_FIELDS = ("Model Turns", "Total Model Time", "Total Tool Time",
+                        "Total Hook Time", "Slowest Tools")
+
+
+def task_window(
+    bean_dir: Path, task_num: str, jsonl_path: Path, from_checkpoint: bool,
+) -> tuple[int, float | None]:
+    """(byte offset, epoch start) of a task's turns in ``jsonl_path``.
+
+    The task's own task_started event marks the start; a task that skipped
+    In Progress starts at the session checkpoint when that was its token
+    baseline. The offset only applies to the transcript it was taken on
+    (0 otherwise); with no start at all the whole session is the window,
+    as for tokens.
+    """
+    entry = telemetry_log.replay(bean_dir).tasks.get(task_num)
+    if entry is not None and entry.started_ts and not from_checkpoint:
+        offset = entry.offset if entry.transcript == str(jsonl_path) else 0
+        return offset or 0, entry.started_ts
+    data = _load_checkpoint_data() if from_checkpoint else None
+    if data and data.get("ts"):
+        offset = data.get("offset") if data.get(
+            "transcript") == str(jsonl_path) else 0
+        return int(offset or 0), float(data["ts"])
+    return 0, None
+
+
+def hook_seconds(
+    session_id: str, since: float | None, until: float,
+) -> float | None:
+    """Hook wall time this session spent in [since, until], from the hook
+    metrics ring (_hook_lib.metrics); None when metrics are off or hold no
+    record of the session. Records rotated out of the ring are not
+    counted."""
+    if not session_id or not metrics.enabled():
+        return None
+    ms = [
+        rec["ms"] for rec in metrics.read_records()
+        if rec.get("session") == session_id
+        and (since is None or rec.get("ts", 0) >= since)
+        and rec.get("ts", 0) <= until
+    ]
+    return sum(ms) / 1000 if ms else None
+
+
+def measure_task_timing(
+    jsonl_path: Path, offset: int, since: float | None, session_id: str,
+) -> dict | None:
+    """The task_done ``timing`` record for a transcript window (None if the
+    window holds no model turn)."""
+    until = time.time()
+    with jsonl_path.open("rb") as f:
+        timing = scan_timing(f, offset, os.fstat(f.fileno()).st_size, since)
+    if not timing.turns:
+        return None
+    hook_s = hook_seconds(session_id, since, until)
+    return {
+        "turns": timing.turns,
+        "model_s": round(timing.model_secs, 1),
+        "tool_s": round(timing.tool_secs, 1),
+        "hook_s": None if hook_s is None else round(hook_s, 1),
+        "tools": {name: [round(secs, 1), calls]
+                  for name, secs, calls in timing.slowest_tools(limit=8)},
+    }
+
+
+def timing_cells(timing: dict) -> tuple[str, str, str, str, str]:
+    """Display values for TIMING_FIELDS (or TIMING_ROLLUP_FIELDS)."""
+    tools = sorted((timing.get("tools") or {}).items(),
+                   key=lambda kv: -kv[1][0])[:3]
+    hook_s = timing.get("hook_s")
+    return (
+        str(timing.get("turns", 0)),
+        format_elapsed(timing.get("model_s") or 0),
+        format_elapsed(timing.get("tool_s") or 0),
+        "N/A" if hook_s is None else format_elapsed(hook_s),
+        ", ".join(f"{name} {format_elapsed(secs)} ({calls})"
+                  for name, (secs, calls) in tools) or SENTINEL,
+    )
+
+
+def stamp_task_timing(doc: BeanDocument, timing: dict) -> list[str]:
+    """Add the timing fields to a task file's metadata table and fill the
+    ones still unset. Returns the actions taken."""
+    for field, value in zip(TIMING_FIELDS, timing_cells(timing)):
+        doc.ensure_field(field)
+        if doc.field(field) == SENTINEL:
+            doc.set_field(field, value)
+    return [f"Timing: {timing['turns']} turns, model "
+            f"{format_elapsed(timing['model_s'])}, tools "
+            f"{format_elapsed(timing['tool_s'])}"]
+
+
 def watermark_path(bean_dir: Path) -> Path:
-    """Return the path to the .telemetry.json watermark file."""
+    """Return the path to the legacy .telemetry.json watermark file.
+
+    Watermarks now live in the bean's event log; this file is only read, for
+    tasks started before the log existed.
+    """
     return bean_dir / ".telemetry.json"
 
 
 def save_watermark(
     bean_dir: Path, task_num: str, tokens_in: int, tokens_out: int,
-    cache_creation: int = 0, cache_read: int = 0,
+    cache_creation: int = 0, cache_read: int = 0, at: str | None = None,
+    transcript: Path | None = None, offset: int | None = None,
+    ts: float | None = None,
 ) -> None:
-    """Save a token watermark for a task start."""
-    wm_path = watermark_path(bean_dir)
-    data: dict = {}
-    if wm_path.exists():
-        try:
-            data = json.loads(wm_path.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
-            data = {}
-    data[f"task_{task_num}_start_in"] = tokens_in
-    data[f"task_{task_num}_start_out"] = tokens_out
-    data[f"task_{task_num}_start_cc"] = cache_creation
-    data[f"task_{task_num}_start_cr"] = cache_read
-    wm_path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    """Record a token watermark for a task start (a task_started event).
+
+    With ``transcript``, its size is recorded too — ``offset``, by default
+    its current size: the task's turns are the lines appended after it.
+    A deferred job passes the ``ts`` of the start it measured.
+    """
+    where: dict = {}
+    if transcript is not None:
+        where = {"transcript": str(transcript),
+                 "offset": (transcript.stat().st_size if offset is None
+                            else offset)}
+    if ts is not None:
+        where["ts"] = ts
+    telemetry_log.append_event(
+        bean_dir, "task_started", task=task_num, at=at,
+        tokens=[tokens_in, tokens_out, cache_creation, cache_read], **where,
+    )
 
 
 def load_watermark(
@@ -755,8 +1201,12 @@ def load_watermark(
     """Load a token watermark for a task.
 
     Returns (start_tokens_in, start_tokens_out, cache_creation, cache_read)
-    or None if not found. Old watermarks without cache fields default to 0.
+    or None if not found. Falls back to the legacy .telemetry.json, where
+    old watermarks without cache fields default to 0.
     """
+    entry = telemetry_log.replay(bean_dir).tasks.get(task_num)
+    if entry is not None and entry.watermark is not None:
+        return entry.watermark
     wm_path = watermark_path(bean_dir)
     if not wm_path.exists():
         return None
@@ -778,6 +1228,8 @@ def load_watermark(
 def save_checkpoint(
     tokens_in: int, tokens_out: int,
     cache_creation: int = 0, cache_read: int = 0,
+    transcript: Path | None = None, offset: int | None = None,
+    ts: float | None = None, path: Path | None = None,
 ) -> None:
     """Save a session checkpoint after a task completes.
 
@@ -788,36 +1240,54 @@ def save_checkpoint(
 
     The checkpoint is stored in a session-level file (not per-bean) so it
     persists across bean boundaries within a single /long-run session.
+    It also records when it was taken and, with ``transcript``, that
+    transcript's size: where the next task's turns start. A deferred job
+    passes the ``offset``, ``ts`` and checkpoint ``path`` of the moment it
+    measured.
     """
-    checkpoint_path = _checkpoint_path()
+    checkpoint_path = path or _checkpoint_path()
     data = {
         "tokens_in": tokens_in,
         "tokens_out": tokens_out,
         "cache_creation": cache_creation,
         "cache_read": cache_read,
+        "ts": round(time.time() if ts is None else ts, 3),
     }
-    checkpoint_path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    if transcript is not None:
+        data["transcript"] = str(transcript)
+        data["offset"] = (transcript.stat().st_size if offset is None
+                          else offset)
+    atomic_write_text(checkpoint_path, json.dumps(data, indent=2) + "\n")
 
 
-def load_checkpoint() -> tuple[int, int, int, int] | None:
-    """Load the last session checkpoint.
+def load_checkpoint(
+    path: Path | None = None,
+) -> tuple[int, int, int, int] | None:
+    """Load the last session checkpoint (from ``path`` if given).
 
     Returns (tokens_in, tokens_out, cache_creation, cache_read)
     or None if no checkpoint exists.
     """
-    checkpoint_path = _checkpoint_path()
+    data = _load_checkpoint_data(path)
+    if data is None:
+        return None
+    return (
+        data.get("tokens_in", 0),
+        data.get("tokens_out", 0),
+        data.get("cache_creation", 0),
+        data.get("cache_read", 0),
+    )
+
+
+def _load_checkpoint_data(path: Path | None = None) -> dict | None:
+    checkpoint_path = path or _checkpoint_path()
     if not checkpoint_path.exists():
         return None
     try:
         data = json.loads(checkpoint_path.read_text(encoding="utf-8"))
-        return (
-            data.get("tokens_in", 0),
-            data.get("tokens_out", 0),
-            data.get("cache_creation", 0),
-            data.get("cache_read", 0),
-        )
     except (json.JSONDecodeError, OSError):
         return None
+    return data if isinstance(data, dict) else None
 
 
 def format_tokens(count: int) -> str:
@@ -826,85 +1296,59 @@ def format_tokens(count: int) -> str:
 
 
 def update_telemetry_row_tokens(
-    content: str, task_num: str, tokens_in: str, tokens_out: str,
+    doc: BeanDocument, task_num: str, tokens_in: str, tokens_out: str,
     cache_creation: int = 0, cache_read: int = 0,
-) -> tuple[str, bool]:
+) -> bool:
     """Update Tokens In, Tokens Out, and Cost columns of a telemetry row.
 
-    Returns (new_content, changed).
+    Returns True if the row changed.
     """
-    lines = content.splitlines()
-    in_telemetry = False
-    separator_seen = False
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith("## Telemetry"):
-            in_telemetry = True
-            continue
-        if in_telemetry and stripped.startswith("##"):
-            break
-        if not in_telemetry:
-            continue
-        if re.match(r"^\|[\s\-|]+\|$", stripped):
-            separator_seen = True
-            continue
-        if not separator_seen or not stripped.startswith("|"):
-            continue
-        if "**" in stripped or "Metric" in stripped:
-            break
-
-        cells = [c.strip() for c in stripped.split("|")]
-        cells = [c for c in cells if c]
-        if cells and cells[0] == task_num and len(cells) >= 6:
-            changed = False
-            if cells[4] == SENTINEL:
-                cells[4] = tokens_in
-                changed = True
-            if cells[5] == SENTINEL:
-                cells[5] = tokens_out
-                changed = True
-            # Compute and write Cost column (index 6) if tokens were written
-            if changed:
-                if tokens_in == "N/A" or tokens_out == "N/A":
-                    cost_str = "N/A"
-                else:
-                    try:
-                        tin = int(tokens_in.replace(",", ""))
-                        tout = int(tokens_out.replace(",", ""))
-                        cost = compute_cost(
-                            tin, tout, cache_creation, cache_read
-                        )
-                        cost_str = format_cost(cost)
-                    except (ValueError, TypeError):
-                        cost_str = SENTINEL
-                # Ensure row has 7 columns (add Cost if missing)
-                while len(cells) < 7:
-                    cells.append(SENTINEL)
-                if cells[6] == SENTINEL:
-                    cells[6] = cost_str
-                lines[i] = "| " + " | ".join(cells) + " |"
-                return "\n".join(lines), True
-
-    return content, False
-
-
-def sum_telemetry_tokens(content: str) -> tuple[str | None, str | None]:
+    row = doc.telemetry_row(task_num)
+    if row is None or len(row.cells) < 6:
+        return False
+    cells = list(row.cells)
+    changed = False
+    if cells[4] == SENTINEL:
+        cells[4] = tokens_in
+        changed = True
+    if cells[5] == SENTINEL:
+        cells[5] = tokens_out
+        changed = True
+    if not changed:
+        return False
+    # Compute and write Cost column (index 6) since tokens were written
+    if tokens_in == "N/A" or tokens_out == "N/A":
+        cost_str = "N/A"
+    else:
+        try:
+            tin = int(tokens_in.replace(",", ""))
+            tout = int(tokens_out.replace(",", ""))
+            cost = compute_cost(tin, tout, cache_creation, cache_read)
+            cost_str = format_cost(cost)
+        except (ValueError, TypeError):
+            cost_str = SENTINEL
+    # Ensure row has 7 columns (add Cost if missing)
+    while len(cells) < 7:
+        cells.append(SENTINEL)
+    if cells[6] == SENTINEL:
+        cells[6] = cost_str
+    doc.set_row_cells(row, cells)
+    return True
+
+
+def sum_telemetry_tokens(doc: BeanDocument) -> tuple[str | None, str | None]:
     """Sum per-task token values from the Telemetry table.
 
     Returns (total_in_str, total_out_str) or (None, None) if no data.
     """
-    _, _, rows = find_telemetry_table(content)
     total_in = 0
     total_out = 0
     found_any = False
 
-    for row in rows:
-        cells = [c.strip() for c in row.split("|")]
-        cells = [c for c in cells if c]
-        if len(cells) >= 6:
-            tok_in = cells[4].replace(",", "")
-            tok_out = cells[5].replace(",", "")
+    for row in doc.telemetry_rows():
+        if len(row.cells) >= 6:
+            tok_in = row.cells[4].replace(",", "")
+            tok_out = row.cells[5].replace(",", "")
             if tok_in and tok_in != SENTINEL:
                 try:
                     total_in += int(tok_in)
@@ -923,23 +1367,148 @@ def sum_telemetry_tokens(content: str) -> tuple[str | None, str | None]:
     return format_tokens(total_in), format_tokens(total_out)
 
 
-def sum_telemetry_costs(content: str) -> str | None:
-    """Sum per-task cost values from the Telemetry table.
+# Per-task prompt-cache columns, appended after Cost the first time a task
+# with a logged cache split is rendered, and their bean-level rollups.
+CACHE_COLUMNS = ("Cache Read", "Cache Write", "Cache Hit %")
+CACHE_ROLLUP_FIELDS = ("Total Cache Read", "Total Cache Write", "Cache Hit %")
+
+
+def format_hit_ratio(cache_read: int, tokens_in: int) -> str:
+    """Share of input tokens served from the prompt cache, e.g. '87.5%'.
+
+    ``tokens_in`` is the combined input (uncached + cache write + cache
+    read), as in the Tokens In column.
+    """
+    if tokens_in <= 0:
+        return SENTINEL
+    return f"{100 * cache_read / tokens_in:.1f}%"
+
+
+def update_telemetry_row_cache(
+    doc: BeanDocument, task_num: str, tokens_in: str,
+    cache_creation: int, cache_read: int,
+) -> bool:
+    """Fill the Cache Read, Cache Write and Cache Hit % cells of a telemetry
+    row, adding the columns to the table if it predates them.
+
+    Only sentinel cells are written. Returns True if the row changed.
+    """
+    doc.add_telemetry_columns(list(CACHE_COLUMNS))
+    header = doc.telemetry_columns()
+    row = doc.telemetry_row(task_num)
+    if row is None or not all(c in header for c in CACHE_COLUMNS):
+        return False
+    try:
+        tin = int(tokens_in.replace(",", ""))
+        values = (format_tokens(cache_read), format_tokens(cache_creation),
+                  format_hit_ratio(cache_read, tin))
+    except ValueError:
+        values = ("N/A", "N/A", "N/A")
+    cells = list(row.cells)
+    while len(cells) < len(header):
+        cells.append(SENTINEL)
+    changed = False
+    for name, value in zip(CACHE_COLUMNS, values):
+        i = header.index(name)
+        if cells[i] == SENTINEL and value != SENTINEL:
+            cells[i] = value
+            changed = True
+    return changed and doc.set_row_cells(row, cells)
+
+
+def sum_telemetry_cache(doc: BeanDocument) -> tuple[str, str, str] | None:
+    """Bean-level (Total Cache Read, Total Cache Write, Cache Hit %) from
+    the per-task rows with numeric cache cells; None if there are none.
+
+    The hit ratio is weighted by input tokens over those same rows.
+    """
+    header = doc.telemetry_columns()
+    if not all(c in header for c in CACHE_COLUMNS) or "Tokens In" not in header:
+        return None
+    i_read, i_write = header.index("Cache Read"), header.index("Cache Write")
+    i_in = header.index("Tokens In")
+    total_read = total_write = total_in = 0
+    found = False
+    for row in doc.telemetry_rows():
+        if len(row.cells) <= max(i_read, i_write, i_in):
+            continue
+        try:
+            read = int(row.cells[i_read].replace(",", ""))
+            write = int(row.cells[i_write].replace(",", ""))
+            tin = int(row.cells[i_in].replace(",", ""))
+        except ValueError:
+            continue
+        total_read += read
+        total_write += write
+        total_in += tin
+        found = True
+    if not found:
+        return None
+    return (format_tokens(total_read), format_tokens(total_write),
+            format_hit_ratio(total_read, total_in))
+
+
+def stamp_cache_rollups(doc: BeanDocument, recompute: bool = False) -> list[str]:
+    """Write the cache rollups into the Telemetry summary table, adding the
+    rows if missing. Only sentinel values are replaced unless
+    ``recompute``. Returns the actions taken."""
+    values = sum_telemetry_cache(doc)
+    if values is None:
+        return []
+    return _stamp_summary(doc, CACHE_ROLLUP_FIELDS, values, recompute)
+
+
+def stamp_timing_rollups(
+    doc: BeanDocument, state: telemetry_log.TelemetryState,
+    recompute: bool = False,
+) -> list[str]:
+    """Write the bean's model/tool/hook time rollups (summed from the
+    tasks' logged timing) into the Telemetry summary, as
+    :func:`stamp_cache_rollups` does."""
+    totals = state.timing_totals()
+    if totals is None:
+        return []
+    return _stamp_summary(
+        doc, TIMING_ROLLUP_FIELDS, timing_cells(totals), recompute,
+    )
+
+
+def _stamp_summary(
+    doc: BeanDocument, fields: tuple[str, ...], values: tuple[str, ...],
+    recompute: bool,
+) -> list[str]:
+    actions: list[str] = []
+    for field, value in zip(fields, values):
+        doc.ensure_field(field, section="Telemetry")
+        cur = doc.field(field, "Telemetry")
+        if cur is None or cur == value:
+            continue
+        if cur == SENTINEL:
+            doc.set_field(field, value, "Telemetry")
+            actions.append(f"{field}={value}")
+        elif recompute:
+            doc.set_field(field, value, "Telemetry")
+            actions.append(f"{field}: {cur} -> {value}")
+    return actions
+
+
+COST_CELL_RE = re.compile(r"^\$([0-9.]+)$")
+
+
+def sum_telemetry_costs(doc: BeanDocument) -> str | None:
+    """Sum per-task cost values from the Telemetry table.
 
     Returns formatted total cost string, or None if no cost data.
     """
-    _, _, rows = find_telemetry_table(content)
     total_cost = 0.0
     found_any = False
 
-    for row in rows:
-        cells = [c.strip() for c in row.split("|")]
-        cells = [c for c in cells if c]
-        if len(cells) >= 7:
-            cost_str = cells[6]
+    for row in doc.telemetry_rows():
+        if len(row.cells) >= 7:
+            cost_str = row.cells[6]
             if cost_str and cost_str != SENTINEL and cost_str != "< $0.01":
                 # Parse "$X.XX" format
-                m = re.match(r"^\$([0-9.]+)$", cost_str)
+                m = COST_CELL_RE.match(cost_str)
                 if m:
                     total_cost += float(m.group(1))
                     found_any = True
@@ -950,7 +1519,7 @@ def sum_telemetry_costs(content: str) -> str | None:
 
     if not found_any:
         # Fall back: compute from token totals if available
-        tok_in_str, tok_out_str = sum_telemetry_tokens(content)
+        tok_in_str, tok_out_str = sum_telemetry_tokens(doc)
         if tok_in_str and tok_out_str:
             try:
                 tin = int(tok_in_str.replace(",", ""))
@@ -965,75 +1534,44 @@ def sum_telemetry_costs(content: str) -> str | None:
     return format_cost(total_cost)
 
 
-def count_done_tasks(content: str) -> int:
-    """Count rows with 'Done' status in the Tasks table of a bean.md.
+def render_telemetry(
+    doc: BeanDocument, state: telemetry_log.TelemetryState,
+) -> list[str]:
+    """Project the event log onto the bean's per-task Telemetry rows.
 
-    Looks for the table under ## Tasks with columns: # | Task | Owner | Depends On | Status
-    Counts rows where the Status column is 'Done'.
+    Fills Duration, Tokens In/Out, Cost and the cache-tier columns for
+    every task the log has a task_done for, only where the cell is still
+    the sentinel — so it is idempotent and never overwrites a value written
+    by hand. Returns the actions taken.
     """
-    count = 0
-    in_tasks = False
-    header_seen = False
-    for line in content.splitlines():
-        stripped = line.strip()
-        if stripped.startswith("## Tasks"):
-            in_tasks = True
-            continue
-        if in_tasks and stripped.startswith("##"):
-            break
-        if not in_tasks:
-            continue
-        if not stripped.startswith("|"):
-            if header_seen and stripped and not stripped.startswith(">"):
-                break
-            continue
-        # Skip separator rows
-        if re.match(r"^\|[\s\-|]+\|$", stripped):
-            header_seen = True
-            continue
-        # Skip header row (contains "Task" or "#")
-        if not header_seen:
-            header_seen = False
-            continue
-
-        cells = [c.strip() for c in stripped.split("|")]
-        # cells[0] is empty (before first |), last is empty (after last |)
-        cells = [c for c in cells if c]
-        if len(cells) >= 5 and cells[-1].lower() == "done":
-            count += 1
-
-    return count
+    actions: list[str] = []
+    for entry in state.done_tasks():
+        if entry.duration and entry.duration != SENTINEL:
+            if update_telemetry_row_duration(doc, entry.num, entry.duration):
+                actions.append(f"Bean telem row {entry.num}")
+        if entry.tokens_in and entry.tokens_out:
+            if update_telemetry_row_tokens(
+                doc, entry.num, entry.tokens_in, entry.tokens_out,
+                entry.cache_creation, entry.cache_read,
+            ):
+                actions.append(
+                    f"Tokens task {entry.num}: "
+                    f"in={entry.tokens_in} out={entry.tokens_out}"
+                )
+            if update_telemetry_row_cache(
+                doc, entry.num, entry.tokens_in,
+                entry.cache_creation, entry.cache_read,
+            ):
+                actions.append(f"Cache task {entry.num}")
+    return actions
 
 
-def count_total_tasks(content: str) -> int:
+def count_total_tasks(doc: BeanDocument) -> int:
     """Count total task rows in the Tasks table of a bean.md."""
-    count = 0
-    in_tasks = False
-    separator_seen = False
-    for line in content.splitlines():
-        stripped = line.strip()
-        if stripped.startswith("## Tasks"):
-            in_tasks = True
-            continue
-        if in_tasks and stripped.startswith("##"):
-            break
-        if not in_tasks:
-            continue
-        if not stripped.startswith("|"):
-            if separator_seen and stripped and not stripped.startswith(">"):
-                break
-            continue
-        if re.match(r"^\|[\s\-|]+\|$", stripped):
-            separator_seen = True
-            continue
-        if not separator_seen:
-            continue
-        cells = [c.strip() for c in stripped.split("|")]
-        cells = [c for c in cells if c]
-        if len(cells) >= 2:
-            count += 1
+    return sum(1 for row in doc.task_rows() if len(row.cells) >= 2)
 
-    return count
+
+DATE_ONLY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
 
 def needs_stamp(value: str | None) -> bool:
@@ -1045,7 +1583,7 @@ def needs_stamp(value: str | None) -> bool:
     if value is None or value == SENTINEL:
         return True
     # Date-only format like "2026-02-16" — missing HH:MM
-    if re.match(r"^\d{4}-\d{2}-\d{2}$", value.strip()):
+    if DATE_ONLY_RE.match(value.strip()):
         return True
     return False
 
@@ -1080,72 +1618,24 @@ ORCH_FIELDS_DEFAULT_ZERO = (
 )
 
 
-def has_orchestration_telemetry(content: str) -> bool:
-    """Detect whether a bean.md carries the Orchestration Telemetry section."""
-    return "## Orchestration Telemetry" in content
-
-
-def _orchestration_section_bounds(content: str) -> tuple[int, int]:
-    """Return (start_line_idx, end_line_idx) for the Orchestration Telemetry
-    section (exclusive end). Returns (-1, -1) if missing.
-    """
-    lines = content.splitlines()
-    start = -1
-    for i, line in enumerate(lines):
-        if line.strip().startswith("## Orchestration Telemetry"):
-            start = i
-            break
-    if start < 0:
-        return -1, -1
-    end = len(lines)
-    for j in range(start + 1, len(lines)):
-        if lines[j].strip().startswith("## "):
-            end = j
-            break
-    return start, end
-
+ORCH_SECTION = "Orchestration Telemetry"
 
-def parse_orchestration_field(content: str, field: str) -> str | None:
-    """Read a field from the Orchestration Telemetry section's table."""
-    start, end = _orchestration_section_bounds(content)
-    if start < 0:
-        return None
-    section = "\n".join(content.splitlines()[start:end])
-    return parse_metadata_field(section, field)
 
+def has_orchestration_telemetry(doc: BeanDocument) -> bool:
+    """Detect whether a bean.md carries the Orchestration Telemetry section."""
+    return doc.has_section(ORCH_SECTION)
 
-def replace_orchestration_field(
-    content: str, field: str, value: str,
-) -> str:
-    """Replace a field's value in the Orchestration Telemetry section.
 
-    Scoped: only touches rows inside `## Orchestration Telemetry`. Returns
-    content unchanged if the section or the field row is missing.
-    """
-    start, end = _orchestration_section_bounds(content)
-    if start < 0:
-        return content
-    lines = content.splitlines()
-    section = "\n".join(lines[start:end])
-    new_section = replace_metadata_field(section, field, value)
-    if new_section == section:
-        return content
-    new_lines = lines[:start] + new_section.splitlines() + lines[end:]
-    return "\n".join(new_lines)
-
-
-def telemetry_owners_with_data(content: str) -> list[str]:
+def telemetry_owners_with_data(doc: BeanDocument) -> list[str]:
     """Return the deduped, in-order list of owner ids from per-task Telemetry
     rows that have actual data (any non-sentinel column past Owner).
 
     Empty owners are skipped. Used to derive Personas activated.
     """
-    _, _, rows = find_telemetry_table(content)
     seen: list[str] = []
     seen_set: set[str] = set()
-    for row in rows:
-        cells = [c.strip() for c in row.split("|")]
-        cells = [c for c in cells if c]
+    for row in doc.telemetry_rows():
+        cells = row.cells
         if len(cells) < 3:
             continue
         owner = cells[2]
@@ -1205,9 +1695,18 @@ def infer_dispatch_mode_from_worktrees(bean_id: str) -> str | None:
     return None
 
 
-def compute_dispatch_mode(bean_dir: Path, bean_id: str) -> str:
+def compute_dispatch_mode(
+    bean_dir: Path, bean_id: str, use_worktrees: bool = True,
+) -> str:
     """Aggregate per-task markers (or fallback heuristic) into a single
-    dispatch-mode label: in-process / tmux-worker / mixed.
+    dispatch-mode label: in-process / tmux-worker / agent-subagent /
+    agent-worktree / mixed.
+
+    Persona markers win; next come the labels recorded on task_done events
+    whose tokens were attributed from worker transcripts (a task without
+    one counts as in-process). ``use_worktrees=False`` skips the /tmp
+    worktree heuristic, which only means something while the bean is being
+    worked (not in a backfill).
     """
     markers = collect_dispatch_markers(bean_dir)
     if markers:
@@ -1215,7 +1714,13 @@ def compute_dispatch_mode(bean_dir: Path, bean_id: str) -> str:
         if len(unique) > 1:
             return "mixed"
         return next(iter(unique))
-    fallback = infer_dispatch_mode_from_worktrees(bean_id)
+    tasks = telemetry_log.replay(bean_dir).done_tasks()
+    if any(t.dispatch for t in tasks):
+        unique = {t.dispatch or "in-process" for t in tasks}
+        return unique.pop() if len(unique) == 1 else "mixed"
+    fallback = (
+        infer_dispatch_mode_from_worktrees(bean_id) if use_worktrees else None
+    )
     if fallback:
         return fallback
     # No markers, no worktrees → conservative default. Agent-tool path
@@ -1224,34 +1729,34 @@ def compute_dispatch_mode(bean_dir: Path, bean_id: str) -> str:
 
 
 def stamp_orchestration_telemetry(
-    content: str, bean_dir: Path, bean_id: str,
-) -> tuple[str, list[str]]:
+    doc: BeanDocument, bean_dir: Path, bean_id: str,
+    use_worktrees: bool = True, emit=telemetry_log.append_event,
+) -> list[str]:
     """Populate the Orchestration Telemetry block when a bean flips to Done.
 
     Idempotent. Skips silently if the bean has no Orchestration Telemetry
     section. Never overwrites a non-sentinel persona-recorded value.
+    Events go through ``emit`` (``append_event``'s signature). Returns the
+    actions taken.
     """
-    if not has_orchestration_telemetry(content):
-        return content, []
+    if not has_orchestration_telemetry(doc):
+        return []
 
     actions: list[str] = []
 
-    personas_val = parse_orchestration_field(content, "Personas activated")
+    personas_val = doc.field("Personas activated", ORCH_SECTION)
     if personas_val is None or needs_stamp(personas_val.split("(")[0].strip()):
-        owners = telemetry_owners_with_data(content)
+        owners = telemetry_owners_with_data(doc)
         if owners:
             personas = ", ".join(owners)
-            content = replace_orchestration_field(
-                content, "Personas activated", personas,
-            )
+            doc.set_field("Personas activated", personas, ORCH_SECTION)
             actions.append(f"Personas={personas}")
 
-    dispatch_val = parse_orchestration_field(content, "Dispatch mode")
+    dispatch_val = doc.field("Dispatch mode", ORCH_SECTION)
     if dispatch_val is None or needs_stamp(dispatch_val.split("(")[0].strip()):
-        mode = compute_dispatch_mode(bean_dir, bean_id)
-        content = replace_orchestration_field(
-            content, "Dispatch mode", mode,
-        )
+        mode = compute_dispatch_mode(bean_dir, bean_id, use_worktrees)
+        doc.set_field("Dispatch mode", mode, ORCH_SECTION)
+        emit(bean_dir, "dispatch_mode", mode=mode)
         actions.append(f"Dispatch={mode}")
 
     # Default-fill persona-recorded counters with `0` ONLY when the current
@@ -1259,21 +1764,20 @@ def stamp_orchestration_telemetry(
     # before the sentinel check so the template's "— (Tech-QA → ...)" is
     # treated as needing a stamp, but a real "2 (...)" is preserved.
     for field in ORCH_FIELDS_DEFAULT_ZERO:
-        cur = parse_orchestration_field(content, field)
+        cur = doc.field(field, ORCH_SECTION)
         if cur is None:
             continue
-        head_raw = cur.split("(")[0]
-        head = head_raw.strip()
+        head = cur.split("(")[0].strip()
         if needs_stamp(head):
             paren_idx = cur.find("(")
             if paren_idx >= 0:
                 new_val = f"0 {cur[paren_idx:]}"
             else:
                 new_val = "0"
-            content = replace_orchestration_field(content, field, new_val)
+            doc.set_field(field, new_val, ORCH_SECTION)
             actions.append(f"{field}=0")
 
-    return content, actions
+    return actions
 
 
 def extract_bean_id(bean_dir: Path) -> str | None:
@@ -1282,73 +1786,129 @@ def extract_bean_id(bean_dir: Path) -> str | None:
     return m.group(1) if m else None
 
 
-def handle_bean_file(path: Path, now: str) -> list[str]:
+def handle_bean_file(
+    path: Path, now: str, hook_input: dict | None = None,
+) -> list[str]:
     """Process a bean.md file for telemetry stamping.
 
+    The file is parsed once into a ``BeanDocument``; every check and stamp
+    below runs against that model and the file is written at most once,
+    atomically, while holding the file's lock (other workers may be
+    rendering task rows into the same bean). When PreToolUse already
+    stamped the written content (see :func:`preview`), only its events are
+    appended here.
     Returns list of actions taken (empty if no changes).
     """
-    content = path.read_text(encoding="utf-8")
-    original = content
+    settle(path.parent)
+    with file_lock(path):
+        return _handle_bean_file(path, now, hook_input)
+
+
+def _handle_bean_file(
+    path: Path, now: str, hook_input: dict | None,
+) -> list[str]:
+    doc = BeanDocument.read(path)
+    bean_dir = path.parent
+    pending = take_pending(hook_input, path, doc)
+    if pending is None:
+        actions = stamp_bean_doc(doc, bean_dir, now)
+    else:
+        # Stamped in PreToolUse: log what that decided, then re-stamp only
+        # to catch a rollup that did not land (normally a no-op).
+        for record in pending["events"]:
+            telemetry_log.append_event(bean_dir, **record)
+        actions = pending["actions"] + stamp_bean_doc(
+            doc, bean_dir, pending["now"], emit=_discard_event,
+        )
+    doc.write(path)
+    return actions
+
+
+def _discard_event(_bean_dir: Path, event: str, **fields: object) -> None:
+    pass
+
+
+def stamp_bean_doc(
+    doc: BeanDocument, bean_dir: Path, now: str,
+    emit=telemetry_log.append_event,
+) -> list[str]:
+    """Apply every bean.md stamp and rollup to ``doc``; events go through
+    ``emit`` (``append_event``'s signature). Returns the actions taken."""
     actions = []
 
     # Ensure telemetry fields exist in the metadata table
     for field in ("Started", "Completed", "Duration"):
-        content = ensure_metadata_field(content, field)
+        doc.ensure_field(field)
 
-    status = parse_metadata_field(content, "Status")
-    started = parse_metadata_field(content, "Started")
-    completed = parse_metadata_field(content, "Completed")
+    status = (doc.field("Status") or "").lower()
+    started = doc.field("Started")
+    completed = doc.field("Completed")
 
     # Status = "In Progress" + Started needs stamp → stamp Started
-    if status and status.lower() == "in progress" and needs_stamp(started):
-        content = replace_metadata_field(content, "Started", now)
+    if status == "in progress" and needs_stamp(started):
+        doc.set_field("Started", now)
+        emit(bean_dir, "bean_started", at=now)
         actions.append("Started")
 
     # Status = "Done" + Completed needs stamp → stamp Completed + Duration
-    if status and status.lower() == "done" and needs_stamp(completed):
+    if status == "done" and needs_stamp(completed):
         # If Started also needs stamp, stamp it too
-        cur_started = parse_metadata_field(content, "Started")
+        cur_started = doc.field("Started")
         if needs_stamp(cur_started):
-            content = replace_metadata_field(content, "Started", now)
+            doc.set_field("Started", now)
             cur_started = now
             actions.append("Started")
 
-        content = replace_metadata_field(content, "Completed", now)
+        doc.set_field("Completed", now)
         actions.append("Completed")
 
-        cur_duration = parse_metadata_field(content, "Duration")
-        if needs_stamp(cur_duration):
-            # Started→Completed is the work duration. Branch age is only a
+        seconds = None
+        if needs_stamp(doc.field("Duration")):
+            # Started→Completed is the work duration, to the second when the
+            # bean_started event matches Started. Branch age is only a
             # fallback when Started is unparseable — it measures how old the
             # branch is, not how long the work took (SPEC-005).
-            if parse_timestamp(cur_started):
+            logged = telemetry_log.replay(bean_dir)
+            if logged.started_at == cur_started:
+                seconds = precise_seconds(logged.started_ts, cur_started, now)
+            if seconds is not None:
+                duration = format_elapsed(seconds)
+            elif parse_timestamp(cur_started):
                 duration = format_duration(cur_started, now)
             else:
                 duration = git_branch_duration() or format_duration(
                     cur_started, now
                 )
-            content = replace_metadata_field(content, "Duration", duration)
+            doc.set_field("Duration", duration)
             actions.append(f"Duration={duration}")
+        done_fields = {} if seconds is None else {"seconds": round(seconds, 1)}
+        emit(
+            bean_dir, "bean_done", at=now, duration=doc.field("Duration"),
+            **done_fields,
+        )
+
+    # Re-render per-task rows from the event log before any rollup reads
+    # them (restores rows lost to concurrent writes of this file).
+    state = None
+    if telemetry_log.log_path(bean_dir).exists():
+        state = telemetry_log.replay(bean_dir)
+        actions.extend(render_telemetry(doc, state))
 
     # Status = "Done" → fill Total Tasks in Telemetry summary
-    if status and status.lower() == "done":
-        total_tasks_val = parse_metadata_field(content, "Total Tasks")
-        if total_tasks_val == SENTINEL:
-            total = count_total_tasks(content)
-            content = replace_metadata_field(
-                content, "Total Tasks", str(total)
-            )
+    if status == "done":
+        if doc.field("Total Tasks") == SENTINEL:
+            total = count_total_tasks(doc)
+            doc.set_field("Total Tasks", str(total))
             actions.append(f"Total Tasks={total}")
 
-        total_dur_val = parse_metadata_field(content, "Total Duration")
-        if total_dur_val == SENTINEL:
+        if doc.field("Total Duration") == SENTINEL:
             # Prefer sum of per-task durations, then Started→Completed;
             # branch age only as a last resort (SPEC-005: it measures
             # branch age, not work duration).
-            total_dur = sum_telemetry_durations(content)
+            total_dur = sum_telemetry_durations(doc, state)
             if not total_dur:
-                final_started = parse_metadata_field(content, "Started")
-                final_completed = parse_metadata_field(content, "Completed")
+                final_started = doc.field("Started")
+                final_completed = doc.field("Completed")
                 if parse_timestamp(final_started) and parse_timestamp(
                     final_completed
                 ):
@@ -1356,241 +1916,970 @@ def handle_bean_file(path: Path, now: str) -> list[str]:
             if not total_dur:
                 total_dur = git_branch_duration()
             if total_dur:
-                content = replace_metadata_field(
-                    content, "Total Duration", total_dur
-                )
+                doc.set_field("Total Duration", total_dur)
                 actions.append(f"Total Duration={total_dur}")
 
         # Fill Total Tokens In / Total Tokens Out
-        total_tok_in_val = parse_metadata_field(content, "Total Tokens In")
-        total_tok_out_val = parse_metadata_field(content, "Total Tokens Out")
+        total_tok_in_val = doc.field("Total Tokens In")
+        total_tok_out_val = doc.field("Total Tokens Out")
         if total_tok_in_val == SENTINEL or total_tok_out_val == SENTINEL:
-            tok_in_sum, tok_out_sum = sum_telemetry_tokens(content)
+            tok_in_sum, tok_out_sum = sum_telemetry_tokens(doc)
             if tok_in_sum and total_tok_in_val == SENTINEL:
-                content = replace_metadata_field(
-                    content, "Total Tokens In", tok_in_sum,
-                )
+                doc.set_field("Total Tokens In", tok_in_sum)
                 actions.append(f"Total Tokens In={tok_in_sum}")
             if tok_out_sum and total_tok_out_val == SENTINEL:
-                content = replace_metadata_field(
-                    content, "Total Tokens Out", tok_out_sum,
-                )
+                doc.set_field("Total Tokens Out", tok_out_sum)
                 actions.append(f"Total Tokens Out={tok_out_sum}")
 
         # Fill Total Cost
-        total_cost_val = parse_metadata_field(content, "Total Cost")
-        if total_cost_val == SENTINEL:
-            total_cost = sum_telemetry_costs(content)
+        if doc.field("Total Cost") == SENTINEL:
+            total_cost = sum_telemetry_costs(doc)
             if total_cost:
-                content = replace_metadata_field(
-                    content, "Total Cost", total_cost,
-                )
+                doc.set_field("Total Cost", total_cost)
                 actions.append(f"Total Cost={total_cost}")
 
+        actions.extend(stamp_cache_rollups(doc))
+        if state is not None:
+            actions.extend(stamp_timing_rollups(doc, state))
+
     # Sync telemetry table with tasks table (add missing rows)
-    content, sync_actions = sync_telemetry_table(content)
-    actions.extend(sync_actions)
+    actions.extend(sync_telemetry_table(doc))
 
     # BEAN-278: Orchestration Telemetry — only stamp on Done, only when the
     # block exists (no backfill for older beans).
-    if status and status.lower() == "done":
-        bean_dir = path.parent
+    if status == "done":
         bean_id = extract_bean_id(bean_dir)
         if bean_id:
-            content, orch_actions = stamp_orchestration_telemetry(
-                content, bean_dir, bean_id,
-            )
-            actions.extend(orch_actions)
-
-    if content != original:
-        path.write_text(content, encoding="utf-8")
-
+            actions.extend(stamp_orchestration_telemetry(
+                doc, bean_dir, bean_id, emit=emit,
+            ))
     return actions
 
 
-def handle_task_file(path: Path, now: str) -> list[str]:
+def handle_task_file(
+    path: Path, now: str, hook_input: dict | None = None,
+    defer: bool = False,
+) -> list[str]:
     """Process a task .md file for telemetry stamping.
 
+    ``hook_input`` is the raw hook payload; its transcript_path/session_id
+    pick the session JSONL (see ``find_session_jsonl``). The task file and,
+    when a task completes, its bean.md are each updated under their lock.
+    With ``defer``, the work beyond the task file is queued for the
+    background drainer instead (see :func:`run_job`).
     Returns list of actions taken (empty if no changes).
     """
-    content = path.read_text(encoding="utf-8")
-    original = content
-    actions = []
+    with file_lock(path):
+        return _handle_task_file(path, now, hook_input, defer)
+
+
+class TaskStamp:
+    """What stamping one task file did: the transitions the cross-file side
+    effects (watermark, token delta, event log, bean.md row) hang on.
+
+    Built by :func:`stamp_task_doc`, either in PostToolUse on the written
+    file or in PreToolUse on the content about to be written — then it is
+    handed to PostToolUse through a pending marker (``to_json``).
+    """
+
+    __slots__ = ("now", "started", "completed", "seconds", "timing",
+                 "fields", "actions")
+
+    def __init__(self, now: str) -> None:
+        self.now = now
+        self.started = False      # In Progress: Started stamped
+        self.completed = False    # Done: Completed stamped
+        self.seconds: float | None = None
+        self.timing: dict | None = None
+        self.fields: dict[str, str] = {}  # stamped cell values
+        self.actions: list[str] = []
+
+    def to_json(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_json(cls, data: dict) -> TaskStamp:
+        stamp = cls(str(data["now"]))
+        for name in cls.__slots__[1:]:
+            if name in data:
+                setattr(stamp, name, data[name])
+        return stamp
+
+
+def stamp_task_doc(
+    doc: BeanDocument, bean_dir: Path, task_num: str | None, now: str,
+    hook_input: dict | None,
+) -> TaskStamp:
+    """Apply a task file's own stamps to ``doc``: Started on In Progress;
+    Completed, Duration and turn timing on Done. Reads the event log and
+    the transcript (after running the bean's queued jobs) but writes
+    nothing else."""
+    stamp = TaskStamp(now)
+    actions = stamp.actions
 
     # Ensure telemetry fields exist in the metadata table
     for field in ("Started", "Completed", "Duration"):
-        content = ensure_metadata_field(content, field)
-
-    status = parse_metadata_field(content, "Status")
-    started = parse_metadata_field(content, "Started")
-    completed = parse_metadata_field(content, "Completed")
+        doc.ensure_field(field)
 
-    bean_dir = path.parent.parent  # ai/beans/BEAN-NNN-slug/
-    task_num = extract_task_number(path.name)
+    status = (doc.field("Status") or "").lower()
+    started = doc.field("Started")
+    completed = doc.field("Completed")
 
     # Status = "In Progress" + Started needs stamp → stamp Started
-    if status and status.lower() == "in progress" and needs_stamp(started):
-        content = replace_metadata_field(content, "Started", now)
+    if status == "in progress" and needs_stamp(started):
+        doc.set_field("Started", now)
         actions.append("Started")
-
-        # Record token watermark at task start
-        if task_num:
-            try:
-                jsonl_path = find_session_jsonl()
-                if jsonl_path:
-                    tok_in, tok_out, cc, cr = sum_session_tokens(jsonl_path)
-                    save_watermark(bean_dir, task_num, tok_in, tok_out,
-                                   cc, cr)
-                    actions.append(f"Watermark task {task_num}")
-                else:
-                    print(
-                        f"telemetry-stamp: no session JSONL found for watermark"
-                        f" (cwd={Path.cwd()})",
-                        file=sys.stderr,
-                    )
-            except Exception as e:
-                print(
-                    f"telemetry-stamp: watermark save failed: {e}",
-                    file=sys.stderr,
-                )
+        stamp.started = True
+        stamp.fields["Started"] = now
 
     # Status = "Done" + Completed needs stamp → stamp Completed + Duration
-    if status and status.lower() == "done" and needs_stamp(completed):
-        cur_started = parse_metadata_field(content, "Started")
+    if status == "done" and needs_stamp(completed):
+        cur_started = doc.field("Started")
         if needs_stamp(cur_started):
-            content = replace_metadata_field(content, "Started", now)
+            doc.set_field("Started", now)
             cur_started = now
             actions.append("Started")
 
-        content = replace_metadata_field(content, "Completed", now)
+        doc.set_field("Completed", now)
         actions.append("Completed")
-
-        cur_duration = parse_metadata_field(content, "Duration")
-        if needs_stamp(cur_duration):
-            duration = format_duration(cur_started, now)
-            content = replace_metadata_field(content, "Duration", duration)
+        stamp.completed = True
+        stamp.fields["Completed"] = now
+
+        # The task's start (and the previous task's checkpoint) may still
+        # be queued.
+        settle(bean_dir)
+        if needs_stamp(doc.field("Duration")):
+            entry = telemetry_log.replay(bean_dir).tasks.get(task_num or "")
+            if entry is not None and entry.started_at == cur_started:
+                stamp.seconds = precise_seconds(
+                    entry.started_ts, cur_started, now)
+            duration = (format_duration(cur_started, now)
+                        if stamp.seconds is None
+                        else format_elapsed(stamp.seconds))
+            doc.set_field("Duration", duration)
             actions.append(f"Duration={duration}")
 
-        # Propagate per-task duration and tokens to bean.md telemetry table
         if task_num:
-            final_dur = parse_metadata_field(content, "Duration")
-            bean_path = bean_dir / "bean.md"
-
-            # Compute token delta from watermark or checkpoint
-            tok_in_str = None
-            tok_out_str = None
-            delta_cc = 0
-            delta_cr = 0
-            try:
-                jsonl_path = find_session_jsonl()
-                if jsonl_path:
-                    wm = load_watermark(bean_dir, task_num)
-                    cur_in, cur_out, cur_cc, cur_cr = sum_session_tokens(
-                        jsonl_path)
-
-                    # Determine baseline: task watermark > session checkpoint
-                    # > no baseline (first task)
-                    baseline = wm
-                    if not baseline:
-                        # No task-specific watermark (Pending → Done skip).
-                        # Use the session checkpoint from the previous task.
-                        checkpoint = load_checkpoint()
-                        if checkpoint:
-                            baseline = checkpoint
-                            actions.append(
-                                f"Used checkpoint for task {task_num}"
-                            )
-
-                    if baseline:
-                        start_in, start_out, start_cc, start_cr = baseline
-                        delta_in = max(0, cur_in - start_in)
-                        delta_out = max(0, cur_out - start_out)
-                        delta_cc = max(0, cur_cc - start_cc)
-                        delta_cr = max(0, cur_cr - start_cr)
-                    else:
-                        # No watermark and no checkpoint — first task in
-                        # session, use full session tokens
-                        delta_in = cur_in
-                        delta_out = cur_out
-                        delta_cc = cur_cc
-                        delta_cr = cur_cr
-                    tok_in_str, tok_out_str = validate_token_delta(
-                        delta_in, delta_out, task_num,
-                    )
+            stamp.timing = _task_timing(bean_dir, task_num, hook_input)
+            if stamp.timing is not None:
+                actions.extend(stamp_task_timing(doc, stamp.timing))
+    return stamp
 
-                    # Save session checkpoint for the next task's baseline
-                    save_checkpoint(cur_in, cur_out, cur_cc, cur_cr)
-                    actions.append("Checkpoint saved")
-                else:
-                    # No JSONL found — write N/A markers instead of leaving
-                    # sentinel dashes, so it's clear capture was attempted
-                    tok_in_str = "N/A"
-                    tok_out_str = "N/A"
-                    print(
-                        f"telemetry-stamp: no session JSONL found for token"
-                        f" delta (cwd={Path.cwd()})",
-                        file=sys.stderr,
-                    )
-                    actions.append("No JSONL — wrote N/A")
-            except Exception as e:
-                tok_in_str = "N/A"
-                tok_out_str = "N/A"
-                print(
-                    f"telemetry-stamp: token delta failed: {e}",
-                    file=sys.stderr,
-                )
-                actions.append("Token delta error — wrote N/A")
 
-            if bean_path.exists():
-                try:
-                    bean_content = bean_path.read_text(encoding="utf-8")
-                    changed_any = False
-
-                    if final_dur and final_dur != SENTINEL:
-                        bean_content, changed = update_telemetry_row_duration(
-                            bean_content, task_num, final_dur,
-                        )
-                        if changed:
-                            changed_any = True
-                            actions.append(f"Bean telem row {task_num}")
-
-                    if tok_in_str and tok_out_str:
-                        bean_content, changed = update_telemetry_row_tokens(
-                            bean_content, task_num, tok_in_str, tok_out_str,
-                            delta_cc, delta_cr,
-                        )
-                        if changed:
-                            changed_any = True
-                            actions.append(
-                                f"Tokens task {task_num}: "
-                                f"in={tok_in_str} out={tok_out_str}"
-                            )
-
-                    if changed_any:
-                        bean_path.write_text(bean_content, encoding="utf-8")
-                except Exception as e:
-                    print(
-                        f"telemetry-stamp: bean telemetry update failed: {e}",
-                        file=sys.stderr,
+def _task_timing(
+    bean_dir: Path, task_num: str, hook_input: dict | None,
+) -> dict | None:
+    """Turn timing over the task's transcript window, whose start follows
+    the same watermark > checkpoint choice as the token delta."""
+    try:
+        jsonl_path = find_session_jsonl(hook_input)
+        if not jsonl_path:
+            return None
+        from_checkpoint = (load_watermark(bean_dir, task_num) is None
+                           and load_checkpoint() is not None)
+        offset, since = task_window(
+            bean_dir, task_num, jsonl_path, from_checkpoint,
+        )
+        return measure_task_timing(
+            jsonl_path, offset, since,
+            str((hook_input or {}).get("session_id") or ""),
+        )
+    except (OSError, ValueError) as e:
+        print(f"telemetry-stamp: turn timing failed: {e}", file=sys.stderr)
+        return None
+
+
+def _handle_task_file(
+    path: Path, now: str, hook_input: dict | None, defer: bool,
+) -> list[str]:
+    doc = BeanDocument.read(path)
+    bean_dir = path.parent.parent  # ai/beans/BEAN-NNN-slug/
+    task_num = extract_task_number(path.name)
+
+    pending = take_pending(hook_input, path, doc)
+    if pending is not None:
+        # Stamped in PreToolUse: the written file already carries them.
+        stamp = TaskStamp.from_json(pending["stamp"])
+        now = stamp.now
+    else:
+        stamp = stamp_task_doc(doc, bean_dir, task_num, now, hook_input)
+    actions = stamp.actions
+
+    # Watermark at task start; token delta, event and bean.md row at Done.
+    jobs = []
+    if task_num and (stamp.started or stamp.completed):
+        jsonl_path = find_session_jsonl(hook_input)
+        where = {
+            "bean": str(bean_dir), "task": task_num, "at": now,
+            "ts": round(time.time(), 3), "cwd": str(Path.cwd()),
+            "transcript": str(jsonl_path) if jsonl_path else None,
+            "end": _file_size(jsonl_path),
+        }
+        if stamp.started:
+            jobs.append({"kind": "task_started", **where})
+        if stamp.completed:
+            final_dur = doc.field("Duration")
+            jobs.append({
+                "kind": "task_done", **where,
+                "checkpoint": str(_checkpoint_path()),
+                "duration": final_dur if final_dur != SENTINEL else None,
+                "seconds": (None if stamp.seconds is None
+                            else round(stamp.seconds, 1)),
+                "timing": stamp.timing,
+            })
+    for job in jobs:
+        job["key"] = f"{job['kind']}:{job['bean']}:{job['task']}"
+
+    if jobs and defer:
+        try:
+            telemetry_queue.queue_dir()
+        except OSError as e:
+            print(f"telemetry-stamp: {e}; running the jobs inline",
+                  file=sys.stderr)
+            defer = False
+    if jobs and defer:
+        for job in jobs:
+            telemetry_queue.enqueue(job)
+            actions.append(f"Queued {job['kind']} task {task_num}")
+        spawn_drainer()
+    else:
+        for job in jobs:
+            bean = run_job(job, actions)
+            if bean is not None:
+                render_bean_rows(bean, actions)
+
+    doc.write(path)
+    return actions
+
+
+def _file_size(path: Path | None) -> int | None:
+    try:
+        return path.stat().st_size if path is not None else None
+    except OSError:
+        return None
+
+
+# --- Deferred jobs ------------------------------------------------------------
+#
+# The task-file stamp itself is cheap; what follows it is not: summing the
+# session and worker transcripts, appending to the event log, re-rendering
+# the bean's Telemetry rows under its lock. From a hook that work is queued
+# (_hook_lib.telemetry_queue) and done by a detached ``--drain`` process.
+# A job records the session position (transcript size) and clock of the
+# moment it was queued, so its measurements are the same whenever it runs.
+
+SYNC_ENV = "CLAUDE_KIT_TELEMETRY_SYNC"
+# How long a hook waits for a bean's queued jobs before reading its log.
+SETTLE_TIMEOUT = 20.0
+# The same wait before a PreToolUse preview: the tool call is held up while
+# it lasts, and a preview given up on is stamped by PostToolUse instead.
+PREVIEW_SETTLE_TIMEOUT = 2.0
+_DRAIN_LOG_MAX = 256 * 1024
+
+
+def deferred() -> bool:
+    """Whether hooks queue the cross-file work (``CLAUDE_KIT_TELEMETRY_SYNC=1``
+    runs it inline instead)."""
+    return os.environ.get(SYNC_ENV) != "1"
+
+
+def run_job(job: dict, actions: list[str] | None = None) -> str | None:
+    """Do one queued job; returns the bean dir whose rows need rendering."""
+    actions = [] if actions is None else actions
+    if job.get("kind") == "task_started":
+        _run_task_started(job, actions)
+        return None
+    if job.get("kind") == "task_done":
+        return _run_task_done(job, actions)
+    raise ValueError(f"unknown telemetry job {job.get('kind')!r}")
+
+
+def _run_task_started(job: dict, actions: list[str]) -> None:
+    """Record the token watermark of a task start."""
+    bean_dir = Path(job["bean"])
+    task_num = job["task"]
+    try:
+        jsonl_path = Path(job["transcript"]) if job.get("transcript") else None
+        if jsonl_path:
+            tok_in, tok_out, cc, cr = sum_session_tokens(
+                jsonl_path, job.get("end"))
+            save_watermark(bean_dir, task_num, tok_in, tok_out, cc, cr,
+                           at=job["at"], transcript=jsonl_path,
+                           offset=job.get("end"), ts=job.get("ts"))
+            actions.append(f"Watermark task {task_num}")
+        else:
+            telemetry_log.append_event(
+                bean_dir, "task_started", task=task_num, at=job["at"],
+                ts=job.get("ts"),
+            )
+            print(
+                f"telemetry-stamp: no session JSONL found for watermark"
+                f" (cwd={job.get('cwd')})",
+                file=sys.stderr,
+            )
+    except Exception as e:
+        print(
+            f"telemetry-stamp: watermark save failed: {e}",
+            file=sys.stderr,
+        )
+
+
+def _run_task_done(job: dict, actions: list[str]) -> str | None:
+    """Log a finished task's duration and token delta (from its watermark,
+    else the session checkpoint), save the checkpoint for the next task."""
+    bean_dir = Path(job["bean"])
+    task_num = job["task"]
+    checkpoint_path = Path(job["checkpoint"]) if job.get("checkpoint") else None
+
+    # Compute token delta from watermark or checkpoint
+    tok_in_str = None
+    tok_out_str = None
+    delta_cc = 0
+    delta_cr = 0
+    worker_fields: dict = {}
+    try:
+        jsonl_path = Path(job["transcript"]) if job.get("transcript") else None
+        if jsonl_path:
+            wm = load_watermark(bean_dir, task_num)
+            cur_in, cur_out, cur_cc, cur_cr = sum_session_tokens(
+                jsonl_path, job.get("end"))
+
+            # Determine baseline: task watermark > session checkpoint
+            # > no baseline (first task)
+            baseline = wm
+            if not baseline:
+                # No task-specific watermark (Pending → Done skip).
+                # Use the session checkpoint from the previous task.
+                checkpoint = load_checkpoint(checkpoint_path)
+                if checkpoint:
+                    baseline = checkpoint
+                    actions.append(
+                        f"Used checkpoint for task {task_num}"
                     )
 
-    if content != original:
-        path.write_text(content, encoding="utf-8")
+            if baseline:
+                start_in, start_out, start_cc, start_cr = baseline
+                delta_in = max(0, cur_in - start_in)
+                delta_out = max(0, cur_out - start_out)
+                delta_cc = max(0, cur_cc - start_cc)
+                delta_cr = max(0, cur_cr - start_cr)
+            else:
+                # No watermark and no checkpoint — first task in
+                # session, use full session tokens
+                delta_in = cur_in
+                delta_out = cur_out
+                delta_cc = cur_cc
+                delta_cr = cur_cr
+
+            # Work done by this task's subagents / worktree
+            # sessions lives in their own transcripts.
+            worker_tok, workers, dispatch = worker_usage(
+                bean_dir, task_num, jsonl_path,
+                Path(job["cwd"]) if job.get("cwd") else None)
+            if workers:
+                delta_in += worker_tok[0]
+                delta_out += worker_tok[1]
+                delta_cc += worker_tok[2]
+                delta_cr += worker_tok[3]
+                worker_fields = {
+                    "dispatch": dispatch, "workers": workers,
+                    "worker_tokens": worker_tok,
+                }
+                actions.append(
+                    f"{workers} worker transcript(s) ({dispatch})")
+            tok_in_str, tok_out_str = validate_token_delta(
+                delta_in, delta_out, task_num,
+            )
+
+            # Save session checkpoint for the next task's baseline
+            save_checkpoint(cur_in, cur_out, cur_cc, cur_cr,
+                            transcript=jsonl_path, offset=job.get("end"),
+                            ts=job.get("ts"), path=checkpoint_path)
+            actions.append("Checkpoint saved")
+        else:
+            # No JSONL found — write N/A markers instead of leaving
+            # sentinel dashes, so it's clear capture was attempted
+            tok_in_str = "N/A"
+            tok_out_str = "N/A"
+            print(
+                f"telemetry-stamp: no session JSONL found for token"
+                f" delta (cwd={job.get('cwd')})",
+                file=sys.stderr,
+            )
+            actions.append("No JSONL — wrote N/A")
+    except Exception as e:
+        tok_in_str = "N/A"
+        tok_out_str = "N/A"
+        print(
+            f"telemetry-stamp: token delta failed: {e}",
+            file=sys.stderr,
+        )
+        actions.append("Token delta error — wrote N/A")
+
+    # The log is the record; bean.md's row is rendered from it.
+    done = {
+        "task": task_num, "at": job["at"], "duration": job.get("duration"),
+        "tokens_in": tok_in_str, "tokens_out": tok_out_str,
+        "cache_creation": delta_cc, "cache_read": delta_cr,
+        **worker_fields,
+    }
+    if job.get("seconds") is not None:
+        done["seconds"] = job["seconds"]
+    if job.get("timing") is not None:
+        done["timing"] = job["timing"]
+    try:
+        telemetry_log.append_event(bean_dir, "task_done", **done)
+    except OSError as e:
+        print(f"telemetry-stamp: event log append failed: {e}",
+              file=sys.stderr)
+        # Still render this task's row from the unlogged event.
+        state = telemetry_log.TelemetryState()
+        state.apply({"event": "task_done", **done})
+        render_bean_rows(str(bean_dir), actions, state)
+        return None
+    return str(bean_dir)
+
+
+def render_bean_rows(
+    bean: str, actions: list[str] | None = None,
+    state: telemetry_log.TelemetryState | None = None,
+) -> None:
+    """Render the bean's per-task Telemetry rows from its event log (or
+    ``state``) into bean.md, under the file's lock."""
+    actions = [] if actions is None else actions
+    bean_dir = Path(bean)
+    bean_path = bean_dir / "bean.md"
+    if not bean_path.exists():
+        return
+    try:
+        with file_lock(bean_path):
+            bean_doc = BeanDocument.read(bean_path)
+            actions.extend(render_telemetry(
+                bean_doc, state or telemetry_log.replay(bean_dir),
+            ))
+            bean_doc.write(bean_path)
+    except Exception as e:
+        print(
+            f"telemetry-stamp: bean telemetry update failed: {e}",
+            file=sys.stderr,
+        )
+
+
+def settle(bean_dir: Path, timeout: float = SETTLE_TIMEOUT) -> bool:
+    """Run the bean's queued jobs — not other beans' — before its log is
+    read (a no-op unless some are still queued). False if they were not all done within
+    ``timeout`` seconds. Callers must not hold the bean.md lock."""
+    bean = str(bean_dir)
+    if telemetry_queue.pending(bean):
+        return telemetry_queue.flush(run_job, render_bean_rows, timeout,
+                                     bean=bean)
+    return True
+
+
+def spawn_drainer() -> None:
+    """Start a detached ``--drain`` worker (or drain here if that fails).
+    Its stderr goes to ``drain.log`` in the queue directory."""
+    import subprocess
+
+    log = telemetry_queue.queue_dir() / "drain.log"
+    try:
+        mode = "ab" if (_file_size(log) or 0) < _DRAIN_LOG_MAX else "wb"
+        with open(log, mode) as err:
+            subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), "--drain"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=err, start_new_session=True,
+            )
+    except OSError as e:
+        print(f"telemetry-stamp: drainer spawn failed ({e}); running "
+              f"queued jobs inline", file=sys.stderr)
+        telemetry_queue.drain(run_job, render_bean_rows)
 
+
+# --- Backfill / recompute ---------------------------------------------------
+
+# Cells a backfill may rewrite: values derived from recorded measurements.
+# Measurements themselves (timestamps, per-task durations and tokens) are
+# only ever filled in where still unset.
+ROLLUP_FIELDS = ("Total Tasks", "Total Duration", "Total Tokens In",
+                 "Total Tokens Out", "Total Cost")
+
+
+def _set_if_changed(
+    doc: BeanDocument, field: str, value: str | None, actions: list[str],
+) -> None:
+    cur = doc.field(field)
+    if value is None or cur is None or cur == value:
+        return
+    doc.set_field(field, value)
+    actions.append(f"{field}: {cur} -> {value}")
+
+
+def recompute_bean(
+    doc: BeanDocument, bean_dir: Path, pricing: Pricing | None = None,
+) -> list[str]:
+    """Bring a bean.md's derived telemetry up to date, in place.
+
+    Fills missing per-task rows from the event log and the task files,
+    re-prices per-task Cost where the log knows the cache tiers, then
+    recomputes the bean Duration and the summary rollups for Done beans
+    and stamps any unset Orchestration fields. Idempotent: a second run
+    reports nothing. Returns the changes made.
+    """
+    pricing = pricing or load_pricing()
+    actions = sync_telemetry_table(doc)
+
+    state = None
+    if telemetry_log.log_path(bean_dir).exists():
+        state = telemetry_log.replay(bean_dir)
+        actions.extend(render_telemetry(doc, state))
+
+    tasks_dir = bean_dir / "tasks"
+    for name in list_dir_names(tasks_dir, "*.md"):
+        num = extract_task_number(name)
+        if not num:
+            continue
+        try:
+            dur = BeanDocument.read(tasks_dir / name).field("Duration")
+        except OSError:
+            continue
+        if not needs_stamp(dur) and update_telemetry_row_duration(
+            doc, num, dur,
+        ):
+            actions.append(f"Bean telem row {num}")
+
+    # Cost is only re-priced when the cache split is known: pricing the
+    # whole input at the base rate would overstate cached tasks.
+    for entry in state.done_tasks() if state else ():
+        row = doc.telemetry_row(entry.num)
+        if row is None or len(row.cells) < 7:
+            continue
+        try:
+            tin = int(row.cells[4].replace(",", ""))
+            tout = int(row.cells[5].replace(",", ""))
+        except ValueError:
+            continue
+        cost = format_cost(compute_cost(
+            tin, tout, entry.cache_creation, entry.cache_read,
+            pricing=pricing,
+        ))
+        if row.cells[6] != cost:
+            actions.append(f"Cost task {entry.num}: {row.cells[6]} -> {cost}")
+            cells = list(row.cells)
+            cells[6] = cost
+            doc.set_row_cells(row, cells)
+
+    if (doc.field("Status") or "").lower() != "done":
+        return actions
+
+    started, completed = doc.field("Started"), doc.field("Completed")
+    if parse_timestamp(started) and parse_timestamp(completed):
+        if needs_stamp(doc.field("Duration")):
+            _set_if_changed(doc, "Duration",
+                            format_duration(started, completed), actions)
+
+    total_dur = sum_telemetry_durations(doc, state)
+    if not total_dur and parse_timestamp(started) and parse_timestamp(
+        completed
+    ):
+        total_dur = format_duration(started, completed)
+    tok_in, tok_out = sum_telemetry_tokens(doc)
+    rollups = dict(zip(ROLLUP_FIELDS, (
+        str(count_total_tasks(doc)), total_dur, tok_in, tok_out,
+        sum_telemetry_costs(doc),
+    )))
+    for field in ROLLUP_FIELDS:
+        _set_if_changed(doc, field, rollups[field], actions)
+    actions.extend(stamp_cache_rollups(doc, recompute=True))
+    if state is not None:
+        actions.extend(stamp_timing_rollups(doc, state, recompute=True))
+
+    bean_id = extract_bean_id(bean_dir)
+    if bean_id:
+        actions.extend(stamp_orchestration_telemetry(
+            doc, bean_dir, bean_id, use_worktrees=False,
+        ))
     return actions
 
 
-def main() -> None:
-    """Entry point: read hook JSON from stdin, process file, output result."""
+def backfill_bean(bean_dir: Path, check_only: bool = False) -> list[str]:
+    """Recompute one bean directory; write unless ``check_only``.
+
+    Returns the changes (the drift, in check mode). Errors are reported as
+    a single ``error: ...`` entry rather than raised, so one bad bean does
+    not stop a bulk run.
+    """
+    path = bean_dir / "bean.md"
     try:
-        raw = sys.stdin.read()
-        data = json.loads(raw)
+        with file_lock(path):
+            doc = BeanDocument.read(path)
+            actions = recompute_bean(doc, bean_dir)
+            if not check_only:
+                doc.write(path)
+        return actions
+    except Exception as e:
+        return [f"error: {e}"]
+
+
+def _backfill_worker(args: tuple[str, bool]) -> tuple[str, list[str]]:
+    bean_dir, check_only = args
+    return bean_dir, backfill_bean(Path(bean_dir), check_only)
+
+
+def find_bean_dirs(root: Path) -> list[Path]:
+    """Bean directories (``BEAN-NNN-slug`` containing bean.md) under root."""
+    if (root / "bean.md").is_file():
+        return [root]
+    return sorted(
+        d for d in root.iterdir()
+        if d.name.startswith("BEAN-") and (d / "bean.md").is_file()
+    )
+
+
+# Below this many beans a process pool costs more than it saves.
+_POOL_MIN_BEANS = 64
+
 
+def backfill(
+    root: Path, check_only: bool = False, jobs: int | None = None,
+) -> dict[str, list[str]]:
+    """Run :func:`backfill_bean` over every bean under ``root``.
+
+    Uses a process pool of ``jobs`` workers (default: CPU count) for large
+    trees. Returns {bean dir: changes} for the beans that changed (or
+    would change).
+    """
+    dirs = [str(d) for d in find_bean_dirs(root)]
+    work = [(d, check_only) for d in dirs]
+    if jobs == 1 or len(work) < _POOL_MIN_BEANS:
+        results = map(_backfill_worker, work)
+        return {d: a for d, a in results if a}
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = jobs or os.cpu_count() or 1
+    chunk = max(1, len(work) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(_backfill_worker, work, chunksize=chunk)
+        return {d: a for d, a in results if a}
+
+
+def _verify_cli(paths: list[Path]) -> int:
+    if not paths:
+        paths = sorted((Path.home() / ".claude" / "projects").rglob("*.jsonl"))
+    failed = 0
+    ref_total = fast_total = 0.0
+    for path in paths:
+        try:
+            problems, ref_secs, fast_secs = verify_transcript(path)
+        except OSError as e:
+            print(f"{path}: unreadable ({e})")
+            failed += 1
+            continue
+        ref_total += ref_secs
+        fast_total += fast_secs
+        for problem in problems:
+            print(f"{path}: MISMATCH {problem}")
+        failed += bool(problems)
+    speedup = ref_total / fast_total if fast_total else 0.0
+    print(f"telemetry-stamp: {len(paths) - failed} of {len(paths)} transcripts "
+          f"match (reference {ref_total:.2f}s, fast {fast_total:.2f}s, "
+          f"{speedup:.1f}x)")
+    return 1 if failed else 0
+
+
+def _verify_durations_cli() -> int:
+    """Check :data:`ELAPSED_CASES`, and that each text reads back to within
+    half a unit of its seconds."""
+    failed = 0
+    for seconds, want in ELAPSED_CASES:
+        got = format_elapsed(seconds)
+        back = parse_duration_to_seconds(got)
+        unit = 60 if "h" in got else 1 if "m" in got else 0.1
+        if got != want or back is None or abs(back - seconds) > unit / 2 + 1e-9:
+            failed += 1
+            print(f"MISMATCH {seconds!r}: {got!r} (reads back as {back!r}), "
+                  f"expected {want!r}")
+    print(f"telemetry-stamp: {len(ELAPSED_CASES) - failed} of "
+          f"{len(ELAPSED_CASES)} durations formatted as expected")
+    return 1 if failed else 0
+
+
+def _flush_cli(timeout: float) -> int:
+    drained = telemetry_queue.flush(run_job, render_bean_rows, timeout)
+    failed = telemetry_queue.failed()
+    for path in failed:
+        print(f"telemetry-stamp: failed job kept at {path}")
+    if drained:
+        print("telemetry-stamp: telemetry queue drained")
+    return 0 if drained and not failed else 1
+
+
+def cli(argv: list[str]) -> int:
+    """``telemetry-stamp.py --backfill <beans-dir> [--check] [--jobs N]``,
+    ``telemetry-stamp.py --verify-tokens [TRANSCRIPT ...]``,
+    ``telemetry-stamp.py --verify-durations``,
+    ``telemetry-stamp.py --flush [--timeout S]`` or ``--drain``."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="telemetry-stamp.py",
+        description="Recompute bean telemetry rollups in bulk, check the "
+                    "fast transcript token scan against the reference parser, "
+                    "or run the deferred telemetry jobs.",
+    )
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--backfill", metavar="BEANS_DIR", type=Path,
+                      help="bean directory or tree of beans (ai/beans)")
+    mode.add_argument("--verify-tokens", metavar="TRANSCRIPT", type=Path,
+                      nargs="*",
+                      help="transcripts to check (default: every .jsonl "
+                           "under ~/.claude/projects)")
+    mode.add_argument("--verify-durations", action="store_true",
+                      help="check the elapsed-time format at its unit "
+                           "boundaries")
+    mode.add_argument("--flush", action="store_true",
+                      help="wait until every queued telemetry job has run; "
+                           "exit 1 if some did not")
+    mode.add_argument("--drain", action="store_true",
+                      help=argparse.SUPPRESS)  # the detached worker
+    parser.add_argument("--check", action="store_true",
+                        help="report drift without writing; exit 1 if any")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="--flush: seconds to wait (default: 120)")
+    args = parser.parse_args(argv)
+
+    if args.drain:
+        telemetry_queue.drain(run_job, render_bean_rows)
+        return 0
+    if args.flush:
+        return _flush_cli(args.timeout)
+
+    if args.verify_durations:
+        return _verify_durations_cli()
+    if args.verify_tokens is not None:
+        return _verify_cli(args.verify_tokens)
+    if not args.backfill.is_dir():
+        parser.error(f"not a directory: {args.backfill}")
+    changed = backfill(args.backfill, args.check, args.jobs)
+    for bean_dir in sorted(changed):
+        print(f"{Path(bean_dir).name}:")
+        for action in changed[bean_dir]:
+            print(f"  {action}")
+    total = len(find_bean_dirs(args.backfill))
+    verb = "would change" if args.check else "updated"
+    print(f"telemetry-stamp: {len(changed)} of {total} beans {verb}")
+    errors = any(a.startswith("error: ") for acts in changed.values()
+                 for a in acts)
+    if errors:
+        return 2
+    return 1 if args.check and changed else 0
+
+
+# --- PreToolUse: stamp the content before it is written ---------------------
+#
+# Stamping in PostToolUse rewrites the file the model just wrote, which makes
+# it re-read the file before its next edit — a whole extra tool turn per task
+# transition. In PreToolUse the hook instead computes what the file will be
+# after the Edit/Write, stamps that, and returns it as the tool's updated
+# input, so the write lands already stamped. What stamping decided (the
+# transitions, the events to log) is handed to PostToolUse in a pending
+# marker keyed by the tool call; PostToolUse applies only the cross-file
+# side effects. If the stamped content did not land as computed (hook output
+# ignored, file changed meanwhile), PostToolUse stamps as it always has.
+
+def _pending_path(hook_input: dict | None, path: Path) -> Path:
+    key = str((hook_input or {}).get("tool_use_id") or path.resolve())
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return Path(f"/tmp/.foundry-telemetry-pending-{digest}.json")
+
+
+def take_pending(
+    hook_input: dict | None, path: Path, doc: BeanDocument,
+) -> dict | None:
+    """Consume the PreToolUse marker for this tool call, if its stamps are
+    in the written file ``doc`` (every stamped cell, or else the whole
+    text, as computed)."""
+    if hook_input is None:
+        return None
+    marker = _pending_path(hook_input, path)
+    try:
+        pending = json.loads(marker.read_text(encoding="utf-8"))
+        marker.unlink()
+    except (OSError, ValueError):
+        return None
+    if not isinstance(pending, dict) or pending.get("path") != str(path):
+        return None
+    fields = pending.get("fields") or {}
+    if fields:
+        landed = all(doc.field(k) == v for k, v in fields.items())
+    else:
+        landed = pending.get("sha1") == hashlib.sha1(
+            doc.text().encode("utf-8")).hexdigest()
+    return pending if landed else None
+
+
+def _apply_edit(text: str, tool_input: dict) -> str | None:
+    """The file after an Edit, or None when the edit would not apply
+    exactly (the tool then reports the error itself)."""
+    old = tool_input.get("old_string")
+    new = tool_input.get("new_string")
+    if not isinstance(old, str) or not isinstance(new, str) or not old:
+        return None
+    count = text.count(old)
+    if tool_input.get("replace_all"):
+        return text.replace(old, new) if count else None
+    return text.replace(old, new, 1) if count == 1 else None
+
+
+def _edit_span(original: str, final: str) -> tuple[str, str]:
+    """(old_string, new_string) turning ``original`` into ``final``: the
+    whole lines between their common prefix and suffix, or the whole file
+    if that span is not unique in ``original``."""
+    limit = min(len(original), len(final))
+    head = 0
+    while head < limit and original[head] == final[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and original[-1 - tail] == final[-1 - tail]:
+        tail += 1
+    start = original.rfind("\n", 0, head) + 1
+    end = original.find("\n", len(original) - tail)
+    end = len(original) if end < 0 else end + 1
+    old = original[start:end]
+    new = final[start:len(final) - (len(original) - end)]
+    if not old or original.count(old) != 1:
+        return original, final
+    return old, new
+
+
+def preview(data: dict) -> dict | None:
+    """Stamp the content an Edit/Write is about to write; return the tool
+    input that writes it already stamped (None when there is nothing to
+    stamp or the edit cannot be replayed exactly).
+
+    For a bean.md, the bean's queued jobs run first (they append to the
+    event log and re-render bean.md), waiting at most
+    :data:`PREVIEW_SETTLE_TIMEOUT`; if they do not finish, nothing is
+    previewed. Past that it reads the event log and transcript and writes
+    nothing but the pending marker for PostToolUse.
+    """
+    tool_name = data.get("tool_name")
+    tool_input = data.get("tool_input") or {}
+    path = Path(tool_input.get("file_path") or "")
+    if not tool_input.get("file_path"):
+        return None
+    try:
+        rel = str(path.relative_to(Path.cwd()))
+    except ValueError:
+        rel = str(path)
+    is_bean = bool(BEAN_RE.search(rel))
+    if not is_bean and not TASK_RE.search(rel):
+        return None
+    # Queued jobs may still render into the file; PostToolUse stamps it
+    # if they take too long to wait for here.
+    if is_bean and not settle(path.parent, PREVIEW_SETTLE_TIMEOUT):
+        return None
+
+    if tool_name == "Write":
+        original = None
+        text = tool_input.get("content")
+        if not isinstance(text, str):
+            return None
+    elif tool_name == "Edit":
+        original = path.read_text(encoding="utf-8")
+        text = _apply_edit(original, tool_input)
+        if text is None:
+            return None
+    else:
+        return None
+
+    now = now_stamp()
+    doc = BeanDocument(text)
+    pending: dict = {"path": str(path)}
+    if is_bean:
+        events: list[dict] = []
+
+        def collect(_bean_dir: Path, event: str, **fields: object) -> None:
+            events.append({"event": event, **fields})
+
+        actions = stamp_bean_doc(doc, path.parent, now, emit=collect)
+        # Rows the first pass added are rendered by a second one, so that
+        # PostToolUse finds nothing left to stamp.
+        actions += stamp_bean_doc(doc, path.parent, now, emit=collect)
+        pending.update(now=now, actions=actions, events=events, fields={
+            f: now for f in ("Started", "Completed") if f in actions
+        })
+    else:
+        stamp = stamp_task_doc(
+            doc, path.parent.parent, extract_task_number(path.name), now,
+            data,
+        )
+        pending.update(stamp=stamp.to_json(), fields=stamp.fields)
+    if not doc.dirty:
+        return None
+
+    final = doc.text()
+    pending["sha1"] = hashlib.sha1(final.encode("utf-8")).hexdigest()
+    atomic_write_text(_pending_path(data, path), json.dumps(pending) + "\n")
+    if original is None:
+        return {**tool_input, "content": final}
+    old, new = _edit_span(original, final)
+    return {**tool_input, "old_string": old, "new_string": new,
+            "replace_all": False}
+
+
+# Permission modes in which an Edit/Write runs without a prompt: the stamped
+# input is allowed, as the original would have been. In any other mode no
+# decision is given, so the user's permission rules apply to the stamped
+# input as they would to the original (prompting only if they would have).
+_AUTO_EDIT_MODES = frozenset(("acceptEdits", "bypassPermissions"))
+
+
+def check_pre(data: dict) -> int:
+    """PreToolUse: emit the stamped tool input, if any. Never blocks."""
+    try:
+        updated = preview(data)
+    except Exception as e:
+        print(f"telemetry-stamp: {e}", file=sys.stderr)
+        return 0
+    if updated is not None:
+        output: dict = {"hookEventName": "PreToolUse", "updatedInput": updated}
+        if data.get("permission_mode") in _AUTO_EDIT_MODES:
+            output.update(
+                permissionDecision="allow",
+                permissionDecisionReason="telemetry-stamp: stamped "
+                                         "telemetry fields in the written file",
+            )
+        print(json.dumps({"hookSpecificOutput": output}))
+    return 0
+
+
+def _file_identity(path: Path) -> tuple[int, int] | None:
+    """(inode, mtime) of ``path``: atomic rewrites replace the inode, so
+    this changes even within the filesystem's timestamp granularity."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def check(data: dict) -> int:
+    """Stamp the file named in one parsed PostToolUse payload (PreToolUse
+    payloads go to :func:`check_pre`).
+
+    Never blocks: failures are reported on stderr and the result is always 0.
+    """
+    if data.get("hook_event_name") == "PreToolUse":
+        return check_pre(data)
+    try:
         tool_input = data.get("tool_input", {})
         file_path = tool_input.get("file_path", "")
 
         if not file_path:
-            return
+            return 0
 
         # Normalize to relative path for pattern matching
         path = Path(file_path)
@@ -1601,22 +2890,45 @@ def main() -> None:
 
         now = now_stamp()
         actions: list[str] = []
+        before = _file_identity(path)
 
         if BEAN_RE.search(rel):
-            actions = handle_bean_file(path, now)
+            actions = handle_bean_file(path, now, data)
         elif TASK_RE.search(rel):
-            actions = handle_task_file(path, now)
+            actions = handle_task_file(path, now, data, defer=deferred())
 
         if actions:
             stamped = ", ".join(actions)
-            msg = (
-                f"Telemetry: stamped {stamped} in {path.name} "
-                f"(file auto-modified, re-read before next edit)"
-            )
+            rewritten = _file_identity(path) != before
+            msg = f"Telemetry: stamped {stamped} in {path.name}"
+            if rewritten:
+                msg += " (file auto-modified, re-read before next edit)"
+            elif TASK_RE.search(rel) and "Completed" in actions:
+                if any(a.startswith("Queued ") for a in actions):
+                    msg += (" (bean.md row is updated in the background, "
+                            "re-read it before editing it)")
+                else:
+                    msg += " (bean.md updated, re-read it before editing it)"
             print(json.dumps({"message": msg}))
 
     except Exception as e:
         print(f"telemetry-stamp: {e}", file=sys.stderr)
+    return 0
+
+
+def main() -> None:
+    """Entry point: read hook JSON from stdin, process file, output result.
+
+    With arguments, runs the bulk backfill CLI instead (see :func:`cli`).
+    """
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
+    try:
+        data = json.loads(sys.stdin.read())
+    except Exception as e:
+        print(f"telemetry-stamp: {e}", file=sys.stderr)
+        return
+    check(data)
 
 
 if __name__ == "__main__":
@@ -133,42 +133,46 @@ def remediation_block(file_path: str, detail: str) -> str:
     )
 
 
-def main() -> None:
-    try:
-        payload = json.load(sys.stdin)
-    except (json.JSONDecodeError, ValueError):
-        sys.exit(0)
-
+def check(payload: dict) -> int:
+    """Gate one parsed payload; 2 blocks (remediation on stderr)."""
     tool_name = payload.get("tool_name", "")
     if tool_name not in ("Edit", "Write"):
-        sys.exit(0)
+        return 0
 
     tool_input = payload.get("tool_input") or {}
     file_path = tool_input.get("file_path") or ""
 
     if not is_task_file(file_path):
-        sys.exit(0)
+        return 0
 
     if tool_name == "Edit":
         new_string = tool_input.get("new_string") or ""
         if not is_in_progress_transition(new_string):
-            sys.exit(0)
+            return 0
     else:
         content = tool_input.get("content") or ""
         if not is_in_progress_transition(content):
-            sys.exit(0)
+            return 0
 
     path = Path(file_path)
     if not path.exists():
-        sys.exit(0)
+        return 0
 
     text = path.read_text(encoding="utf-8")
     ok, detail = validate_task_inputs(text)
     if ok:
-        sys.exit(0)
+        return 0
 
     print(remediation_block(file_path, detail), file=sys.stderr)
-    sys.exit(2)
+    return 2
+
+
+def main() -> None:
+    try:
+        payload = json.load(sys.stdin)
+    except (json.JSONDecodeError, ValueError):
+        sys.exit(0)
+    sys.exit(check(payload))
 
 
 if __name__ == "__main__":
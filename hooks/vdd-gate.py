@@ -29,6 +29,8 @@ import re
 import sys
 from pathlib import Path
 
+from _hook_lib.cache import find_project_root, list_dir_names
+
 STATUS_DONE_RE = re.compile(r"\*\*Status\*\*\s*\|\s*Done\b", re.IGNORECASE)
 SKIP_RE = re.compile(
     r"<!--\s*vdd-gate:\s*skip\s*\(justified:\s*(.{10,}?)\s*\)\s*-->",
@@ -57,42 +59,38 @@ def _old_text(tool_name: str, tool_input: dict, path: Path) -> str:
 
 def _find_vdd_report(project_root: Path, bean_num: str) -> Path | None:
     qa_dir = project_root / "ai" / "outputs" / "tech-qa"
-    if not qa_dir.is_dir():
-        return None
-    for report in sorted(qa_dir.glob("*.md")):
-        name = report.name.lower()
-        if "vdd" in name and bean_num in name:
-            return report
+    # Directory listing is memoized on the dir's mtime (warm in the
+    # resident hook server; see _hook_lib.cache).
+    for name in list_dir_names(qa_dir, "*.md"):
+        lowered = name.lower()
+        if "vdd" in lowered and bean_num in lowered:
+            return qa_dir / name
     return None
 
 
-def main() -> None:
-    try:
-        input_data = json.load(sys.stdin)
-    except json.JSONDecodeError:
-        sys.exit(0)
-
+def check(input_data: dict) -> int:
+    """Gate one parsed payload; returns 2 to block a Done transition."""
     tool_name = input_data.get("tool_name", "")
     tool_input = input_data.get("tool_input", {})
     if tool_name not in ("Write", "Edit"):
-        sys.exit(0)
+        return 0
 
     file_path = tool_input.get("file_path", "")
     path = Path(file_path)
     if path.name != "bean.md" or "beans" not in path.parts:
-        sys.exit(0)
+        return 0
 
     new_text = _new_text(tool_name, tool_input)
     if not STATUS_DONE_RE.search(new_text):
-        sys.exit(0)
+        return 0
     # Only gate the TRANSITION to Done — re-saving an already-Done bean
     # (telemetry stamps, index rollups) must not be blocked.
     if STATUS_DONE_RE.search(_old_text(tool_name, tool_input, path)):
-        sys.exit(0)
+        return 0
 
     m = BEAN_ID_RE.search(str(path))
     if not m:
-        sys.exit(0)
+        return 0
     bean_num = m.group(1)
 
     # Escape hatch: justified skip marker in the bean itself.
@@ -101,14 +99,10 @@ def main() -> None:
     except OSError:
         bean_content = ""
     if SKIP_RE.search(new_text) or SKIP_RE.search(bean_content):
-        sys.exit(0)
+        return 0
 
     # Locate the project root (directory containing ai/) from the bean path.
-    project_root = path.parent
-    while project_root != project_root.parent:
-        if (project_root / "ai" / "beans").is_dir():
-            break
-        project_root = project_root.parent
+    project_root = find_project_root(path.parent)
 
     report = _find_vdd_report(project_root, bean_num)
     if report is None:
@@ -120,7 +114,7 @@ def main() -> None:
             f"<!-- vdd-gate: skip (justified: <reason, 10+ chars>) -->",
             file=sys.stderr,
         )
-        sys.exit(2)
+        return 2
 
     report_text = report.read_text(encoding="utf-8")
     if not VERDICT_PASS_RE.search(report_text):
@@ -130,9 +124,17 @@ def main() -> None:
             f"criteria and re-run /vdd BEAN-{bean_num}.",
             file=sys.stderr,
         )
-        sys.exit(2)
+        return 2
+
+    return 0
+
 
-    sys.exit(0)
+def main() -> None:
+    try:
+        input_data = json.load(sys.stdin)
+    except json.JSONDecodeError:
+        sys.exit(0)
+    sys.exit(check(input_data))
 
 
 if __name__ == "__main__":
@@ -7,86 +7,79 @@ Blocks writes to sensitive files:
 2. SSH keys and config
 3. System files (/etc)
 4. Other credential files
+5. Paths the project protects in its hook policy file (_hook_lib.policy)
+
+Every file a call writes is checked: Write/Edit/MultiEdit ``file_path``,
+NotebookEdit ``notebook_path``, and the ``file_path`` of each entry of a
+batch of ``edits``. The rules are evaluated in order; the first one that
+matches a path decides. They are compiled once, at import, into one
+classifier (_hook_lib.path_classifier) — a path costs one walk of its
+components and one of its file name, and a batch of hundreds of files in a
+few directories walks each directory once.
+
+A decision follows from the paths as written (and the working directory,
+for relative ones) and the policy file, so :func:`check` remembers it per
+session (_hook_lib.decision_cache): another edit to the same file is
+answered without classifying it again.
+
+The classifier must decide exactly as the rules checked one by one
+(:func:`reference_decide`); to compare them over a corpus of paths:
+
+    python3 write_safety.py --verify [FILE ...]
+
+FILE is a transcript (``.jsonl``; the paths its write tool calls touch are
+used) or a text file with one path per line. Without FILE, the built-in
+corpus and every transcript under ~/.claude/projects are used.
 """
 import json
 import sys
 import os
 
+from _hook_lib.decision_cache import DecisionCache, decision_key
+from _hook_lib.git_context import current_branch
+from _hook_lib.path_classifier import (
+    NAME, PATH, PREFIX, SUFFIX, PathClassifier, PathRule, forms,
+)
+from _hook_lib.policy import load_policy
 
-def main():
-    try:
-        input_data = json.load(sys.stdin)
-    except json.JSONDecodeError:
-        sys.exit(0)  # Allow on parse error
-
-    tool_name = input_data.get("tool_name", "")
-    tool_input = input_data.get("tool_input", {})
-    file_path = tool_input.get("file_path", "")
+WRITE_TOOLS = ("Write", "Edit", "MultiEdit", "NotebookEdit")
 
-    # Only check Write and Edit tools
-    if tool_name not in ["Write", "Edit"]:
-        sys.exit(0)
+# Templates are meant to be committed and contain no secrets.
+ENV_TEMPLATE_ALLOWLIST = (".env.example", ".env.template", ".env.sample",
+                          ".env.dist")
 
-    # Normalize path for checking
-    normalized_path = os.path.normpath(file_path)
-    basename = os.path.basename(file_path)
+_KEY_FILE = "BLOCKED: Cannot write to key/certificate file ({name})"
+_CREDENTIALS_FILE = "BLOCKED: Cannot write to credentials file ({name})"
 
+# Every rule in evaluation order: (kind, pattern, message, options) — see
+# _hook_lib.path_classifier for the kinds and the PATH pattern syntax. A
+# message may name the file as {name}.
+RULES = (
     # === HARD BLOCKS (always blocked) ===
-    hard_blocked_patterns = [
-        # SSH files
-        ("/.ssh/", "BLOCKED: Cannot write to SSH directory"),
-        ("/.ssh", "BLOCKED: Cannot write to SSH directory"),
-
-        # AWS credentials
-        ("/.aws/credentials", "BLOCKED: Cannot write to AWS credentials"),
-        ("/.aws/config", "BLOCKED: Cannot write to AWS config"),
-
-        # Other sensitive locations
-        ("/.gnupg/", "BLOCKED: Cannot write to GPG directory"),
-        ("/.gitconfig", "BLOCKED: Cannot write to global git config"),
-    ]
-
-    for pattern, message in hard_blocked_patterns:
-        if pattern in normalized_path or pattern in file_path:
-            print(message, file=sys.stderr)
-            sys.exit(2)
+    # SSH files
+    (PATH, ".ssh*", "BLOCKED: Cannot write to SSH directory", {}),
+    # AWS credentials
+    (PATH, ".aws/credentials*", "BLOCKED: Cannot write to AWS credentials", {}),
+    (PATH, ".aws/config*", "BLOCKED: Cannot write to AWS config", {}),
+    # Other sensitive locations
+    (PATH, ".gnupg/", "BLOCKED: Cannot write to GPG directory", {}),
+    (PATH, ".gitconfig*", "BLOCKED: Cannot write to global git config", {}),
 
     # System directories — anchored at the filesystem root so a project
     # path that merely CONTAINS "/etc" (e.g. myapp/etc/config.yml) is not
     # a false positive (SPEC-014).
-    if normalized_path == "/etc" or normalized_path.startswith("/etc/"):
-        print("BLOCKED: Cannot write to system config directory", file=sys.stderr)
-        sys.exit(2)
-    if normalized_path == "/root" or normalized_path.startswith("/root/"):
-        print("BLOCKED: Cannot write to root home directory", file=sys.stderr)
-        sys.exit(2)
+    (PATH, "/etc", "BLOCKED: Cannot write to system config directory", {}),
+    (PATH, "/root", "BLOCKED: Cannot write to root home directory", {}),
 
     # === ENV FILE PROTECTION ===
-    env_patterns = [
-        ".env",
-        ".env.local",
-        ".env.production",
-        ".env.staging",
-        ".env.development",
-    ]
-
-    # Templates are meant to be committed and contain no secrets.
-    env_template_allowlist = {".env.example", ".env.template", ".env.sample", ".env.dist"}
-
-    if basename in env_template_allowlist:
-        pass
-    elif basename in env_patterns or basename.startswith(".env"):
-        print(f"BLOCKED: Cannot write to environment file ({basename}). These often contain secrets.", file=sys.stderr)
-        sys.exit(2)
+    (PREFIX, ".env", "BLOCKED: Cannot write to environment file ({name}). "
+     "These often contain secrets.", {"unless": ENV_TEMPLATE_ALLOWLIST}),
 
     # === KEY FILE PROTECTION ===
-    key_extensions = [".pem", ".key", ".p12", ".pfx"]
-    if any(file_path.endswith(ext) for ext in key_extensions):
-        print(f"BLOCKED: Cannot write to key/certificate file ({basename})", file=sys.stderr)
-        sys.exit(2)
+    *((SUFFIX, ext, _KEY_FILE, {}) for ext in (".pem", ".key", ".p12", ".pfx")),
 
     # === CREDENTIALS FILE PROTECTION ===
-    credential_names = [
+    *((NAME, name, _CREDENTIALS_FILE, {"ignorecase": True}) for name in (
         "credentials",
         "credentials.json",
         "secrets.json",
@@ -96,13 +89,208 @@ def main():
         "id_rsa",
         "id_ed25519",
         "id_ecdsa",
-    ]
+    )),
+)
+
+CLASSIFIER = PathClassifier(PathRule(kind, pattern, message, **options)
+                            for kind, pattern, message, options in RULES)
+
+
+# Decisions already made this session (see check); dropped with the module
+# when this file is edited and re-imported by the hook server.
+DECISIONS = DecisionCache()
+
+
+def _message(message: str, path: str) -> str:
+    return message.format(name=os.path.basename(os.path.normpath(path)))
+
+
+def _policy_block(policy, path: str) -> str | None:
+    return policy.path_block(os.path.abspath(os.path.expanduser(path)))
+
+
+def decide(path: str) -> str | None:
+    """The block message for writing ``path``, or None to allow it."""
+    return decide_all([path])[0]
+
+
+def decide_all(paths: list[str]) -> list[str | None]:
+    """:func:`decide` for each path, classified as one batch."""
+    policy = load_policy()
+    decided = []
+    for path, rule in zip(paths, CLASSIFIER.classify(paths)):
+        if rule is not None:
+            decided.append(_message(rule.action, path))
+        else:
+            decided.append(_policy_block(policy, path))
+    return decided
+
 
-    if basename.lower() in credential_names:
-        print(f"BLOCKED: Cannot write to credentials file ({basename})", file=sys.stderr)
-        sys.exit(2)
+def tool_paths(tool_input: dict) -> list[str]:
+    """The file paths one write tool call touches."""
+    paths = []
+    for key in ("file_path", "notebook_path"):
+        value = tool_input.get(key)
+        if isinstance(value, str) and value:
+            paths.append(value)
+    edits = tool_input.get("edits")
+    for edit in edits if isinstance(edits, list) else ():
+        value = edit.get("file_path") if isinstance(edit, dict) else None
+        if isinstance(value, str) and value:
+            paths.append(value)
+    return paths
 
-    sys.exit(0)  # Allow the write
+
+def _call_block(paths: list[str]) -> str | None:
+    blocked = [message for message in decide_all(paths) if message is not None]
+    if not blocked:
+        return None
+    message = blocked[0]
+    if len(blocked) > 1:
+        message += f" (and {len(blocked) - 1} more blocked file(s) in this call)"
+    return message
+
+
+def check(input_data: dict) -> int:
+    """Decide one parsed write tool call: 0 allows, 2 blocks (stderr)."""
+    tool_name = input_data.get("tool_name", "")
+    tool_input = input_data.get("tool_input", {})
+
+    if tool_name not in WRITE_TOOLS or not isinstance(tool_input, dict):
+        return 0
+
+    paths = tool_paths(tool_input)
+    # Paths are kept as written: ".." still counts for the rules, and the
+    # message names the file. Relative ones resolve against the cwd. (A
+    # path cannot hold a NUL, so joining on it is unambiguous.)
+    cwd = "" if all(p.startswith(("/", "~")) for p in paths) else os.getcwd()
+    key = decision_key(tool_name, "\0".join([cwd, *paths]),
+                       load_policy().version)
+    message = DECISIONS.decide(input_data.get("session_id", ""),
+                               current_branch(), key,
+                               lambda: _call_block(paths))
+    if message is not None:
+        print(message, file=sys.stderr)
+        return 2
+    return 0  # Allow the write
+
+
+# --- Verification -------------------------------------------------------------
+
+def reference_decide(path: str) -> str | None:
+    """The rules checked one by one — what :func:`decide` must reproduce."""
+    for rule in CLASSIFIER.rules:
+        if any(rule.matches(absolute, parts) for absolute, parts in forms(path)):
+            return _message(rule.action, path)
+    return _policy_block(load_policy(), path)
+
+
+# Paths at and around every rule's edges.
+CORPUS = (
+    "/home/u/.ssh/id_rsa", "/home/u/.ssh", "/home/u/.sshrc", "/p/ssh/x",
+    "/p/.ssh-notes/a.md", "/home/u/.aws/credentials", "/home/u/.aws/config",
+    "/home/u/.aws/credentials.bak", "/home/u/.aws/cli/cache.json",
+    "/home/u/.gnupg/pubring.kbx", "/home/u/.gnupg", "/home/u/.gitconfig",
+    "/home/u/.gitconfig.local", "/p/.gitignore", "/etc/hosts", "/etc",
+    "/p/myapp/etc/config.yml", "/etcetera/x", "/root/.bashrc", "/rootfs/a",
+    "/p/.env", "/p/.env.local", "/p/.env.example", "/p/.env.template",
+    "/p/.envrc", "/p/config/.env.production", "/p/env.py", "/p/certs/a.pem",
+    "/p/a.PEM", "/p/tls.key", "/p/keys/a.p12", "/p/b.pfx", "/p/monkey.py",
+    "/p/credentials", "/p/Credentials.JSON", "/p/secrets.yml", "/p/id_rsa",
+    "/p/id_rsa.pub", "/p/src/secrets.py", "/p/x/../.ssh/k", "/p/.ssh/../k",
+    "/p/a/./b/../.env", ".ssh/config", "notes/.env", "src/app.py", "",
+    "/p/src/app.py", "/p/ai/beans/BEAN-001-x/bean.md", "//etc/passwd",
+    "/etc/../home/x", "/root/../tmp/x", "/home/../etc/x", "/home/u/.env/",
+    "/home/u/proj/x.pem/",
+)
+
+# Decisions pinned where the compiled rules differ from the original
+# string checks. A trailing "/" names the last component all the same (a
+# write to such a path fails anyway), so the name rules now block it.
+EXPECTED = (
+    ("/etc/../home/x", False),
+    ("/root/../tmp/x", False),
+    ("/home/../etc/x", True),
+    ("/home/u/.env/", True),
+    ("/home/u/proj/x.pem/", True),
+)
+
+
+def _transcript_paths(path) -> list[str]:
+    paths = []
+    with open(path, "rb") as f:
+        for line in f:
+            if b'"tool_use"' not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            message = record.get("message") if isinstance(record, dict) else None
+            content = message.get("content") if isinstance(message, dict) else None
+            for block in content if isinstance(content, list) else ():
+                if (isinstance(block, dict) and block.get("type") == "tool_use"
+                        and block.get("name") in WRITE_TOOLS
+                        and isinstance(block.get("input"), dict)):
+                    paths.extend(tool_paths(block["input"]))
+    return paths
+
+
+def _load_corpus(paths: list[str]) -> list[str]:
+    from pathlib import Path
+
+    if not paths:
+        files = sorted((Path.home() / ".claude" / "projects").rglob("*.jsonl"))
+        corpus = list(CORPUS)
+    else:
+        files = [Path(p) for p in paths]
+        corpus = []
+    for path in files:
+        try:
+            if path.suffix == ".jsonl":
+                corpus.extend(_transcript_paths(path))
+            else:
+                corpus.extend(path.read_text(encoding="utf-8").splitlines())
+        except OSError as e:
+            print(f"{path}: unreadable ({e})")
+    return corpus
+
+
+def verify(paths: list[str]) -> int:
+    """Compare :func:`decide_all` with :func:`reference_decide` over a corpus."""
+    import time
+
+    corpus = _load_corpus(paths)
+    t0 = time.perf_counter()
+    expected = [reference_decide(p) for p in corpus]
+    t1 = time.perf_counter()
+    actual = decide_all(corpus)
+    t2 = time.perf_counter()
+    mismatches = 0
+    for path, want, got in zip(corpus, expected, actual):
+        if want != got:
+            mismatches += 1
+            print(f"MISMATCH {path!r}: reference {want!r}, compiled {got!r}")
+    for path, want in EXPECTED if not paths else ():
+        if (decide(path) is not None) != want:
+            mismatches += 1
+            print(f"UNEXPECTED {path!r}: should be "
+                  f"{'blocked' if want else 'allowed'}")
+    blocked = sum(1 for want in expected if want is not None)
+    print(f"write_safety: {len(corpus) - mismatches} of {len(corpus)} "
+          f"paths decided alike ({blocked} blocked; reference "
+          f"{(t1 - t0) * 1000:.1f}ms, compiled {(t2 - t1) * 1000:.1f}ms)")
+    return 1 if mismatches else 0
+
+
+def main():
+    if sys.argv[1:2] == ["--verify"]:
+        sys.exit(verify(sys.argv[2:]))
+    try:
+        input_data = json.load(sys.stdin)
+    except json.JSONDecodeError:
+        sys.exit(0)  # Allow on parse error
+    sys.exit(check(input_data))
 
 
 if __name__ == "__main__":
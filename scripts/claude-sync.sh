@@ -1,7 +1,8 @@
 #!/usr/bin/env bash
 #
 # claude-sync.sh — Generate symlinks from shared/ and local/ into Claude Code
-# discovery paths (.claude/{agents,commands,skills,hooks}/) and merge settings.
+# discovery paths (.claude/{agents,commands,skills,hooks}/) and merge the
+# layered JSON files (settings.json, hook-policy.json).
 #
 # Usage:
 #   .claude/shared/scripts/claude-sync.sh            # run normally
@@ -273,35 +274,37 @@ sync_skills() {
   fi
 }
 
-# --- Merge settings.json (shared + local) ---
-merge_settings() {
-  local shared_settings="${KIT_SHARED}/settings.json"
-  local local_settings="${LOCAL_DIR}/settings.json"
-  local output="${CLAUDE_DIR}/settings.json"
+# --- Merge a layered JSON file (shared + local) ---
+# Usage: merge_json <name>  — settings.json, hook-policy.json
+merge_json() {
+  local name="$1"
+  local shared_file="${KIT_SHARED}/${name}"
+  local local_file="${LOCAL_DIR}/${name}"
+  local output="${CLAUDE_DIR}/${name}"
 
-  if [ ! -f "$shared_settings" ]; then
-    warn "No shared settings.json found"
+  if [ ! -f "$shared_file" ]; then
+    warn "No shared ${name} found"
     return
   fi
 
-  if [ ! -f "$local_settings" ]; then
-    # No local settings — just symlink shared
+  if [ ! -f "$local_file" ]; then
+    # No local layer — just symlink shared
     if $CHECK_MODE; then
       if [ -L "$output" ]; then
         local current
         current="$(readlink -f "$output")"
-        if [[ "$current" != *"/shared/settings.json" ]]; then
-          warn "settings.json not pointing to shared"
+        if [[ "$current" != *"/shared/${name}" ]]; then
+          warn "${name} not pointing to shared"
           CONFLICTS=$((CONFLICTS + 1))
         fi
       elif [ ! -f "$output" ]; then
-        warn "Missing settings.json"
+        warn "Missing ${name}"
         CONFLICTS=$((CONFLICTS + 1))
       fi
     elif $DRY_RUN; then
-      log "(dry-run) symlink settings.json -> shared/settings.json"
+      log "(dry-run) symlink ${name} -> shared/${name}"
     else
-      make_link "$shared_settings" "$output"
+      make_link "$shared_file" "$output"
     fi
     return
   fi
@@ -309,18 +312,18 @@ merge_settings() {
   # Both exist — deep merge with embedded Python
   if $CHECK_MODE; then
     if [ ! -f "$output" ]; then
-      warn "Missing merged settings.json"
+      warn "Missing merged ${name}"
       CONFLICTS=$((CONFLICTS + 1))
     fi
     return
   fi
 
   if $DRY_RUN; then
-    log "(dry-run) Would merge shared + local settings.json"
+    log "(dry-run) Would merge shared + local ${name}"
     return
   fi
 
-  log "Merging settings.json (shared + local)..."
+  log "Merging ${name} (shared + local)..."
   python3 -c "
 import json, sys, copy
 
@@ -344,9 +347,9 @@ def deep_merge(base, override):
             result[key] = copy.deepcopy(value)
     return result
 
-with open('$shared_settings') as f:
+with open('$shared_file') as f:
     shared = json.load(f)
-with open('$local_settings') as f:
+with open('$local_file') as f:
     local = json.load(f)
 
 merged = deep_merge(shared, local)
@@ -355,8 +358,8 @@ with open('$output', 'w') as f:
     json.dump(merged, f, indent=2)
     f.write('\n')
 " || {
-    warn "Settings merge failed, falling back to shared settings"
-    make_link "$shared_settings" "$output"
+    warn "${name} merge failed, falling back to shared ${name}"
+    make_link "$shared_file" "$output"
   }
 }
 
@@ -468,7 +471,8 @@ commit_dir "agents"
 commit_dir "commands"
 commit_dir "hooks"
 commit_dir "skills"
-merge_settings
+merge_json settings.json
+merge_json hook-policy.json
 sync_mcp
 sync_settings_local
 configure_git